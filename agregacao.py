@@ -0,0 +1,151 @@
+"""Agregação das camadas de pontos densas em células, por zoom.
+
+Abaixo de ZOOM_PONTOS uma camada com LIMIAR_AGREGACAO pontos ou mais não
+manda os pontos ao navegador: manda, para cada zoom de ZOOM_MIN a
+ZOOM_PONTOS - 1, as células de uma grade de TAMANHO_CELULA pixels com a
+quantidade de pontos, o centro deles e a soma das propriedades numéricas
+declaradas em "somas" no registro (camadas.py). O número de células é
+limitado pela área em pixels, não pela quantidade de pontos, de modo que o
+tamanho do que vai ao navegador e o tempo de desenho param de crescer com
+a camada. Os pontos só são baixados quando o mapa passa de ZOOM_PONTOS (ver
+mapa.CamadaPontos).
+
+A grade (a célula de cada ponto em cada zoom) é montada uma vez por versão
+da camada carregada, completa; a cada rerun só se somam os pontos que os
+filtros e o recorte selecionam.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+import dados
+
+ZOOM_MIN = 5
+ZOOM_PONTOS = 13
+# Lado das células, em pixels da tela
+TAMANHO_CELULA = 64
+LIMIAR_AGREGACAO = 1000
+
+_ESTILO = """
+.atlas-celula { display: flex; align-items: center; justify-content: center; border-radius: 50%;
+    background: rgba(0, 89, 179, 0.55); border: 2px solid rgba(255, 255, 255, 0.9);
+    color: #fff; font: bold 11px Arial, sans-serif; }
+"""
+
+
+def deve_agregar(quantidade):
+    return quantidade >= LIMIAR_AGREGACAO
+
+
+def folha_estilo():
+    return _ESTILO.strip()
+
+
+def _mercator(lon, lat):
+    """Coordenadas (x, y) de Web Mercator normalizadas entre 0 e 1."""
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = (lon + 180) / 360
+    y = (1 - np.arcsinh(np.tan(np.radians(lat))) / math.pi) / 2
+    return x, y
+
+
+class Grade:
+    """Célula de cada ponto em cada zoom, calculada uma vez por versão dos dados.
+
+    lon e lat são arrays na ordem das feições (ou linhas), NaN onde não há
+    ponto; ler(campo) devolve os valores de uma propriedade nessa ordem.
+    niveis soma só os pontos selecionados, sem refazer a grade.
+    """
+
+    def __init__(self, lon, lat, ler):
+        self._lon, self._lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        self._validos = ~np.isnan(self._lon) & ~np.isnan(self._lat)
+        self._ler = ler
+        self._valores = {}
+        self._todos = {}
+        x, y = _mercator(np.nan_to_num(self._lon), np.nan_to_num(self._lat))
+        self._celulas = {}
+        for zoom in range(ZOOM_MIN, ZOOM_PONTOS):
+            lado = 256 * 2 ** zoom // TAMANHO_CELULA
+            cx = np.minimum((x * lado).astype(np.int64), lado - 1)
+            cy = np.minimum((y * lado).astype(np.int64), lado - 1)
+            ocupadas, celula = np.unique(cx * lado + cy, return_inverse=True)
+            self._celulas[zoom] = (celula, len(ocupadas))
+
+    def _somas(self, campo):
+        valores = self._valores.get(campo)
+        if valores is None:
+            # NaN não soma
+            valores = self._valores[campo] = np.nan_to_num(_numeros(self._ler(campo)))
+        return valores
+
+    def niveis(self, somas=(), posicoes=None):
+        """Células de cada zoom: {"<zoom>": [[lat, lon, quantidade, soma...], ...]}.
+
+        somas são os pares (propriedade, rótulo) do registro; posicoes, os
+        pontos selecionados (filtros e recorte), ou None para todos. lat e
+        lon da célula são o centro dos pontos dela.
+        """
+        campos = tuple(campo for campo, _ in somas)
+        if posicoes is None and campos in self._todos:
+            return self._todos[campos]
+        if posicoes is None:
+            selecionados = np.flatnonzero(self._validos)
+        else:
+            posicoes = np.asarray(posicoes, dtype=np.intp)
+            selecionados = posicoes[self._validos[posicoes]]
+        lat, lon = self._lat[selecionados], self._lon[selecionados]
+        valores = [self._somas(campo)[selecionados] for campo in campos]
+        niveis = {}
+        for zoom, (celula, ocupadas) in self._celulas.items():
+            celula = celula[selecionados]
+            quantidade = np.bincount(celula, minlength=ocupadas)
+            usadas = np.flatnonzero(quantidade)
+            quantidade = quantidade[usadas]
+
+            def somar(pesos):
+                return np.bincount(celula, weights=pesos, minlength=ocupadas)[usadas]
+
+            colunas = [
+                np.round(somar(lat) / quantidade, 6),
+                np.round(somar(lon) / quantidade, 6),
+                quantidade,
+                *(np.round(somar(v), 2) for v in valores),
+            ]
+            niveis[str(zoom)] = [list(linha) for linha in zip(*(c.tolist() for c in colunas))]
+        if posicoes is None:
+            self._todos[campos] = niveis
+        return niveis
+
+
+def _numeros(valores):
+    return pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+
+def _grade_camada(geojson):
+    lon, lat = [], []
+    for feature in geojson["features"]:
+        geometria = feature.get("geometry")
+        if geometria and geometria.get("type") == "Point":
+            lon.append(geometria["coordinates"][0])
+            lat.append(geometria["coordinates"][1])
+        else:
+            lon.append(np.nan)
+            lat.append(np.nan)
+    features = geojson["features"]
+    return Grade(lon, lat, lambda campo: [(f.get("properties") or {}).get(campo) for f in features])
+
+
+def _grade_produtores(df):
+    return Grade(df["LONGITUDE"].to_numpy(dtype=float), df["LATITUDE"].to_numpy(dtype=float), lambda campo: df[campo])
+
+
+def grade_camada(geojson):
+    """Grade dos pontos do GeoJSON carregado, reaproveitada enquanto ele não muda."""
+    return dados.derivado(geojson, _grade_camada)
+
+
+def grade_produtores(df):
+    """Grade dos produtores da planilha carregada (dados.carregar_produtores)."""
+    return dados.derivado(df, _grade_produtores)
@@ -1,11 +1,28 @@
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 import folium
-from streamlit_folium import folium_static
-from folium.plugins import MeasureControl, Fullscreen
-from folium.plugins import Draw, Search, MousePosition
+from streamlit_folium import st_folium
+import functools
+import html
 import json
+import shapely
+import urllib.parse
+
+import busca
+import cache_mapa
+import camadas
+import cubo
+import dados
+import espacial
+import exportacao
+import filtros
+import icones
+import juncao
+import mapa
+import medidas
+import perfil
 
 st.set_page_config(page_title="ATLAS SDA - Quixeramobim", layout="wide")
 
@@ -71,46 +88,114 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+
+# Camadas contadas dentro dos polígonos desenhados no mapa
+CAMADAS_RESUMO = ("cisternas", "pocos")
+TIPOS_DESENHO = {"Polygon": "Polígono", "LineString": "Linha", "Point": "Marcador"}
+
+
+def carregar_camada(name, original=False):
+    """Carrega uma camada sob demanda; avisa e retorna None se o arquivo não puder ser lido.
+
+    Um arquivo ausente, ilegível ou corrompido esconde só a própria camada.
+    Com original lê o GeoJSON de origem, com todas as propriedades, em vez
+    do artefato compacto, que guarda só as do popup.
+    """
+    file = dados.ARQUIVOS_CAMADAS[name]
+    try:
+        geojson = dados.carregar_geojson(file) if original else dados.carregar_camada(name)
+        if camadas.CAMADAS[name].get("medidas"):
+            geojson = medidas.com_medidas(geojson)
+        return geojson
+    except FileNotFoundError:
+        st.warning(f"Arquivo {file} não encontrado. A camada correspondente não será exibida.")
+    except json.JSONDecodeError:
+        st.warning(f"Arquivo {file} está corrompido ou mal formatado. A camada correspondente não será exibida.")
+    except (OSError, ValueError) as erro:
+        # Sem permissão, diretório no lugar do arquivo, bytes que não são UTF-8...
+        st.warning(f"Arquivo {file} não pôde ser lido ({erro}). A camada correspondente não será exibida.")
+    return None
+
+
+def geometria_desenho(desenho):
+    """(geometria GeoJSON, tipo) de um desenho do mapa; círculos viram polígonos."""
+    geometria = desenho.get("geometry") or {}
+    raio = (desenho.get("properties") or {}).get("radius")
+    if geometria.get("type") == "Point" and raio:
+        return medidas.circulo(*geometria["coordinates"][:2], raio), "Círculo"
+    return geometria, TIPOS_DESENHO.get(geometria.get("type"), geometria.get("type"))
+
+
+def area_desenhada(desenhos):
+    """União dos polígonos e círculos desenhados, ou None se não houver nenhum."""
+    poligonos = [
+        shapely.geometry.shape(geometria)
+        for geometria, _ in map(geometria_desenho, desenhos)
+        if geometria.get("type") in ("Polygon", "MultiPolygon")
+    ]
+    return shapely.union_all(poligonos) if poligonos else None
+
+
+def resumir_desenhos(desenhos, df, df_filtrado):
+    """Medidas de cada desenho e o que cai dentro dos polígonos, pelos índices espaciais."""
+    camadas_resumo = {name: carregar_camada(name, original=True) for name in CAMADAS_RESUMO}
+    linhas, detalhes = [], []
+    for numero, desenho in enumerate(desenhos, start=1):
+        geometria, tipo = geometria_desenho(desenho)
+        area_ha, comprimento_km = medidas.medir(geometria) if geometria else (0.0, 0.0)
+        linha = {"Desenho": numero, "Tipo": tipo, "Área (ha)": area_ha, "Perímetro/comprimento (km)": comprimento_km}
+        if geometria.get("type") in ("Polygon", "MultiPolygon"):
+            poligono = shapely.geometry.shape(geometria)
+            posicoes = espacial.indice_produtores(df).dentro(poligono)
+            produtores = df.iloc[posicoes]
+            dentro = {"Produtores": produtores[produtores.index.isin(df_filtrado.index)]}
+            for name, geojson in camadas_resumo.items():
+                if geojson:
+                    features = geojson["features"]
+                    dentro[camadas.CAMADAS[name]["nome"]] = pd.DataFrame(
+                        [features[p].get("properties") or {} for p in espacial.indice(geojson).dentro(poligono)]
+                    )
+            linha.update({nome: len(tabela) for nome, tabela in dentro.items()})
+            detalhes.append((numero, dentro))
+        linhas.append(linha)
+    resumo = pd.DataFrame(linhas)
+    contagens = resumo.columns[4:]
+    resumo[contagens] = resumo[contagens].astype("Int64")
+    return resumo, detalhes
+
+
+def percentual(taxa):
+    return "-" if taxa is None else f"{taxa:.0%}"
+
+
+def exportar_produtores(df_exportado, campos, formato, poligono):
+    """Bytes do arquivo dos produtores, gerado quando o botão de download é clicado."""
+    return exportacao.conteudo(
+        "Produtores filtrados", formato, campos, exportacao.lotes_produtores(df_exportado, campos, poligono)
+    )
+
+
+def exportar_camada(name, formato, poligono, alvo, zonas):
+    """Exporta a camada do arquivo original, com os filtros de Distrito e Zona e o recorte."""
+    geojson = dados.carregar_geojson(dados.ARQUIVOS_CAMADAS[name])
+    if camadas.CAMADAS[name].get("medidas"):
+        geojson = medidas.com_medidas(geojson)
+    posicoes = None
+    if alvo is not None or zonas:
+        posicoes = juncao.posicoes(juncao.do_arquivo(name, geojson), alvo, zonas)
+    return exportacao.exportar(
+        camadas.CAMADAS[name]["nome"], formato, exportacao.campos_camada(geojson, posicoes),
+        exportacao.lotes_camada(geojson, posicoes, poligono),
+    )
+
+
+# Tempos de cada etapa do rerun, com ?perfil=1 na URL (ver perfil.py)
+perfil_rerun = perfil.Perfil(perfil.ligado())
+
 try:
-    # Carregar dados
-    df = pd.read_excel("Produtores_SDA.xlsx")
-    df[["LATITUDE", "LONGITUDE"]] = df["COORDENADAS"].str.split(",", expand=True)
-    df["LATITUDE"] = pd.to_numeric(df["LATITUDE"], errors="coerce")
-    df["LONGITUDE"] = pd.to_numeric(df["LONGITUDE"], errors="coerce")
-    df["ORDENHA?"] = df["ORDENHA?"].str.upper().fillna("NAO")
-    df["INSEMINA?"] = df["INSEMINA?"].str.upper().fillna("NAO")
-
-    # GeoJSONs
-    geojson_files = {
-        "outorgas": "outorgado.geojson",
-        "saaeq": "saaeq.geojson",
-        "distrito": "distrito.geojson",
-        "chafarizes": "Chafarizes.geojson",
-        "pocos": "pocos_profundos.geojson",
-        "sistemas": "Sistemas de Abastecimento.geojson",
-        "areas_reforma": "areas_reforma.geojson",
-        "distritos_ponto": "distritos_ponto.geojson",
-        "cisternas": "cisternas.geojson",
-        "acudes": "acudes.geojson",
-        "estradas": "estradas.geojson",
-        "escolas": "escolas.geojson",
-        "postos": "postos.geojson",
-        "urbanas": "urbanas.geojson",
-        "comunidades": "comunidades.geojson",
-        "apicultura": "apicultura.geojson",
-    }
-
-    geojson_data = {}
-    for name, file in geojson_files.items():
-        try:
-            with open(file, "r", encoding="utf-8") as f:
-                geojson_data[name] = json.load(f)
-        except FileNotFoundError:
-            st.warning(f"Arquivo {file} não encontrado. A camada correspondente não será exibida.")
-            geojson_data[name] = None
-        except json.JSONDecodeError:
-            st.warning(f"Arquivo {file} está corrompido ou mal formatado. A camada correspondente não será exibida.")
-            geojson_data[name] = None
+    # Carregar dados (reaproveitados entre reruns enquanto os arquivos não mudam)
+    with perfil_rerun.etapa("ler produtores"):
+        df = dados.carregar_produtores()
 except Exception as e:
     st.error(f"Erro ao carregar dados: {str(e)}")
     st.stop()
@@ -125,26 +210,53 @@ st.sidebar.markdown("""
 
 st.sidebar.title("🗺️ Controle de Camadas")
 
-with st.sidebar.expander("🏘️ Infraestrutura"):
-    show_distritos = st.checkbox("Distritos", value=True)
-    show_distritos_ponto = st.checkbox("Sede Distritos", value=False)
-    show_comunidades = st.checkbox("Comunidades", value=False)
-    show_urbanas = st.checkbox("Áreas Urbanas", value=False)
-    show_produtores = st.checkbox("Produtores", value=False)
-    show_apicultura = st.checkbox("Apicultores/as", value=False)
-    show_areas_reforma = st.checkbox("Assentamentos", value=False)
-    show_estradas = st.checkbox("Estradas", value=False)
-    show_escolas = st.checkbox("Escolas", value=False)
-    show_postos = st.checkbox("Postos de Saúde", value=False)
-        
-with st.sidebar.expander("💧 Recursos Hídricos"):
-    show_chafarizes = st.checkbox("Chafarizes", value=False)
-    show_pocos = st.checkbox("Poços", value=False)
-    show_cisternas = st.checkbox("Cisternas", value=False)
-    show_sistemas = st.checkbox("Sistemas de Abastecimento", value=False)
-    show_saaeq = st.checkbox("Sistemas SAAE", value=False)
-    show_outorgas = st.checkbox("Outorgas", value=False)
-    show_acudes = st.checkbox("Açudes", value=False)
+# Um expander por grupo, com as camadas na ordem do registro (camadas.py)
+camadas_ativas = {}
+for grupo, titulo in camadas.GRUPOS.items():
+    with st.sidebar.expander(titulo):
+        for name, camada in camadas.do_grupo(grupo):
+            camadas_ativas[name] = st.checkbox(camada["nome"], value=camada.get("padrao", False))
+
+agrupar_marcadores = st.sidebar.checkbox(
+    "📍 Agrupar marcadores", value=False,
+    help=f"Camadas com {mapa.LIMIAR_CLUSTER} pontos ou mais são sempre agrupadas."
+)
+
+so_area_visivel = st.sidebar.checkbox(
+    "🔲 Só a área visível", value=True,
+    help="Manda ao mapa só as feições próximas da área exibida (ou, de início, dos produtores filtrados)."
+)
+
+modo_mapa = st.sidebar.radio(
+    "🗺️ Modo do mapa", ["Incremental", "Página inteira"],
+    help="Incremental mantém o mapa e o zoom e troca só as camadas alteradas; "
+         "página inteira recria o mapa a cada mudança."
+)
+
+# Cada camada marcada é desenhada pelo caminho mais leve disponível (mapa.estrategia).
+# Só as que não têm vector tiles são lidas do disco: das outras o navegador
+# busca só as tiles visíveis
+estrategias = {
+    name: mapa.estrategia(name)
+    for name, ativa in camadas_ativas.items()
+    if ativa and camadas.CAMADAS[name]["arquivo"]
+}
+tiles_camadas = {}
+for name, estrategia in estrategias.items():
+    if estrategia == camadas.TILES:
+        tiles_camadas[name] = mapa.tiles_da_camada(name)
+
+geojson_data = {}
+with perfil_rerun.etapa("ler camadas"):
+    # Os arquivos são lidos e decodificados em paralelo e ficam no cache; os
+    # avisos de arquivo ausente ou corrompido saem de carregar_camada, abaixo
+    dados.carregar_camadas(name for name in estrategias if name not in tiles_camadas)
+    perfil_rerun.medir(decodificador_json=dados.DECODIFICADOR)
+    for name, estrategia in estrategias.items():
+        perfil_rerun.camada(name, estrategia=estrategia)
+        if name not in tiles_camadas:
+            with perfil_rerun.etapa("leitura", camada=name):
+                geojson_data[name] = carregar_camada(name)
 
 st.sidebar.title("🔎 Filtros")
 
@@ -152,26 +264,87 @@ if st.sidebar.button("🔄 Reiniciar Filtros"):
     st.session_state.clear()
     st.rerun()
 
-tecnicos = st.sidebar.multiselect("👨‍🔧 Técnico", sorted(df["TECNICO"].dropna().unique()))
-distritos = st.sidebar.multiselect("📍 Distrito", sorted(df["DISTRITO"].dropna().unique()))
-compradores = st.sidebar.multiselect("🛒 Comprador", sorted(df["COMPRADOR"].dropna().unique()))
+indice_filtros = filtros.indice(df)
+tecnicos = st.sidebar.multiselect("👨‍🔧 Técnico", indice_filtros.opcoes("TECNICO"))
+distritos = st.sidebar.multiselect(
+    "📍 Distrito", indice_filtros.opcoes("DISTRITO"),
+    help="Filtra os produtores pela planilha e as camadas pela localização; "
+         "camadas em vector tiles não são filtradas."
+)
+compradores = st.sidebar.multiselect("🛒 Comprador", indice_filtros.opcoes("COMPRADOR"))
+zonas = st.sidebar.multiselect("🏙️ Zona", juncao.ZONAS, help="Urbana: dentro das áreas urbanas.")
 produtor = st.sidebar.text_input("🔍 Buscar Produtor")
 
 # Aplicar filtros
-df_filtrado = df.copy()
-if tecnicos:
-    df_filtrado = df_filtrado[df_filtrado["TECNICO"].isin(tecnicos)]
-if distritos:
-    df_filtrado = df_filtrado[df_filtrado["DISTRITO"].isin(distritos)]
-if compradores:
-    df_filtrado = df_filtrado[df_filtrado["COMPRADOR"].isin(compradores)]
-if produtor:
-    df_filtrado = df_filtrado[df_filtrado["PRODUTOR"].str.contains(produtor, case=False, na=False)]
+selecoes = {"TECNICO": tecnicos, "DISTRITO": distritos, "COMPRADOR": compradores}
+# Sem o distrito.geojson não há junção espacial: Distrito filtra só a
+# planilha e Zona não filtra nada
+juncao_disponivel = True
+with perfil_rerun.etapa("filtros"):
+    posicoes = indice_filtros.posicoes(selecoes)
+    if zonas:
+        # Zona vem da junção espacial dos produtores com as áreas urbanas
+        try:
+            na_zona = juncao.posicoes(juncao.dos_produtores(df), zonas=zonas)
+            posicoes = na_zona if posicoes is None else np.intersect1d(posicoes, na_zona, assume_unique=True)
+        except (FileNotFoundError, json.JSONDecodeError):
+            juncao_disponivel = False
+    if produtor.strip():
+        # Resultado da busca em ordem de relevância, restrito aos filtros
+        encontrados = busca.indice(df).buscar(produtor)
+        if posicoes is not None:
+            encontrados = encontrados[np.isin(encontrados, posicoes, assume_unique=True)]
+        df_filtrado = df.iloc[encontrados]
+    else:
+        df_filtrado = df if posicoes is None else df.iloc[posicoes]
+
+# Distrito e Zona valem também para as camadas lidas, pela junção espacial
+# pré-calculada das feições com os distritos e as áreas urbanas (juncao.py)
+selecao_camadas = {}
+alvo = None
+if juncao_disponivel and (distritos or zonas):
+    with perfil_rerun.etapa("junção"):
+        try:
+            alvo = juncao.distritos_da_selecao(distritos, df) if distritos else None
+            for name, geojson in geojson_data.items():
+                if geojson:
+                    selecao_camadas[name] = juncao.posicoes(juncao.da_camada(name, geojson), alvo, zonas)
+        except (FileNotFoundError, json.JSONDecodeError):
+            juncao_disponivel, alvo, selecao_camadas = False, None, {}
+if not juncao_disponivel:
+    st.warning(
+        f"Arquivo {dados.ARQUIVOS_CAMADAS[juncao.CAMADA_DISTRITOS]} ausente ou corrompido: "
+        "Distrito filtra só os produtores, pela planilha, e Zona não é aplicada."
+    )
 
 total = len(df_filtrado)
 st.success(f"{total} registro(s) encontrado(s).")
+
+# Indicadores e totais por grupo saem do cubo de agregados (cubo.py). Zona e
+# busca não são dimensões do cubo: com elas o cubo é montado só dos filtrados
+with perfil_rerun.etapa("resumo"):
+    if zonas or produtor.strip():
+        cubo_resumo, selecao_resumo = cubo.Cubo(df_filtrado), None
+    else:
+        cubo_resumo, selecao_resumo = cubo.cubo(df), selecoes
+    indicadores = cubo_resumo.indicadores(selecao_resumo)
+
+with st.expander("📊 Resumo dos produtores", expanded=False):
+    coluna_1, coluna_2, coluna_3, coluna_4 = st.columns(4)
+    coluna_1.metric("Produtores", indicadores["produtores"])
+    coluna_2.metric("Produção dia total", f"{indicadores['producao']:,.0f}".replace(",", "."))
+    coluna_3.metric("Fazem ordenha", percentual(indicadores["taxa_ordenha"]))
+    coluna_4.metric("Fazem inseminação", percentual(indicadores["taxa_insemina"]))
+    agrupamento = st.radio("Totais por", list(cubo.AGRUPAMENTOS), horizontal=True)
+    tabela_resumo = cubo_resumo.por(agrupamento, selecao_resumo)
+    if not tabela_resumo.empty:
+        st.bar_chart(tabela_resumo["Produção dia"])
+        st.dataframe(tabela_resumo, use_container_width=True)
+
 st.subheader("🗺️ Mapa com Distritos, Produtores e Áreas de Reforma")
 
+desenhos = []
+
 if not df_filtrado.empty:
     # Verificar coordenadas válidas
     if df_filtrado["LATITUDE"].isnull().any() or df_filtrado["LONGITUDE"].isnull().any():
@@ -182,409 +355,113 @@ if not df_filtrado.empty:
     padding = 0.02
     sw = [df_filtrado["LATITUDE"].min() - padding, df_filtrado["LONGITUDE"].min() - padding]
     ne = [df_filtrado["LATITUDE"].max() + padding, df_filtrado["LONGITUDE"].max() + padding]
-    
-    # Criar mapa centralizado
-    m = folium.Map(location=[-5.1971, -39.2886], zoom_start=10, tiles=None)
-    Fullscreen(position='topright', title='Tela Cheia', title_cancel='Sair da Tela Cheia', force_separate_button=True).add_to(m)
-    m.add_child(MeasureControl(
-        primary_length_unit="meters",
-        secondary_length_unit="kilometers",
-        primary_area_unit="hectares",
-        secondary_area_unit="sqmeters",
-        position="topleft"
-    ))
-      
-    # Adicionar camadas de fundo
-    tile_layers = [
-        {
-            "name": "Top Map",
-            "url": "https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
-            "attr": "Map tiles by Stamen Design, under CC BY 3.0. Data by OpenStreetMap, under ODbL."
-        },
-        {
-            "name": "Sentinel-2 (sem nuvem)",
-            "url": "https://tiles.maps.eox.at/wmts/1.0.0/s2cloudless-2021_3857/default/g/{z}/{y}/{x}.jpg",
-            "attr": "Sentinel-2 cloudless by EOX"
-        },
-        {
-            "name": "Google Satellite",
-            "url": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
-            "attr": "Google Satellite imagery"
-        },
-        {
-            "name": "Google Streets",
-            "url": "https://mt1.google.com/vt/lyrs=r&x={x}&y={y}&z={z}",
-            "attr": "Google Streets imagery"
-        },
-        {
-            "name": "CartoDB Positron",
-            "url": "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
-            "attr": "© OpenStreetMap contributors, © CARTO"
-        },
-        {
-            "name": "CartoDB Dark Matter",
-            "url": "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png",
-            "attr": "© OpenStreetMap contributors, © CARTO"
-        },
-        {
-            "name": "Esri Satellite",
-            "url": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
-            "attr": "Tiles © Esri — Source: Esri, i-cubed, USDA, USGS, AEX, GeoEye, Getmapping, etc."
-        },
-        {
-            "name": "Google Terrain",
-            "url": "https://mt1.google.com/vt/lyrs=p&x={x}&y={y}&z={z}",
-            "attr": "Google Terrain imagery"
-        },
-        {
-            "name": "Open Street Map",
-            "url": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
-            "attr": "© OpenStreetMap contributors"
-        },
-    ]
-
-    for layer in tile_layers:
-        folium.TileLayer(
-            tiles=layer["url"],
-            attr=layer["attr"],
-            name=layer["name"]
-        ).add_to(m)
 
-    # CAMADAS INFRAESTRUTURA
+    # Camadas recortadas pelo índice espacial: de início em torno dos produtores
+    # filtrados; no modo incremental, depois, em torno da área visível do mapa
+    limites = None
+    if so_area_visivel:
+        area = None
+        if modo_mapa == "Incremental":
+            area = espacial.limites_do_mapa((st.session_state.get("mapa") or {}).get("bounds"))
+        limites = espacial.limites_consulta(*(area or (sw, ne)))
+    # As camadas carregadas, completas, ficam para as células das camadas
+    # agregadas (agregacao.py), que só somam as posições do recorte
+    carregadas = dict(geojson_data)
+    posicoes_camadas = {}
+    with perfil_rerun.etapa("recorte espacial"):
+        for name, geojson in carregadas.items():
+            if not geojson:
+                continue
+            if limites:
+                posicoes_camadas[name] = espacial.posicoes_recorte(geojson, limites, selecao_camadas.get(name))
+            elif name in selecao_camadas:
+                posicoes_camadas[name] = selecao_camadas[name]
+            else:
+                continue
+            geojson_data[name] = espacial.selecionar(geojson, posicoes_camadas[name])
+    for name, geojson in geojson_data.items():
+        if geojson:
+            perfil_rerun.camada(name, feicoes=len(geojson["features"]))
     
-    if show_distritos and geojson_data.get("distrito"):
-        folium.GeoJson(
-            geojson_data["distrito"],
-            name="Distritos",
-            style_function=lambda x: {'fillColor': '#9fe2fc', 'fillOpacity': 0.2, 'color': '#000000', 'weight': 1}
-        ).add_to(m)
-
-    if show_distritos_ponto and geojson_data.get("distritos_ponto"):
-        distritos_ponto_layer = folium.FeatureGroup(name="Sede Distritos")
-        for feature in geojson_data["distritos_ponto"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            nome_distrito = feature["properties"].get("Name", "Sem nome")
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(f"Distrito: {nome_distrito}", max_width=200),
-                icon=folium.CustomIcon("https://i.ibb.co/S4VmxQcB/circle.png", icon_size=(23, 23))
-            ).add_to(distritos_ponto_layer)
-        distritos_ponto_layer.add_to(m)
-        
-    if show_estradas and geojson_data.get("estradas"):
-        folium.GeoJson(
-            geojson_data["estradas"],
-            name="estradas",
-            style_function=lambda x: {'fillColor': '#802f04', 'fillOpacity': 0.2, 'color': '#802f04', 'weight': 1}
-        ).add_to(m)
-
-    if show_produtores:
-        for _, row in df_filtrado.iterrows():
-            popup_info = f"""
-            <strong>Apelido:</strong> {row['APELIDO']}<br>
-            <strong>Produção dia:</strong> {row['PRODUCAO']}<br>
-            <strong>Fazenda:</strong> {row['FAZENDA']}<br>
-            <strong>Distrito:</strong> {row['DISTRITO']}<br>
-            <strong>Escolaridade:</strong> {row['ESCOLARIDADE']}<br>
-            """
-            folium.Marker(
-                location=[row["LATITUDE"], row["LONGITUDE"]],
-                icon=folium.CustomIcon("https://i.ibb.co/zVBVzh2t/fazenda.png", icon_size=(20, 20)),
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=row["PRODUTOR"]
-            ).add_to(m)
-
-    if show_apicultura and geojson_data.get("apicultura"):
-        apicultura_layer = folium.FeatureGroup(name="Apicultura")
-        for feature in geojson_data["apicultura"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            nome = props.get("Nome", "Sem nome")
-            popup_info = f"""
-            <div style='font-family: Arial, sans-serif; border: 2px solid #ffb300; border-radius: 8px; padding: 8px; background-color: #fff8e1;'>
-            <h4 style='margin-top: 0; margin-bottom: 8px; color: #ff6f00;'>🍯 Apicultores/as</h4>
-            <p><strong>📛 Nome:</strong> {nome}</p>
-            </div>
-            """
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                tooltip=nome,
-                popup=folium.Popup(popup_info, max_width=300),
-                icon=folium.CustomIcon("https://i.ibb.co/yny9Yvjb/apitherapy.png", icon_size=(22, 22))
-            ).add_to(apicultura_layer)
-        apicultura_layer.add_to(m)
-
-    if show_areas_reforma and geojson_data.get("areas_reforma"):
-        areas_layer = folium.FeatureGroup(name="Áreas de Reforma")
-        for feature in geojson_data["areas_reforma"]["features"]:
-            popup_text = feature["properties"].get("Name", "Sem Nome")
-            folium.GeoJson(
-                feature,
-                name="Área de Reforma",
-                tooltip=folium.GeoJsonTooltip(fields=["Name"], aliases=["Nome:"]),
-                popup=folium.Popup(popup_text, max_width=300),
-                style_function=lambda x: {"fillColor": "#ff7800", "color": "red", "weight": 1, "fillOpacity": 0.4}
-            ).add_to(areas_layer)
-        areas_layer.add_to(m)
-        
-    if show_escolas and geojson_data.get("escolas"):
-        escolas_layer = folium.FeatureGroup(name="Escolas")
-        for feature in geojson_data["escolas"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #2A4D9B; border-radius: 8px; padding: 8px; background-color: #f9f9f9;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #2A4D9B; border-bottom: 1px solid #ccc;'>🏫 Escola Municipal</h4>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📛 Nome:</span> " + props.get("no_entidad", "Sem nome") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📍 Endereço:</span> " + props.get("endereco", "Não informado") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📞 Contato:</span> " + str(props.get("fone_1", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>🧭 Localização:</span> " + props.get("no_localiz", "Não informado") + "</p>"
-                "</div>"
-            )
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("no_entidad", "Sem nome"),
-                icon=folium.CustomIcon(
-                    "https://i.ibb.co/pBsQcQws/education.png",
-                    icon_size=(25, 25)
-                )
-            ).add_to(escolas_layer)
-        escolas_layer.add_to(m)
-
-    if show_postos and geojson_data.get("postos"):
-        postos_layer = folium.FeatureGroup(name="Postos")
-        for feature in geojson_data["postos"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #2A4D9B; border-radius: 8px; padding: 8px; background-color: #f9f9f9;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #2A4D9B; border-bottom: 1px solid #ccc;'>🏥 Postos de Saúde</h4>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📛 Posto:</span> " + props.get("nome", "Sem nome") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📍 Endereço:</span> " + props.get("endereco", "Não informado") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📞 Bairro:</span> " + str(props.get("bairro", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>🧭 Município:</span> " + props.get("municipio", "Não informado") + "</p>"
-                "</div>"
-            )
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("nome", "Sem nome"),
-                icon=folium.CustomIcon(
-                    "https://i.ibb.co/rGdw6d71/hospital.png",
-                    icon_size=(25, 25)
-                )
-            ).add_to(postos_layer)
-        postos_layer.add_to(m)
-
-    if show_urbanas and geojson_data.get("urbanas"):
-        folium.GeoJson(
-            geojson_data["urbanas"],
-            name="Aréas Urbanas",
-            style_function=lambda x: {'fillColor': '#9e064d', 'fillOpacity': 0.2, 'color': '#000000', 'weight': 1}
-        ).add_to(m)
-
-    if show_comunidades and geojson_data.get("comunidades"):
-        comunidades_layer = folium.FeatureGroup(name="Comunidades")
-        for feature in geojson_data["comunidades"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            nome = props.get("Name", "Sem nome")
-            distrito = props.get("Distrito", "Não informado")
-            popup_info = f"""
-            <div style='font-family: Arial, sans-serif; border: 2px solid #4CAF50; border-radius: 8px; padding: 8px; background-color: #f0fff0;'>
-            <h4 style='margin-top: 0; margin-bottom: 8px; color: #2E7D32;'>🏘️ Comunidade</h4>
-            <p><strong>📛 Nome:</strong> {nome}</p>
-            <p><strong>📍 Distrito:</strong> {distrito}</p>
-            </div>
-            """
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                tooltip=nome,
-                popup=folium.Popup(popup_info, max_width=300),
-                icon=folium.CustomIcon("https://i.ibb.co/kgbmmjWc/location-icon-242304.png", icon_size=(18, 18))
-            ).add_to(comunidades_layer)
-        comunidades_layer.add_to(m)
-
-    # CAMADAS RECURSOS HÍDRICOS
-
-    if show_chafarizes and geojson_data.get("chafarizes"):
-        chafarizes_layer = folium.FeatureGroup(name="Chafarizes")
-        for feature in geojson_data["chafarizes"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                tooltip="Chafariz",
-                icon=folium.CustomIcon("https://i.ibb.co/mk8HRKv/chafariz.png", icon_size=(25, 15))
-            ).add_to(chafarizes_layer)
-        chafarizes_layer.add_to(m)
-
-    if show_pocos and geojson_data.get("pocos"):
-        pocos_layer = folium.FeatureGroup(name="Poços")
-        for feature in geojson_data["pocos"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #0059b3; border-radius: 8px; padding: 8px; background-color: #f0f8ff;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #0059b3; border-bottom: 1px solid #ccc;'>💧 Poço Profundo</h4>"
-                "<p style='margin: 4px 0;'><strong>📍 Localidade:</strong> " + str(props.get("Localidade", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>📏 Profundidade:</strong> " + str(props.get("Profundida", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>💦 Vazão (L/h):</strong> " + str(props.get("Vazão_LH_2", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>⚡ Energia:</strong> " + str(props.get("Energia", "Não informado")) + "</p>"
-                "</div>"
+    # No modo página inteira o HTML do mapa é reaproveitado quando camadas, filtros e dados se repetem
+    html_mapa = None
+    if modo_mapa == "Página inteira":
+        chave_mapa = cache_mapa.chave(
+            camadas=camadas_ativas, agrupar=agrupar_marcadores,
+            selecoes=selecoes, zonas=zonas, produtor=produtor, tiles=tiles_camadas, limites=limites,
+            # Junções (filtros de Distrito e Zona) e ícones também mudam o HTML
+            versoes=dados.versao_dados(list(estrategias), extras=juncao.arquivos() + icones.arquivos()),
+        )
+        html_mapa = cache_mapa.cache.obter(chave_mapa)
+        if html_mapa is not None and not mapa.renovar_publicados(html_mapa):
+            html_mapa = None
+        perfil_rerun.medir(cache_mapa="acerto" if html_mapa is not None else "falta")
+
+    if html_mapa is None:
+        # Camadas de dados; fundos e controles ficam no mapa base (mapa.mapa_base).
+        # Os dados das camadas lidas de arquivo vão como JSON estático, que o
+        # navegador baixa uma vez por versão.
+        grupos = []
+        with perfil_rerun.etapa("montar camadas"):
+            for name, ativa in camadas_ativas.items():
+                if not ativa:
+                    continue
+                with perfil_rerun.etapa("montagem", camada=name):
+                    if name == "produtores":
+                        grupo = mapa.camada_produtores(df_filtrado, agrupar=agrupar_marcadores, completo=df)
+                        perfil_rerun.camada(name, estrategia=camadas.PONTOS, feicoes=len(df_filtrado))
+                    elif name in tiles_camadas:
+                        grupo = mapa.montar_camada(name, camadas.TILES, tiles_camadas[name])
+                    elif geojson_data.get(name):
+                        grupo = mapa.montar_camada(
+                            name, estrategias[name], geojson_data[name], agrupar=agrupar_marcadores,
+                            completo=carregadas[name], posicoes=posicoes_camadas.get(name),
+                        )
+                    else:
+                        continue
+                grupos.append(grupo)
+                if perfil_rerun.ativo:
+                    perfil_rerun.camada(name, bytes=mapa.bytes_enviados(grupo))
+
+    if modo_mapa == "Incremental":
+        # O mapa é criado uma vez no navegador; nos reruns o st_folium só troca as
+        # camadas, sem recarregar o Leaflet nem perder o zoom. Com o recorte ativo
+        # ele devolve os limites visíveis a cada movimento do mapa
+        with perfil_rerun.etapa("st_folium"):
+            saida_mapa = st_folium(
+                mapa.mapa_base(), key="mapa", width=1200, height=700,
+                feature_group_to_add=grupos, layer_control=folium.LayerControl(collapsed=True),
+                returned_objects=["bounds", "all_drawings"] if so_area_visivel else ["all_drawings"],
             )
 
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("Localidade", "Poço"),
-                icon=folium.CustomIcon("https://i.ibb.co/6JrpxXMT/water.png", icon_size=(23, 23))
-            ).add_to(pocos_layer)
-        pocos_layer.add_to(m)
-
-    if show_cisternas and geojson_data.get("cisternas"):
-        cisternas_layer = folium.FeatureGroup(name="Cisternas")
-        for feature in geojson_data["cisternas"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            Bairro_Loc = feature["properties"].get("Comunidade", "Sem nome")
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(f"Comunidade: {Bairro_Loc}", max_width=200),
-                tooltip="Cisternas",
-                icon=folium.CustomIcon("https://i.ibb.co/jvLz192m/water-tank.png", icon_size=(18, 18))
-            ).add_to(cisternas_layer)
-        cisternas_layer.add_to(m)
-
-    if show_acudes and geojson_data.get("acudes"):
-        folium.GeoJson(
-            geojson_data["acudes"],
-            name="Açudes",
-            style_function=lambda x: {'fillColor': '#026ac4', 'fillOpacity': 0.2, 'color': '#000000', 'weight': 1}
-        ).add_to(m)
-
-    if show_sistemas and geojson_data.get("sistemas"):
-        sistemas_layer = folium.FeatureGroup(name="Sistemas de Abastecimento")
-        for feature in geojson_data["sistemas"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            popup_info = (
-                "<strong>Comunidade:</strong> " + props.get("Comunidade", "Sem nome") + "<br>"
-                "<strong>Associação:</strong> " + props.get("Associacao", "Não informado") + "<br>"
-                "<strong>Ano:</strong> " + str(props.get("Ano", "Não informado")) + "<br>"
-                "<strong>Município:</strong> " + props.get("Municipio", "Não informado")
-            )
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("Comunidade", "Sem nome"),
-                icon=folium.CustomIcon(
-                    "https://i.ibb.co/sd8DxJQ5/water-tower.png",
-                    icon_size=(25, 25)
-                )
-            ).add_to(sistemas_layer)
-        sistemas_layer.add_to(m)
-
-    if show_saaeq and geojson_data.get("saaeq"):
-        saaeq_layer = folium.FeatureGroup(name="Sistemas SAAE")
-        for feature in geojson_data["saaeq"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #008080; border-radius: 8px; padding: 8px; background-color: #f0ffff;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #008080; border-bottom: 1px solid #ccc;'>💧 Sistemas SAAE</h4>"
-                "<p style='margin: 4px 0;'><strong>🚰 Sistema:</strong> " + str(props.get("Sistema principal", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>📍 Localidade:</strong> " + str(props.get("Comunidade", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>👷🏽 Operador:</strong> " + str(props.get("Operador", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>🏠 Ligações Ativas:</strong> " + str(props.get("Ligações Ativas", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>🕤 Hidrômetros:</strong> " + str(props.get("Hidrômetros", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>🚩 Captação:</strong> " + str(props.get("Captação", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>🔌 Enérgia:</strong> " + str(props.get("Energia", "Não informado")) + "</p>"
-                "</div>"
-            )
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("Sistema principal", "Sistema"),
-                icon=folium.CustomIcon("https://i.ibb.co/m56JXGqy/73016potablewater-109514.png", icon_size=(23, 23))
-            ).add_to(saaeq_layer)
-        saaeq_layer.add_to(m)
-
-    if show_outorgas and geojson_data.get("outorgas"):
-        outorgas_layer = folium.FeatureGroup(name="Outorgas")
-        for feature in geojson_data["outorgas"]["features"]:
-            coords = feature["geometry"]["coordinates"]
-            props = feature["properties"]
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #008080; border-radius: 8px; padding: 8px; background-color: #f0ffff;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #008080; border-bottom: 1px solid #ccc;'>📝 Outorga</h4>"
-                "<p style='margin: 4px 0;'><strong>📄 Tipo de Uso:</strong> " + str(props.get("TIPO_DE_US", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>🌊 Manancial:</strong> " + str(props.get("MANANCIAL", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>📅 Vigência:</strong> " + str(props.get("VIGÊNCIA", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>💧 Volume Outorgado:</strong> " + str(props.get("VOLUME_OUT", "Não informado")) + "</p>"
-                "</div>"
-            )
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("TIPO_DE_US", "Outorga"),
-                icon=folium.CustomIcon("https://i.ibb.co/kg8SpYRY/certificate.png", icon_size=(23, 23))
-            ).add_to(outorgas_layer)
-        outorgas_layer.add_to(m)
- 
-    folium.LayerControl(collapsed=True).add_to(m)
-    MousePosition().add_to(m)
-    Draw(
-    export=True,
-    draw_options={
-        "polyline": True,
-        "polygon": {"allowIntersection": False, "showArea": True},
-        "rectangle": {"showArea": True},
-        "circle": {"showArea": True},
-        "circlemarker": False
-    },
-    edit_options={"edit": True, "remove": True}
-).add_to(m)
-        
-    if show_comunidades and geojson_data.get("comunidades"):
-        Search(layer=comunidades_layer, search_label="Name", placeholder="🔍 Buscar comunidade").add_to(m)
-
-    folium_static(m, width=1200, height=700)
-    st.components.v1.html('''
-<script>
-    function areaInHectares(areaInSqMeters) {
-        return (areaInSqMeters / 10000).toFixed(2);
-    }
-
-    function getPolygonArea(layer) {
-        try {
-            var latlngs = layer.getLatLngs();
-            if (latlngs.length > 0 && Array.isArray(latlngs[0])) {
-                return L.GeometryUtil.geodesicArea(latlngs[0]);
-            }
-        } catch (e) {
-            return 0;
-        }
-        return 0;
-    }
-
-    function attachPopupWithArea(layer) {
-        let area = getPolygonArea(layer);
-        let hectares = areaInHectares(area);
-        let content = "<div style='font-family: Arial; font-size: 14px'><strong>📏 Área:</strong> " + hectares + " ha</div>";
-        layer.bindPopup(content);
-        layer.on('click', function () {
-            layer.openPopup();
-        });
-    }
-
-    map.on('draw:created', function (e) {
-        let layer = e.layer;
-        attachPopupWithArea(layer);
-        drawnItems.addLayer(layer);
-    });
-</script>
-''', height=0)
+        # Desenhos feitos no mapa: medidas calculadas aqui e o que cai dentro
+        # de cada polígono (cisternas, poços e produtores filtrados)
+        desenhos = (saida_mapa or {}).get("all_drawings") or []
+        if desenhos:
+            with perfil_rerun.etapa("desenhos"):
+                resumo, detalhes = resumir_desenhos(desenhos, df, df_filtrado)
+            st.subheader("📐 Desenhos no mapa")
+            st.dataframe(resumo, hide_index=True)
+            for numero, dentro in detalhes:
+                with st.expander(f"Desenho {numero}: o que está dentro"):
+                    for nome, tabela in dentro.items():
+                        st.markdown(f"**{nome}** ({len(tabela)})")
+                        if nome == "Produtores":
+                            tabela = tabela[["PRODUTOR", "APELIDO", "FAZENDA", "DISTRITO"]]
+                        st.dataframe(tabela, hide_index=True)
+    else:
+        if html_mapa is None:
+            with perfil_rerun.etapa("serializar HTML"):
+                m = mapa.mapa_base()
+                for grupo in grupos:
+                    grupo.add_to(m)
+                folium.LayerControl(collapsed=True).add_to(m)
+                html_mapa = folium.Figure().add_child(m).render()
+            cache_mapa.cache.guardar(chave_mapa, html_mapa)
+        if perfil_rerun.ativo:
+            perfil_rerun.medir(html_bytes=len(html_mapa.encode("utf-8")))
+        st.components.v1.html(html_mapa, width=1200, height=710)
+        st.caption("📐 As medidas dos desenhos e o que cai dentro deles aparecem no modo incremental.")
 
 
 else:
@@ -595,6 +472,49 @@ st.title("📋 Dados dos Produtores")
 colunas = ["TECNICO", "PRODUTOR", "APELIDO", "FAZENDA", "DISTRITO", "ORDENHA?", "INSEMINA?", "LATICINIO", "COMPRADOR"]
 st.dataframe(df_filtrado[colunas], use_container_width=True)
 
+# Exportação em arquivo (exportacao.py). Os produtores, com nomes, só pelo
+# st.download_button: o arquivo é gerado no clique e servido só a esta sessão,
+# com as colunas da tabela (CPF e RG ficam de fora). As camadas, públicas, são
+# gravadas aos lotes em static/exportacoes e baixadas do servidor de arquivos
+# estáticos, sem passar inteiras pela memória
+with st.expander("⬇️ Exportar dados", expanded=False):
+    formato = st.radio("Formato", list(exportacao.FORMATOS), horizontal=True)
+    area_exportacao = area_desenhada(desenhos)
+    so_desenhos = st.checkbox(
+        "Só dentro dos polígonos desenhados", disabled=area_exportacao is None,
+        help="Desenhe polígonos ou círculos no mapa, no modo incremental; as feições são recortadas por eles.",
+    )
+    poligono = area_exportacao if so_desenhos else None
+    campos_produtores = colunas + ["PRODUCAO", "LATITUDE", "LONGITUDE"]
+    st.download_button(
+        f"📥 Produtores filtrados ({len(df_filtrado)})",
+        data=functools.partial(exportar_produtores, df_filtrado, campos_produtores, formato, poligono),
+        file_name=exportacao.nome_arquivo("Produtores filtrados", formato),
+        mime=exportacao.TIPOS_MIME[formato], on_click="ignore", disabled=df_filtrado.empty,
+    )
+    exportaveis = {camadas.CAMADAS[name]["nome"]: name for name in estrategias}
+    escolhidas = st.multiselect("Camadas", list(exportaveis), help="Camadas marcadas no controle de camadas.")
+    if st.button("Preparar arquivos", disabled=not escolhidas):
+        with perfil_rerun.etapa("exportação"):
+            for rotulo in escolhidas:
+                name = exportaveis[rotulo]
+                try:
+                    url, arquivo, tamanho = exportar_camada(
+                        name, formato, poligono, alvo, zonas if juncao_disponivel else []
+                    )
+                except FileNotFoundError:
+                    st.warning(f"Arquivo {dados.ARQUIVOS_CAMADAS[name]} não encontrado; {rotulo} não foi exportada.")
+                    continue
+                except ValueError as erro:
+                    # Arquivo corrompido ou acima do limite do servidor
+                    st.warning(f"{rotulo}: {erro}")
+                    continue
+                st.markdown(
+                    f'<a href="{html.escape(urllib.parse.quote(url))}" download="{html.escape(arquivo)}">'
+                    f"📥 {html.escape(arquivo)}</a> ({tamanho / 1024:,.0f} KB)",
+                    unsafe_allow_html=True,
+                )
+
 # Dados de rodapé
 
 st.markdown(
@@ -620,3 +540,5 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+perfil_rerun.finalizar()
@@ -0,0 +1,345 @@
+"""Benchmark dos caminhos críticos do atlas: leitura, filtros e montagem do mapa.
+
+Roda sem navegador, chamando direto dados.py, filtros.py e mapa.py, sobre
+os arquivos reais e sobre cópias ampliadas deles (produtores e feições
+repetidos com as coordenadas deslocadas). Cada escala roda numa pasta
+temporária própria; a escala 1 leva junto os artefatos e as tiles já
+gerados, as ampliadas não. Mede:
+
+- leitura fria (sem cache) e quente dos produtores e de cada camada, e a
+  leitura fria de todas as camadas uma a uma, com o json padrão e com o
+  decodificador de dados.py, e em paralelo (dados.carregar_camadas);
+- o índice de filtros e as combinações de Técnico, Distrito e Comprador;
+- montagem das camadas, serialização do HTML e bytes enviados por conjunto
+  de camadas.
+
+Com --dados a origem é outra pasta, como a gerada por gerar_sinteticos.py,
+em vez da pasta do app.
+
+O resultado é gravado em DIR_RESULTADOS como JSON, para comparar execuções.
+
+Uso:
+    python benchmark.py                          # escalas 1, 10 e 100
+    python benchmark.py --escalas 1 10 --repeticoes 5
+    python benchmark.py --dados sinteticos --escalas 1
+    python benchmark.py --comparar benchmarks/antes.json benchmarks/depois.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+
+import camadas
+import dados
+import filtros
+import icones
+import ingerir_produtores
+import mapa
+import mvt
+
+DIR_RESULTADOS = "benchmarks"
+ESCALAS = (1, 10, 100)
+REPETICOES = 3
+# Deslocamento máximo, em graus, das cópias de cada feição nas escalas ampliadas
+DESLOCAMENTO = 0.25
+SEMENTE = 42
+
+CONJUNTOS = {
+    "padrao": [chave for chave, camada in camadas.CAMADAS.items() if camada.get("padrao")] + ["produtores"],
+    "pontos": [chave for chave, camada in camadas.CAMADAS.items() if camada["geometria"] == camadas.PONTO],
+    "linhas_poligonos": [chave for chave, camada in camadas.CAMADAS.items() if camada["geometria"] != camadas.PONTO],
+    "todas": list(camadas.CAMADAS),
+}
+
+
+def cronometrar(funcao, repeticoes=REPETICOES, antes=None):
+    """Mediana, em segundos, de repeticoes chamadas; antes roda fora do tempo."""
+    tempos = []
+    for _ in range(repeticoes):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tempos), 6)
+
+
+def _deslocar(coordenadas, dx, dy):
+    if coordenadas and isinstance(coordenadas[0], (int, float)):
+        return [coordenadas[0] + dx, coordenadas[1] + dy, *coordenadas[2:]]
+    return [_deslocar(c, dx, dy) for c in coordenadas]
+
+
+def ampliar_geojson(geojson, fator, rng):
+    """Cópia com cada feição repetida fator vezes; as cópias vêm deslocadas."""
+    features = list(geojson["features"])
+    for _ in range(fator - 1):
+        for feature in geojson["features"]:
+            geometria = feature.get("geometry")
+            if geometria:
+                dx, dy = rng.uniform(-DESLOCAMENTO, DESLOCAMENTO, 2)
+                geometria = dict(geometria, coordinates=_deslocar(geometria["coordinates"], dx, dy))
+            features.append(dict(feature, geometry=geometria))
+    return dict(geojson, features=features)
+
+
+def ampliar_planilha(df, fator, rng):
+    """Planilha com as linhas repetidas fator vezes e as coordenadas das cópias deslocadas."""
+    copias = [df]
+    for copia in range(1, fator):
+        nova = df.copy()
+        lat_lon = nova["COORDENADAS"].str.split(",", expand=True).apply(pd.to_numeric, errors="coerce")
+        lat = lat_lon[0] + rng.uniform(-DESLOCAMENTO, DESLOCAMENTO, len(nova))
+        lon = lat_lon[1] + rng.uniform(-DESLOCAMENTO, DESLOCAMENTO, len(nova))
+        nova["COORDENADAS"] = lat.astype(str) + "," + lon.astype(str)
+        nova["PRODUTOR"] = nova["PRODUTOR"] + f" {copia}"
+        copias.append(nova)
+    return pd.concat(copias, ignore_index=True)
+
+
+def preparar_pasta(origem, destino, fator):
+    """Monta em destino a planilha e as camadas da escala, com os ícones do app."""
+    rng = np.random.default_rng(SEMENTE)
+    os.symlink(os.path.abspath(icones.DIR_ICONES), os.path.join(destino, icones.DIR_ICONES))
+    planilha = os.path.join(origem, dados.ARQUIVO_PRODUTORES)
+    if fator == 1:
+        if os.path.exists(planilha):
+            shutil.copy2(planilha, destino)
+        else:
+            # Só o Parquet, como o de gerar_sinteticos.py
+            shutil.copy2(dados.caminho_colunar(planilha), destino)
+        for arquivo in dados.ARQUIVOS_CAMADAS.values():
+            if os.path.exists(os.path.join(origem, arquivo)):
+                shutil.copy2(os.path.join(origem, arquivo), destino)
+        # Artefatos e tiles continuam valendo: a cópia preserva mtime e tamanho
+        for pasta in (dados.DIR_ARTEFATOS, mvt.DIR_TILES):
+            if os.path.isdir(os.path.join(origem, pasta)):
+                shutil.copytree(os.path.join(origem, pasta), os.path.join(destino, pasta))
+        return
+    ampliar_planilha(pd.read_excel(planilha), fator, rng).to_excel(
+        os.path.join(destino, dados.ARQUIVO_PRODUTORES), index=False
+    )
+    for arquivo in dados.ARQUIVOS_CAMADAS.values():
+        caminho = os.path.join(origem, arquivo)
+        if not os.path.exists(caminho):
+            continue
+        with open(caminho, encoding="utf-8") as f:
+            geojson = json.load(f)
+        with open(os.path.join(destino, arquivo), "w", encoding="utf-8") as f:
+            json.dump(ampliar_geojson(geojson, fator, rng), f, ensure_ascii=False)
+
+
+def medir_leitura(repeticoes):
+    resultado = {}
+    if os.path.exists(dados.ARQUIVO_PRODUTORES):
+        # Sem o Parquet o app lê a planilha com o openpyxl
+        resultado["planilha_s"] = cronometrar(dados.carregar_produtores, repeticoes, antes=dados.limpar_cache)
+        ingerir_produtores.ingerir()
+    resultado["produtores_frio_s"] = cronometrar(dados.carregar_produtores, repeticoes, antes=dados.limpar_cache)
+    resultado["produtores_quente_s"] = cronometrar(dados.carregar_produtores, repeticoes)
+    resultado["camadas"] = {}
+    for chave in dados.ARQUIVOS_CAMADAS:
+        if not os.path.exists(dados.ARQUIVOS_CAMADAS[chave]):
+            continue
+        resultado["camadas"][chave] = {
+            "frio_s": cronometrar(lambda: dados.carregar_camada(chave), repeticoes, antes=dados.limpar_cache),
+            "quente_s": cronometrar(lambda: dados.carregar_camada(chave), repeticoes),
+            "feicoes": len(dados.carregar_camada(chave)["features"]),
+        }
+    resultado["todas_camadas"] = medir_leitura_camadas(repeticoes)
+    return resultado
+
+
+def medir_leitura_camadas(repeticoes):
+    """Leitura fria de todas as camadas, uma a uma (com o json padrão e com DECODIFICADOR) e em paralelo."""
+    chaves = [chave for chave in dados.ARQUIVOS_CAMADAS if os.path.exists(dados.ARQUIVOS_CAMADAS[chave])]
+
+    def uma_a_uma():
+        for chave in chaves:
+            dados.carregar_camadas([chave])
+
+    decodificador = dados.DECODIFICADOR
+    try:
+        dados.DECODIFICADOR = "json"
+        json_serial = cronometrar(uma_a_uma, repeticoes, antes=dados.limpar_cache)
+    finally:
+        dados.DECODIFICADOR = decodificador
+    return {
+        "decodificador": decodificador,
+        "json_serial_s": json_serial,
+        "serial_s": cronometrar(uma_a_uma, repeticoes, antes=dados.limpar_cache),
+        "paralelo_s": cronometrar(lambda: dados.carregar_camadas(chaves), repeticoes, antes=dados.limpar_cache),
+    }
+
+
+def selecoes_de_teste(indice):
+    """Uma seleção por combinação de colunas, com os dois valores mais frequentes de cada."""
+    df = indice.df
+    selecoes = {}
+    for tamanho in range(1, len(filtros.COLUNAS_FILTRO) + 1):
+        for colunas in itertools.combinations(filtros.COLUNAS_FILTRO, tamanho):
+            selecoes["+".join(colunas)] = {
+                coluna: df[coluna].value_counts().index[:2].tolist() for coluna in colunas
+            }
+    return selecoes
+
+
+def medir_filtros(df, repeticoes):
+    resultado = {
+        "indice_s": cronometrar(lambda: filtros.IndiceFiltros(df), repeticoes),
+        "consultas": {},
+    }
+    indice = filtros.IndiceFiltros(df)
+    for nome, selecao in selecoes_de_teste(indice).items():
+        resultado["consultas"][nome] = {
+            "tempo_s": cronometrar(lambda: indice.filtrar(selecao), repeticoes),
+            "linhas": len(indice.filtrar(selecao)),
+        }
+    return resultado
+
+
+def montar_grupos(chaves, df):
+    """Camadas do conjunto como o app.py as monta, pela estratégia de cada uma."""
+    grupos = []
+    for chave in chaves:
+        if chave == "produtores":
+            grupos.append(mapa.camada_produtores(df))
+            continue
+        if not os.path.exists(dados.ARQUIVOS_CAMADAS[chave]):
+            continue
+        estrategia = mapa.estrategia(chave)
+        if estrategia == camadas.TILES:
+            conteudo = mapa.tiles_da_camada(chave)
+        else:
+            conteudo = dados.carregar_camada(chave)
+        grupos.append(mapa.montar_camada(chave, estrategia, conteudo))
+    return grupos
+
+
+def renderizar(grupos):
+    m = mapa.mapa_base()
+    for grupo in grupos:
+        grupo.add_to(m)
+    folium.LayerControl(collapsed=True).add_to(m)
+    return folium.Figure().add_child(m).render()
+
+
+def medir_mapa(df, repeticoes):
+    """Tempo de montagem e de montagem mais serialização (html_s) de cada conjunto."""
+    resultado = {}
+    for nome, chaves in CONJUNTOS.items():
+        grupos = montar_grupos(chaves, df)
+        html = renderizar(grupos)
+        resultado[nome] = {
+            "montar_s": cronometrar(lambda: montar_grupos(chaves, df), repeticoes),
+            "html_s": cronometrar(lambda: renderizar(montar_grupos(chaves, df)), repeticoes),
+            "html_bytes": len(html.encode("utf-8")),
+            "dados_bytes": sum(mapa.bytes_enviados(g) or 0 for g in grupos),
+            "estrategias": {
+                chave: mapa.estrategia(chave) if chave != "produtores" else camadas.PONTOS
+                for chave in chaves
+                if chave == "produtores" or os.path.exists(dados.ARQUIVOS_CAMADAS[chave])
+            },
+        }
+    return resultado
+
+
+def rodar_escala(fator, repeticoes, manter=False, origem="."):
+    app = os.getcwd()
+    pasta = tempfile.mkdtemp(prefix=f"atlas-bench-{fator}x-")
+    try:
+        preparar_pasta(origem, pasta, fator)
+        os.chdir(pasta)
+        dados.limpar_cache()
+        resultado = {"leitura": medir_leitura(repeticoes)}
+        df = dados.carregar_produtores()
+        resultado["produtores"] = len(df)
+        resultado["filtros"] = medir_filtros(df, repeticoes)
+        resultado["mapa"] = medir_mapa(df, repeticoes)
+        return resultado
+    finally:
+        os.chdir(app)
+        dados.limpar_cache()
+        if manter:
+            print(f"  dados da escala {fator}x mantidos em {pasta}")
+        else:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+def _achatar(valor, prefixo=""):
+    if isinstance(valor, dict):
+        for chave, item in valor.items():
+            yield from _achatar(item, f"{prefixo}.{chave}" if prefixo else str(chave))
+    elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        yield prefixo, valor
+
+
+def comparar(caminho_a, caminho_b):
+    """Mostra as medidas em comum de duas execuções e a razão B/A."""
+    with open(caminho_a, encoding="utf-8") as f:
+        a = dict(_achatar(json.load(f)["escalas"]))
+    with open(caminho_b, encoding="utf-8") as f:
+        b = dict(_achatar(json.load(f)["escalas"]))
+    largura = max(len(chave) for chave in a)
+    for chave in a:
+        if chave in b:
+            razao = f"{b[chave] / a[chave]:6.2f}x" if a[chave] else "     -"
+            print(f"{chave:<{largura}}  {a[chave]:>14.6g}  {b[chave]:>14.6g}  {razao}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS))
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--dados", default=".", help="pasta com a planilha e as camadas (padrão: a do app)")
+    parser.add_argument("--saida", help=f"arquivo de resultado (padrão: {DIR_RESULTADOS}/<data>.json)")
+    parser.add_argument("--manter", action="store_true", help="não apaga os dados gerados para cada escala")
+    parser.add_argument("--comparar", nargs=2, metavar=("A", "B"), help="compara dois resultados gravados")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    if max(args.escalas) > 1 and not os.path.exists(os.path.join(args.dados, dados.ARQUIVO_PRODUTORES)):
+        parser.error(f"as escalas ampliadas partem de {dados.ARQUIVO_PRODUTORES}, que não está em {args.dados}")
+
+    resultado = {
+        "quando": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "dados": os.path.abspath(args.dados),
+        "escalas": {},
+    }
+    for fator in args.escalas:
+        inicio = time.perf_counter()
+        print(f"escala {fator}x...")
+        resultado["escalas"][str(fator)] = medida = rodar_escala(fator, args.repeticoes, args.manter, args.dados)
+        todas = medida["mapa"]["todas"]
+        todas_camadas = medida["leitura"]["todas_camadas"]
+        print(
+            f"  {medida['produtores']} produtores, produtores frio {medida['leitura']['produtores_frio_s'] * 1000:.1f} ms, "
+            f"camadas frio {todas_camadas['json_serial_s'] * 1000:.0f} ms em série com json, "
+            f"{todas_camadas['paralelo_s'] * 1000:.0f} ms em paralelo com {todas_camadas['decodificador']}, "
+            f"mapa completo {todas['html_s'] * 1000:.0f} ms / {todas['html_bytes'] / 1024:.0f} KB "
+            f"({time.perf_counter() - inicio:.0f} s)"
+        )
+
+    saida = args.saida or os.path.join(DIR_RESULTADOS, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"resultado gravado em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Busca de produtores por nome, apelido e fazenda.
+
+O índice é montado uma vez por versão dos dados sobre os termos
+normalizados (sem acento e em minúsculas) de PRODUTOR, APELIDO e FAZENDA:
+um vocabulário ordenado atende buscas por prefixo com bisect, e um índice de
+trigramas atende trechos no meio das palavras. Assim "joao" encontra
+"JOÃO" e "vasc" encontra "Vasconcelos" sem varrer a tabela.
+"""
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+import dados
+
+# Peso de cada coluna no ranking
+CAMPOS_BUSCA = {"PRODUTOR": 3.0, "APELIDO": 2.0, "FAZENDA": 1.0}
+
+# Peso de cada tipo de casamento entre o termo buscado e o termo indexado
+_EXATO, _PREFIXO, _TRECHO = 1.0, 0.7, 0.4
+
+
+def normalizar(texto):
+    """Remove acentos e converte para minúsculas."""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def termos(texto):
+    return re.findall(r"[a-z0-9]+", normalizar(texto))
+
+
+def _trigramas(termo):
+    return {termo[i:i + 3] for i in range(len(termo) - 2)}
+
+
+class IndiceBusca:
+    def __init__(self, df, campos=CAMPOS_BUSCA):
+        # termo -> {posição da linha: maior peso entre as colunas em que aparece}
+        self._ocorrencias = defaultdict(dict)
+        for coluna, peso in campos.items():
+            for posicao, valor in enumerate(df[coluna].tolist()):
+                if valor is None or valor != valor:
+                    continue
+                for termo in termos(valor):
+                    linhas = self._ocorrencias[termo]
+                    linhas[posicao] = max(peso, linhas.get(posicao, 0.0))
+        self._vocabulario = sorted(self._ocorrencias)
+        self._por_trigrama = defaultdict(set)
+        for termo in self._vocabulario:
+            for trigrama in _trigramas(termo):
+                self._por_trigrama[trigrama].add(termo)
+
+    def _casamentos(self, consulta):
+        """Termos do vocabulário que casam com o termo consultado, com o peso do casamento."""
+        casamentos = {}
+        inicio = bisect.bisect_left(self._vocabulario, consulta)
+        for termo in self._vocabulario[inicio:]:
+            if not termo.startswith(consulta):
+                break
+            casamentos[termo] = _EXATO if termo == consulta else _PREFIXO
+        if len(consulta) >= 3:
+            candidatos = set.intersection(*(self._por_trigrama.get(t, set()) for t in _trigramas(consulta)))
+            for termo in candidatos:
+                if termo not in casamentos and consulta in termo:
+                    casamentos[termo] = _TRECHO
+        return casamentos
+
+    def buscar(self, texto):
+        """Posições das linhas que contêm todos os termos buscados, da mais relevante à menos."""
+        pontuacao = None
+        for consulta in termos(texto):
+            linhas = {}
+            for termo, peso_casamento in self._casamentos(consulta).items():
+                for posicao, peso_coluna in self._ocorrencias[termo].items():
+                    linhas[posicao] = max(peso_casamento * peso_coluna, linhas.get(posicao, 0.0))
+            if pontuacao is None:
+                pontuacao = linhas
+            else:
+                pontuacao = {p: pontuacao[p] + s for p, s in linhas.items() if p in pontuacao}
+            if not pontuacao:
+                break
+        if not pontuacao:
+            return np.empty(0, dtype=np.intp)
+        ordem = sorted(pontuacao, key=lambda p: (-pontuacao[p], p))
+        return np.array(ordem, dtype=np.intp)
+
+
+def indice(df):
+    """Índice de busca do DataFrame, construído uma vez por versão dos dados."""
+    return dados.derivado(df, IndiceBusca)
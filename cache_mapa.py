@@ -0,0 +1,64 @@
+"""Cache do HTML renderizado do mapa.
+
+A mesma combinação de camadas e filtros se repete muito entre os usuários.
+O HTML gerado pelo folium fica guardado, por processo, sob uma chave
+calculada a partir das camadas marcadas, dos filtros e das versões dos
+dados, de modo que uma visualização repetida não precisa montar os objetos
+do folium nem renderizar o template de novo. Os itens menos usados saem
+primeiro quando o limite de itens ou de bytes é atingido.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+MAX_ITENS = 32
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class CacheHTML:
+    def __init__(self, max_itens=MAX_ITENS, max_bytes=MAX_BYTES):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            self._itens.move_to_end(chave)
+            return item[0]
+
+    def guardar(self, chave, html):
+        tamanho = len(html.encode("utf-8"))
+        if tamanho > self.max_bytes:
+            return
+        with self._trava:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= anterior[1]
+            self._itens[chave] = (html, tamanho)
+            self.bytes += tamanho
+            while len(self._itens) > self.max_itens or self.bytes > self.max_bytes:
+                _, (_, removido) = self._itens.popitem(last=False)
+                self.bytes -= removido
+
+    def __len__(self):
+        return len(self._itens)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.bytes = 0
+
+
+cache = CacheHTML()
+
+
+def chave(**estado):
+    """Chave do cache a partir de um estado serializável (camadas, filtros, versões...)."""
+    texto = json.dumps(estado, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
@@ -0,0 +1,255 @@
+"""Registro das camadas do atlas.
+
+Cada camada é descrita uma única vez, na ordem da barra lateral: nome, grupo,
+arquivo, tipo de geometria, estilo, popup e, se for o caso, a estratégia de
+desenho e se a área e o perímetro das feições entram no popup. dados.py
+tira daqui os arquivos, app.py monta a barra lateral e o mapa a partir do
+registro, e gerar_artefatos.py e gerar_tiles.py sabem quais propriedades
+guardar.
+
+Sem estratégia declarada, o mapa escolhe o caminho mais leve disponível para
+cada camada (ver mapa.estrategia): vector tiles, GeoJSON simplificado ou
+GeoJSON original para linhas e polígonos; marcadores criados no navegador,
+agrupados a partir de mapa.LIMIAR_CLUSTER, para pontos. Camadas de pontos
+densas vão, de longe, agregadas em células (ver agregacao.py), com a soma
+das propriedades numéricas declaradas em "somas".
+
+Os arquivos duplicados da pasta (outorga.geojson e outorgas.geojson de
+outorgado.geojson, saae.geojson de saaeq.geojson, Assentamentos.geojson de
+areas_reforma.geojson, Pocos.geojson de pocos_profundos.geojson) não são
+usados.
+"""
+import popups
+
+PONTO, LINHA, POLIGONO = "ponto", "linha", "poligono"
+
+# Estratégias de desenho
+TILES = "tiles"
+SIMPLIFICADA = "simplificada"
+GEOJSON = "geojson"
+PONTOS = "pontos"
+
+GRUPOS = {
+    "infraestrutura": "🏘️ Infraestrutura",
+    "hidricos": "💧 Recursos Hídricos",
+}
+
+
+def _contorno(preenchimento):
+    """Estilo dos polígonos preenchidos com contorno preto."""
+    return {"fillColor": preenchimento, "fillOpacity": 0.2, "color": "#000000", "weight": 1}
+
+
+CAMADAS = {
+    "distrito": {
+        "nome": "Distritos", "grupo": "infraestrutura", "padrao": True,
+        "arquivo": "distrito.geojson", "geometria": POLIGONO,
+        "estilo": _contorno("#9fe2fc"),
+    },
+    "distritos_ponto": {
+        "nome": "Sede Distritos", "grupo": "infraestrutura",
+        "arquivo": "distritos_ponto.geojson", "geometria": PONTO, "icone": "sede",
+        "popup": {
+            "campos": [("Name", "Distrito:", "Sem nome")],
+            "tooltip": (None, None),
+            "largura": 200,
+        },
+    },
+    "comunidades": {
+        "nome": "Comunidades", "grupo": "infraestrutura",
+        "arquivo": "comunidades.geojson", "geometria": PONTO, "icone": "comunidade",
+        "busca": "🔍 Buscar comunidade",
+        "popup": {
+            "titulo": "🏘️ Comunidade",
+            "cor": "#4CAF50", "cor_titulo": "#2E7D32", "fundo": "#f0fff0",
+            "campos": [
+                ("Name", "📛 Nome:", "Sem nome"),
+                ("Distrito", "📍 Distrito:", "Não informado"),
+            ],
+            "tooltip": ("Name", "Sem nome"),
+        },
+    },
+    "urbanas": {
+        "nome": "Áreas Urbanas", "grupo": "infraestrutura",
+        "arquivo": "urbanas.geojson", "geometria": POLIGONO,
+        "estilo": _contorno("#9e064d"),
+    },
+    # Vem da planilha (dados.carregar_produtores), não de um GeoJSON
+    "produtores": {
+        "nome": "Produtores", "grupo": "infraestrutura",
+        "arquivo": None, "geometria": PONTO, "icone": "fazenda",
+        "somas": [("PRODUCAO", "🥛 Produção dia total")],
+        "popup": {
+            "campos": [
+                ("APELIDO", "Apelido:", "Não informado"),
+                ("PRODUCAO", "Produção dia:", "Não informado"),
+                ("FAZENDA", "Fazenda:", "Não informado"),
+                ("DISTRITO", "Distrito:", "Não informado"),
+                ("ESCOLARIDADE", "Escolaridade:", "Não informado"),
+            ],
+            "tooltip": ("PRODUTOR", None),
+        },
+    },
+    "apicultura": {
+        "nome": "Apicultores/as", "grupo": "infraestrutura",
+        "arquivo": "apicultura.geojson", "geometria": PONTO, "icone": "apicultura",
+        "popup": {
+            "titulo": "🍯 Apicultores/as",
+            "cor": "#ffb300", "cor_titulo": "#ff6f00", "fundo": "#fff8e1",
+            "campos": [("Nome", "📛 Nome:", "Sem nome")],
+            "tooltip": ("Nome", "Sem nome"),
+        },
+    },
+    # Polígonos com tooltip e popup, que as vector tiles não têm; o popup
+    # mostra a área e o perímetro de cada assentamento (ver medidas.py)
+    "areas_reforma": {
+        "nome": "Assentamentos", "grupo": "infraestrutura",
+        "arquivo": "areas_reforma.geojson", "geometria": POLIGONO, "estrategia": GEOJSON,
+        "estilo": {"fillColor": "#ff7800", "color": "red", "weight": 1, "fillOpacity": 0.4},
+        "tooltip": ("Name", "Nome:", "Sem Nome"), "campo_popup": ("Name", "Sem Nome"), "medidas": True,
+    },
+    "estradas": {
+        "nome": "Estradas", "grupo": "infraestrutura",
+        "arquivo": "estradas.geojson", "geometria": LINHA,
+        "estilo": {"color": "#802f04", "weight": 1},
+    },
+    "escolas": {
+        "nome": "Escolas", "grupo": "infraestrutura",
+        "arquivo": "escolas.geojson", "geometria": PONTO, "icone": "escola",
+        "popup": {
+            "titulo": "🏫 Escola Municipal",
+            "cor": "#2A4D9B", "fundo": "#f9f9f9",
+            "campos": [
+                ("no_entidad", "📛 Nome:", "Sem nome"),
+                ("endereco", "📍 Endereço:", "Não informado"),
+                ("fone_1", "📞 Contato:", "Não informado"),
+                ("no_localiz", "🧭 Localização:", "Não informado"),
+            ],
+            "tooltip": ("no_entidad", "Sem nome"),
+        },
+    },
+    "postos": {
+        "nome": "Postos de Saúde", "grupo": "infraestrutura",
+        "arquivo": "postos.geojson", "geometria": PONTO, "icone": "posto",
+        "popup": {
+            "titulo": "🏥 Postos de Saúde",
+            "cor": "#2A4D9B", "fundo": "#f9f9f9",
+            "campos": [
+                ("nome", "📛 Posto:", "Sem nome"),
+                ("endereco", "📍 Endereço:", "Não informado"),
+                ("bairro", "📞 Bairro:", "Não informado"),
+                ("municipio", "🧭 Município:", "Não informado"),
+            ],
+            "tooltip": ("nome", "Sem nome"),
+        },
+    },
+    "chafarizes": {
+        "nome": "Chafarizes", "grupo": "hidricos",
+        "arquivo": "Chafarizes.geojson", "geometria": PONTO, "icone": "chafariz",
+        "popup": {
+            "campos": [],
+            "tooltip": (None, "Chafariz"),
+        },
+    },
+    "pocos": {
+        "nome": "Poços", "grupo": "hidricos",
+        "arquivo": "pocos_profundos.geojson", "geometria": PONTO, "icone": "poco",
+        "somas": [("Vazão_LH_2", "💦 Vazão total (L/h)")],
+        "popup": {
+            "titulo": "💧 Poço Profundo",
+            "cor": "#0059b3", "fundo": "#f0f8ff",
+            "campos": [
+                ("Localidade", "📍 Localidade:", "Não informado"),
+                ("Profundida", "📏 Profundidade:", "Não informado"),
+                ("Vazão_LH_2", "💦 Vazão (L/h):", "Não informado"),
+                ("Energia", "⚡ Energia:", "Não informado"),
+            ],
+            "tooltip": ("Localidade", "Poço"),
+        },
+    },
+    "cisternas": {
+        "nome": "Cisternas", "grupo": "hidricos",
+        "arquivo": "cisternas.geojson", "geometria": PONTO, "icone": "cisterna",
+        "popup": {
+            "campos": [("Comunidade", "Comunidade:", "Sem nome")],
+            "tooltip": (None, "Cisternas"),
+            "largura": 200,
+        },
+    },
+    "sistemas": {
+        "nome": "Sistemas de Abastecimento", "grupo": "hidricos",
+        "arquivo": "Sistemas de Abastecimento.geojson", "geometria": PONTO, "icone": "sistema",
+        "popup": {
+            "campos": [
+                ("Comunidade", "Comunidade:", "Sem nome"),
+                ("Associacao", "Associação:", "Não informado"),
+                ("Ano", "Ano:", "Não informado"),
+                ("Municipio", "Município:", "Não informado"),
+            ],
+            "tooltip": ("Comunidade", "Sem nome"),
+        },
+    },
+    "saaeq": {
+        "nome": "Sistemas SAAE", "grupo": "hidricos",
+        "arquivo": "saaeq.geojson", "geometria": PONTO, "icone": "saae",
+        "popup": {
+            "titulo": "💧 Sistemas SAAE",
+            "cor": "#008080", "fundo": "#f0ffff",
+            "campos": [
+                ("Sistema principal", "🚰 Sistema:", "Não informado"),
+                ("Comunidade", "📍 Localidade:", "Não informado"),
+                ("Operador", "👷🏽 Operador:", "Não informado"),
+                ("Ligações Ativas", "🏠 Ligações Ativas:", "Não informado"),
+                ("Hidrômetros", "🕤 Hidrômetros:", "Não informado"),
+                ("Captação", "🚩 Captação:", "Não informado"),
+                ("Energia", "🔌 Enérgia:", "Não informado"),
+            ],
+            "tooltip": ("Sistema principal", "Sistema"),
+        },
+    },
+    "outorgas": {
+        "nome": "Outorgas", "grupo": "hidricos",
+        "arquivo": "outorgado.geojson", "geometria": PONTO, "icone": "outorga",
+        "popup": {
+            "titulo": "📝 Outorga",
+            "cor": "#008080", "fundo": "#f0ffff",
+            "campos": [
+                ("TIPO_DE_US", "📄 Tipo de Uso:", "Não informado"),
+                ("MANANCIAL", "🌊 Manancial:", "Não informado"),
+                ("VIGÊNCIA", "📅 Vigência:", "Não informado"),
+                ("VOLUME_OUT", "💧 Volume Outorgado:", "Não informado"),
+            ],
+            "tooltip": ("TIPO_DE_US", "Outorga"),
+        },
+    },
+    "acudes": {
+        "nome": "Açudes", "grupo": "hidricos",
+        "arquivo": "acudes.geojson", "geometria": POLIGONO,
+        "estilo": _contorno("#026ac4"),
+    },
+}
+
+
+def do_grupo(grupo):
+    """(chave, camada) das camadas do grupo, na ordem do registro."""
+    return [(chave, camada) for chave, camada in CAMADAS.items() if camada["grupo"] == grupo]
+
+
+def arquivos():
+    """Arquivo de cada camada lida de GeoJSON."""
+    return {chave: camada["arquivo"] for chave, camada in CAMADAS.items() if camada["arquivo"]}
+
+
+def popups_declarados():
+    """Spec do popup de cada camada de pontos."""
+    return {chave: camada["popup"] for chave, camada in CAMADAS.items() if "popup" in camada}
+
+
+def propriedades(chave):
+    """Propriedades das feições usadas pelo mapa; as demais podem ser descartadas."""
+    camada = CAMADAS[chave]
+    if "popup" in camada:
+        somas = [campo for campo, _ in camada.get("somas", [])]
+        return list(dict.fromkeys(popups.colunas(camada["popup"]) + somas))
+    campos = [camada.get("tooltip", (None,))[0], camada.get("campo_popup", (None,))[0]]
+    return list(dict.fromkeys(c for c in campos if c))
@@ -0,0 +1,78 @@
+"""Cubo de agregados dos produtores para os indicadores e os totais por grupo.
+
+Os produtores são agrupados, uma vez por versão dos dados, por todas as
+combinações de Técnico, Distrito, Comprador, Ordenha e Inseminação, com a
+quantidade de produtores, a soma da produção diária e quantos informaram
+produção, ordenham e inseminam. Cada combinação de filtros vira a seleção
+de algumas linhas do cubo, bem menor que a planilha, e os indicadores e os
+totais por grupo saem da soma delas, sem varrer o DataFrame de novo.
+"""
+import numpy as np
+import pandas as pd
+
+import dados
+
+DIMENSOES = ["TECNICO", "DISTRITO", "COMPRADOR", "ORDENHA?", "INSEMINA?"]
+MEDIDAS = ["produtores", "producao", "com_producao", "ordenha", "insemina"]
+
+# Rótulo e dimensão dos totais por grupo oferecidos na tela
+AGRUPAMENTOS = {"Distrito": "DISTRITO", "Técnico": "TECNICO", "Comprador": "COMPRADOR"}
+
+
+def _indicadores(somas):
+    produtores = int(somas["produtores"])
+    return {
+        "produtores": produtores,
+        "producao": float(somas["producao"]),
+        "producao_media": float(somas["producao"] / somas["com_producao"]) if somas["com_producao"] else None,
+        "taxa_ordenha": float(somas["ordenha"] / produtores) if produtores else None,
+        "taxa_insemina": float(somas["insemina"] / produtores) if produtores else None,
+    }
+
+
+class Cubo:
+    def __init__(self, df):
+        producao = pd.to_numeric(df["PRODUCAO"], errors="coerce")
+        linhas = pd.DataFrame({dimensao: df[dimensao] for dimensao in DIMENSOES})
+        linhas["produtores"] = 1
+        linhas["producao"] = producao.fillna(0).to_numpy()
+        linhas["com_producao"] = producao.notna().astype(int).to_numpy()
+        linhas["ordenha"] = (df["ORDENHA?"] == "SIM").astype(int).to_numpy()
+        linhas["insemina"] = (df["INSEMINA?"] == "SIM").astype(int).to_numpy()
+        self.base = (
+            linhas.groupby(DIMENSOES, observed=True, dropna=False, sort=False)[MEDIDAS]
+            .sum()
+            .reset_index()
+        )
+
+    def fatia(self, selecoes=None):
+        """Linhas do cubo que atendem às seleções {coluna: [valores]} (vazias não restringem)."""
+        manter = np.ones(len(self.base), dtype=bool)
+        for coluna, valores in (selecoes or {}).items():
+            if valores:
+                manter &= self.base[coluna].isin(valores).to_numpy()
+        return self.base[manter]
+
+    def indicadores(self, selecoes=None):
+        """Produtores, produção total e média, e as taxas de ordenha e inseminação."""
+        return _indicadores(self.fatia(selecoes)[MEDIDAS].sum())
+
+    def por(self, rotulo, selecoes=None):
+        """Indicadores de cada valor da dimensão de AGRUPAMENTOS, da maior produção à menor."""
+        somas = self.fatia(selecoes).groupby(AGRUPAMENTOS[rotulo], observed=True)[MEDIDAS].sum()
+        somas = somas[somas["produtores"] > 0]
+        tabela = pd.DataFrame({
+            "Produtores": somas["produtores"],
+            "Produção dia": somas["producao"],
+            "Média por produtor": (somas["producao"] / somas["com_producao"].replace(0, np.nan)).round(1),
+            "% Ordenha": (100 * somas["ordenha"] / somas["produtores"]).round(1),
+            "% Inseminação": (100 * somas["insemina"] / somas["produtores"]).round(1),
+        })
+        tabela.index = tabela.index.astype(str)
+        tabela.index.name = rotulo
+        return tabela.sort_values("Produção dia", ascending=False)
+
+
+def cubo(df):
+    """Cubo dos produtores, construído uma vez por versão dos dados."""
+    return dados.derivado(df, Cubo)
@@ -0,0 +1,316 @@
+"""Carregamento dos dados do atlas com cache compartilhado pelo processo.
+
+Cada arquivo é identificado pela sua impressão digital (caminho, mtime e
+tamanho). Enquanto ela não muda, o conteúdo já interpretado é reaproveitado
+entre reruns e sessões do Streamlit; quando o arquivo é editado, a próxima
+leitura percebe a mudança e interpreta o arquivo de novo, sem reiniciar o
+servidor.
+
+Os objetos devolvidos são compartilhados: quem precisar alterá-los deve
+trabalhar sobre uma cópia.
+
+Os GeoJSON são decodificados pelo orjson ou pelo msgspec quando instalados,
+bem mais rápidos que o json da biblioteca padrão, com o coletor de lixo
+pausado, e carregar_camadas lê várias camadas ao mesmo tempo numa pool de
+threads.
+"""
+import contextlib
+import gc
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import camadas
+
+_decodificadores = {"json": json.loads}
+try:
+    import orjson
+    _decodificadores["orjson"] = orjson.loads
+except ImportError:
+    pass
+try:
+    import msgspec
+    _decodificadores["msgspec"] = msgspec.json.decode
+except ImportError:
+    pass
+
+ARQUIVO_PRODUTORES = "Produtores_SDA.xlsx"
+# Colunas de filtro guardadas como categorias
+COLUNAS_CATEGORICAS = ["TECNICO", "DISTRITO", "COMPRADOR"]
+
+# Arquivo de cada camada, tirado do registro
+ARQUIVOS_CAMADAS = camadas.arquivos()
+
+# Artefatos compactos gerados por gerar_artefatos.py
+DIR_ARTEFATOS = "artefatos"
+# Zoom para o qual o artefato é simplificado (ver gerar_artefatos.py)
+ZOOM_ARTEFATO = 13
+
+_cache = {}
+_travas = {}
+_trava_global = threading.Lock()
+
+_derivados = {}
+# Quantas estruturas derivadas (índices etc.) ficam em memória; comporta os
+# índices espaciais de todas as camadas além dos de filtro e busca
+MAX_DERIVADOS = 64
+
+# Decodificador dos arquivos JSON: o mais rápido dos instalados
+DECODIFICADOR = next(nome for nome in ("orjson", "msgspec", "json") if nome in _decodificadores)
+# Threads de carregar_camadas; a leitura do disco e as verificações de
+# artefato de uma camada se sobrepõem à decodificação das outras
+LEITORES = min(8, (os.cpu_count() or 1) + 2)
+
+# Decodificações em andamento e se o coletor estava ligado antes delas
+_pausas_coletor = [0, False]
+_trava_coletor = threading.Lock()
+
+
+def impressao_digital(caminho):
+    """Retorna (caminho absoluto, mtime em ns, tamanho) do arquivo."""
+    info = os.stat(caminho)
+    return (os.path.abspath(caminho), info.st_mtime_ns, info.st_size)
+
+
+def _trava_do_arquivo(caminho):
+    with _trava_global:
+        return _travas.setdefault(caminho, threading.Lock())
+
+
+def _carregar(caminho, leitor):
+    chave = impressao_digital(caminho)
+    with _trava_do_arquivo(chave[0]):
+        entrada = _cache.get(chave[0])
+        if entrada is None or entrada[0] != chave:
+            try:
+                entrada = (chave, leitor(caminho), None)
+            except (ValueError, OSError) as erro:
+                # Arquivos corrompidos também ficam em cache, para não serem
+                # interpretados de novo a cada rerun até que sejam corrigidos.
+                entrada = (chave, None, erro)
+            _cache[chave[0]] = entrada
+    if entrada[2] is not None:
+        raise entrada[2]
+    return entrada[1]
+
+
+@contextlib.contextmanager
+def _coletor_pausado():
+    """Desliga o coletor de lixo cíclico até a última decodificação em andamento terminar.
+
+    Os milhões de listas e dicionários de um GeoJSON grande disparam várias
+    coletas completas no meio da decodificação, que chegam a triplicar o
+    tempo dela; o que o JSON produz não tem ciclos a coletar.
+    """
+    with _trava_coletor:
+        if _pausas_coletor[0] == 0:
+            _pausas_coletor[1] = gc.isenabled()
+            gc.disable()
+        _pausas_coletor[0] += 1
+    try:
+        yield
+    finally:
+        with _trava_coletor:
+            _pausas_coletor[0] -= 1
+            if _pausas_coletor[0] == 0 and _pausas_coletor[1]:
+                gc.enable()
+
+
+def decodificar(conteudo):
+    """Objeto do JSON em bytes, pelo DECODIFICADOR.
+
+    O que o decodificador rápido recusa (NaN, por exemplo) passa pelo json
+    da biblioteca padrão, que também dá o erro de arquivos mal formatados.
+    """
+    with _coletor_pausado():
+        if DECODIFICADOR != "json":
+            try:
+                return _decodificadores[DECODIFICADOR](conteudo)
+            except ValueError:
+                pass
+        return json.loads(conteudo)
+
+
+def _ler_geojson(caminho):
+    with open(caminho, "rb") as f:
+        return decodificar(f.read())
+
+
+def preparar_produtores(df):
+    """Separa as coordenadas, normaliza ORDENHA?/INSEMINA? e tipa as colunas."""
+    df[["LATITUDE", "LONGITUDE"]] = df["COORDENADAS"].str.split(",", expand=True)
+    df["LATITUDE"] = pd.to_numeric(df["LATITUDE"], errors="coerce")
+    df["LONGITUDE"] = pd.to_numeric(df["LONGITUDE"], errors="coerce")
+    df["ORDENHA?"] = df["ORDENHA?"].str.upper().fillna("NAO")
+    df["INSEMINA?"] = df["INSEMINA?"].str.upper().fillna("NAO")
+    for coluna in COLUNAS_CATEGORICAS:
+        df[coluna] = df[coluna].astype("category")
+    # Colunas com números e textos misturados (RG, CPF, PRODUCAO...) viram
+    # texto, mantendo os vazios, para caber num formato colunar tipado.
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+
+def _ler_produtores(caminho):
+    return preparar_produtores(pd.read_excel(caminho))
+
+
+def _ler_colunar(caminho):
+    tabela = pq.read_table(caminho)
+    fonte = json.loads((tabela.schema.metadata or {}).get(b"atlas_fonte", b"null"))
+    return fonte, tabela.to_pandas()
+
+
+def carregar_geojson(caminho):
+    """Carrega um GeoJSON.
+
+    Levanta FileNotFoundError se o arquivo não existe e
+    json.JSONDecodeError se ele estiver mal formatado.
+    """
+    return _carregar(caminho, _ler_geojson)
+
+
+def caminho_artefato(nome):
+    return os.path.join(DIR_ARTEFATOS, f"{nome}.json")
+
+
+def fonte(caminho):
+    """Versão de um arquivo de origem, gravada nos arquivos derivados dele."""
+    _, mtime, tamanho = impressao_digital(caminho)
+    return {"mtime_ns": mtime, "tamanho": tamanho}
+
+
+def fonte_camada(nome):
+    return fonte(ARQUIVOS_CAMADAS[nome])
+
+
+def artefato_atual(nome):
+    """GeoJSON do artefato compacto da camada, ou None se não houver um gerado da versão atual."""
+    caminho = caminho_artefato(nome)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        artefato = _carregar(caminho, _ler_geojson)
+    except ValueError:
+        return None
+    # Artefatos de outro zoom (ou do formato antigo, com vários níveis) não valem
+    if artefato and artefato["fonte"] == fonte_camada(nome) and artefato.get("zoom") == ZOOM_ARTEFATO:
+        return artefato["geojson"]
+    return None
+
+
+def carregar_camada(nome):
+    """Carrega a camada pelo nome, preferindo o artefato compacto.
+
+    O artefato só é usado se foi gerado a partir da versão atual do GeoJSON
+    de origem; caso contrário o arquivo original é lido. As exceções são as
+    mesmas de carregar_geojson, sempre relativas ao arquivo original.
+    """
+    artefato = artefato_atual(nome)
+    if artefato is not None:
+        return artefato
+    return carregar_geojson(ARQUIVOS_CAMADAS[nome])
+
+
+def _tentar_carregar(nome):
+    try:
+        return carregar_camada(nome), None
+    except (ValueError, OSError) as erro:
+        return None, erro
+
+
+def carregar_camadas(nomes):
+    """Carrega as camadas em paralelo: {nome: (geojson, None) ou (None, exceção)}.
+
+    As exceções são as de carregar_camada, devolvidas em vez de levantadas
+    para que cada camada com problema seja avisada à parte. As camadas lidas
+    ficam no cache, e as chamadas seguintes a carregar_camada não leem de novo.
+    """
+    nomes = list(nomes)
+    if len(nomes) < 2:
+        return {nome: _tentar_carregar(nome) for nome in nomes}
+    with ThreadPoolExecutor(max_workers=min(LEITORES, len(nomes))) as pool:
+        return dict(zip(nomes, pool.map(_tentar_carregar, nomes)))
+
+
+def caminho_colunar(caminho=ARQUIVO_PRODUTORES):
+    return os.path.splitext(caminho)[0] + ".parquet"
+
+
+def gravar_colunar(df, versao, caminho):
+    """Grava os produtores em Parquet, junto com a versão da planilha de origem."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[b"atlas_fonte"] = json.dumps(versao).encode("utf-8")
+    pq.write_table(tabela.replace_schema_metadata(metadados), caminho)
+
+
+def carregar_produtores(caminho=ARQUIVO_PRODUTORES):
+    """Carrega os produtores com as coordenadas já separadas.
+
+    Usa o arquivo Parquet gerado por ingerir_produtores.py quando ele
+    corresponde à versão atual da planilha (ou quando só ele foi publicado);
+    caso contrário lê a planilha com o openpyxl.
+    """
+    colunar = caminho_colunar(caminho)
+    try:
+        versao = fonte(caminho)
+    except FileNotFoundError:
+        versao = None
+    if os.path.exists(colunar):
+        versao_colunar, df = _carregar(colunar, _ler_colunar)
+        if versao is None or versao_colunar == versao:
+            return df
+    return _carregar(caminho, _ler_produtores)
+
+
+def versao_dados(camadas=(), extras=()):
+    """Impressões digitais dos produtores, dos arquivos das camadas informadas e dos extras.
+
+    Serve de chave para caches de resultados calculados a partir desses dados;
+    arquivos ausentes entram como None.
+    """
+    arquivos = [ARQUIVO_PRODUTORES, caminho_colunar()]
+    for nome in camadas:
+        arquivos += [ARQUIVOS_CAMADAS[nome], caminho_artefato(nome)]
+    arquivos += list(extras)
+    versoes = []
+    for arquivo in arquivos:
+        try:
+            versoes.append(impressao_digital(arquivo))
+        except FileNotFoundError:
+            versoes.append((os.path.abspath(arquivo), None, None))
+    return versoes
+
+
+def derivado(objeto, construtor):
+    """Estrutura derivada de um dado carregado, construída uma vez por versão.
+
+    Como os loaders devolvem o mesmo objeto enquanto o arquivo não muda,
+    índices montados sobre ele (filtros, busca...) são reaproveitados entre
+    reruns e recriados quando chega uma versão nova.
+    """
+    chave = (id(objeto), construtor)
+    with _trava_global:
+        entrada = _derivados.get(chave)
+        if entrada is not None and entrada[0] is objeto:
+            return entrada[1]
+    valor = construtor(objeto)
+    with _trava_global:
+        if len(_derivados) >= MAX_DERIVADOS:
+            _derivados.pop(next(iter(_derivados)))
+        _derivados[chave] = (objeto, valor)
+    return valor
+
+
+def limpar_cache():
+    with _trava_global:
+        _cache.clear()
+        _travas.clear()
+        _derivados.clear()
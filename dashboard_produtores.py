@@ -1,25 +1,22 @@
 
 import streamlit as st
-import pandas as pd
+
+import dados
+import filtros
 
 # Carregar os dados
-df = pd.read_excel("Produtores_SDA.xlsx")
+df = dados.carregar_produtores()
 
 st.title("Dashboard de Produtores SDA")
 
 # Filtros interativos
-tecnicos = st.multiselect("Selecione o(s) Técnico(s):", sorted(df["TECNICO"].dropna().unique()))
-distritos = st.multiselect("Selecione o(s) Distrito(s):", sorted(df["DISTRITO"].dropna().unique()))
-compradores = st.multiselect("Selecione o(s) Comprador(es):", sorted(df["COMPRADOR"].dropna().unique()))
+indice_filtros = filtros.indice(df)
+tecnicos = st.multiselect("Selecione o(s) Técnico(s):", indice_filtros.opcoes("TECNICO"))
+distritos = st.multiselect("Selecione o(s) Distrito(s):", indice_filtros.opcoes("DISTRITO"))
+compradores = st.multiselect("Selecione o(s) Comprador(es):", indice_filtros.opcoes("COMPRADOR"))
 
 # Aplicar filtros
-df_filtrado = df.copy()
-if tecnicos:
-    df_filtrado = df_filtrado[df_filtrado["TECNICO"].isin(tecnicos)]
-if distritos:
-    df_filtrado = df_filtrado[df_filtrado["DISTRITO"].isin(distritos)]
-if compradores:
-    df_filtrado = df_filtrado[df_filtrado["COMPRADOR"].isin(compradores)]
+df_filtrado = indice_filtros.filtrar({"TECNICO": tecnicos, "DISTRITO": distritos, "COMPRADOR": compradores})
 
 # Exibir dados
 st.subheader("Dados Filtrados")
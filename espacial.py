@@ -0,0 +1,157 @@
+"""Índices espaciais das camadas para mandar ao mapa só a área de interesse.
+
+Cada camada ganha, uma vez por versão, um índice das suas feições: uma
+R-tree empacotada (STRtree do shapely) para linhas e polígonos e uma grade
+uniforme para pontos. O mapa pede então só as feições que cruzam a área
+visível mais uma margem, em vez da camada inteira.
+"""
+import math
+
+import numpy as np
+import shapely
+
+import dados
+
+# Fração da largura e da altura acrescentada em cada lado da área consultada
+MARGEM = 0.25
+# Os limites consultados são arredondados para esta grade (em graus), para que
+# pequenos deslocamentos do mapa repitam a mesma consulta e o mesmo recorte
+PASSO = 0.05
+# Quantidade média de pontos por célula da grade
+PONTOS_POR_CELULA = 16
+
+
+class GradePontos:
+    """Grade uniforme sobre as coordenadas (lon, lat) de um conjunto de pontos."""
+
+    def __init__(self, coords):
+        self._x, self._y = coords[:, 0], coords[:, 1]
+        validos = np.flatnonzero(~np.isnan(self._x) & ~np.isnan(self._y))
+        if not len(validos):
+            self._ordem = validos
+            return
+        x, y = self._x[validos], self._y[validos]
+        self._x0, self._y0 = x.min(), y.min()
+        extensao = max(x.max() - self._x0, y.max() - self._y0) or 1.0
+        lado = max(1, math.ceil(math.sqrt(len(validos) / PONTOS_POR_CELULA)))
+        self._tamanho = extensao / lado
+        self._colunas = lado + 1
+        celulas = self._celula(x, self._x0) + self._celula(y, self._y0) * self._colunas
+        ordem = np.argsort(celulas, kind="stable")
+        self._ordem = validos[ordem]
+        self._celulas = celulas[ordem]
+
+    def _celula(self, valores, origem):
+        return np.clip(((valores - origem) // self._tamanho).astype(np.intp), 0, self._colunas - 1)
+
+    def consultar(self, oeste, sul, leste, norte):
+        """Posições, em ordem, das feições dentro dos limites."""
+        if not len(self._ordem):
+            return self._ordem
+        x0, x1 = self._celula(np.array([oeste, leste]), self._x0)
+        y0, y1 = self._celula(np.array([sul, norte]), self._y0)
+        partes = []
+        for linha in range(y0, y1 + 1):
+            base = linha * self._colunas
+            inicio = np.searchsorted(self._celulas, base + x0, side="left")
+            fim = np.searchsorted(self._celulas, base + x1, side="right")
+            partes.append(self._ordem[inicio:fim])
+        candidatos = np.concatenate(partes)
+        x, y = self._x[candidatos], self._y[candidatos]
+        dentro = (x >= oeste) & (x <= leste) & (y >= sul) & (y <= norte)
+        return np.sort(candidatos[dentro])
+
+    def dentro(self, poligono):
+        """Posições, em ordem, dos pontos dentro do polígono (shapely)."""
+        candidatos = self.consultar(*poligono.bounds)
+        return candidatos[shapely.contains_xy(poligono, self._x[candidatos], self._y[candidatos])]
+
+
+class ArvoreGeometrias:
+    """R-tree empacotada (STR) sobre as geometrias de linhas e polígonos."""
+
+    def __init__(self, features):
+        geometrias = [
+            shapely.geometry.shape(f["geometry"]) if f.get("geometry") else None
+            for f in features
+        ]
+        self._arvore = shapely.STRtree(geometrias)
+
+    def consultar(self, oeste, sul, leste, norte):
+        """Posições, em ordem, das feições que cruzam os limites."""
+        posicoes = self._arvore.query(shapely.box(oeste, sul, leste, norte), predicate="intersects")
+        return np.sort(posicoes)
+
+
+def _construir(geojson):
+    features = geojson["features"]
+    tipos = {(f.get("geometry") or {}).get("type") for f in features} - {None}
+    if tipos <= {"Point"}:
+        coords = np.full((len(features), 2), np.nan)
+        for posicao, feature in enumerate(features):
+            if feature.get("geometry"):
+                coords[posicao] = feature["geometry"]["coordinates"][:2]
+        return GradePontos(coords)
+    return ArvoreGeometrias(features)
+
+
+def _grade_produtores(df):
+    return GradePontos(df[["LONGITUDE", "LATITUDE"]].to_numpy(dtype=float))
+
+
+def indice(geojson):
+    """Índice espacial da camada, construído uma vez por versão dos dados."""
+    return dados.derivado(geojson, _construir)
+
+
+def indice_produtores(df):
+    """Grade sobre as coordenadas dos produtores, construída uma vez por versão."""
+    return dados.derivado(df, _grade_produtores)
+
+
+def limites_consulta(sw, ne, margem=MARGEM, passo=PASSO):
+    """(oeste, sul, leste, norte) a consultar para a área sw/ne ([lat, lon]).
+
+    Acrescenta a margem e arredonda os limites para fora, na grade de passo.
+    """
+    sul, oeste = sw
+    norte, leste = ne
+    folga_x, folga_y = (leste - oeste) * margem, (norte - sul) * margem
+    return (
+        round(math.floor((oeste - folga_x) / passo) * passo, 6),
+        round(math.floor((sul - folga_y) / passo) * passo, 6),
+        round(math.ceil((leste + folga_x) / passo) * passo, 6),
+        round(math.ceil((norte + folga_y) / passo) * passo, 6),
+    )
+
+
+def limites_do_mapa(bounds):
+    """Converte os bounds devolvidos pelo st_folium em (sw, ne); None se ainda não há."""
+    try:
+        sw, ne = bounds["_southWest"], bounds["_northEast"]
+        if None in (sw["lat"], sw["lng"], ne["lat"], ne["lng"]):
+            return None
+        return [sw["lat"], sw["lng"]], [ne["lat"], ne["lng"]]
+    except (KeyError, TypeError):
+        return None
+
+
+def selecionar(geojson, posicoes):
+    """FeatureCollection só com as feições nas posições; o próprio GeoJSON se são todas."""
+    features = geojson["features"]
+    if len(posicoes) == len(features):
+        return geojson
+    return dict(geojson, features=[features[p] for p in posicoes])
+
+
+def posicoes_recorte(geojson, limites, selecao=None):
+    """Posições, em ordem, das feições que cruzam os limites.
+
+    selecao restringe o resultado a essas posições (ordenadas), como as da
+    junção com os distritos. selecionar monta o GeoJSON dessas posições,
+    com as mesmas feições do carregado (compartilhadas, sem cópia).
+    """
+    posicoes = indice(geojson).consultar(*limites)
+    if selecao is not None:
+        posicoes = np.intersect1d(posicoes, selecao, assume_unique=True)
+    return posicoes
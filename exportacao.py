@@ -0,0 +1,302 @@
+"""Exportação dos produtores filtrados e das camadas em CSV, GeoJSON ou GeoPackage.
+
+Os dados saem em lotes de TAMANHO_LOTE feições, cada lote escrito direto no
+arquivo de destino: o resultado nunca fica inteiro em memória, nem como
+texto nem como objetos, e o consumo não cresce com o tamanho da exportação.
+
+As camadas, que são públicas, são gravadas em DIR_EXPORTACOES com um nome
+aleatório e baixadas do servidor de arquivos estáticos do Streamlit, que as
+lê do disco aos pedaços; cada arquivo vale por VALIDADE_MINUTOS. Os
+produtores têm nomes e documentos e não vão para static/, que qualquer um
+baixa: conteudo grava o arquivo numa pasta temporária e devolve os bytes
+para o st.download_button, que os serve só à sessão que pediu. Esse
+caminho guarda o arquivo em memória, o que cabe na lista de produtores.
+
+O GeoPackage é escrito pelo sqlite3 da biblioteca padrão, seguindo a
+especificação 1.3 (tabelas gpkg_* e geometrias com o cabeçalho GP + WKB),
+sem depender do GDAL.
+"""
+import csv
+import itertools
+import json
+import math
+import os
+import re
+import secrets
+import sqlite3
+import struct
+import tempfile
+import time
+import unicodedata
+
+import numpy as np
+import shapely
+
+import espacial
+
+DIR_EXPORTACOES = os.path.join("static", "exportacoes")
+URL_EXPORTACOES = "/app/static/exportacoes"
+FORMATOS = {"CSV": ".csv", "GeoJSON": ".geojson", "GeoPackage": ".gpkg"}
+TIPOS_MIME = {"CSV": "text/csv", "GeoJSON": "application/geo+json", "GeoPackage": "application/geopackage+sqlite3"}
+TAMANHO_LOTE = 2000
+VALIDADE_MINUTOS = 60
+# Maior arquivo que o Streamlit serve como estático
+LIMITE_BYTES = 200 * 1024 * 1024
+# Coluna com a geometria em WKT no CSV
+COLUNA_GEOMETRIA = "geometria"
+
+SRS_WGS84 = 4326
+_SRS = [
+    ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+    ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+    (
+        "WGS 84 geodetic", SRS_WGS84, "EPSG", SRS_WGS84,
+        'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+        'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+        'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+        'AUTHORITY["EPSG","4326"]]',
+        "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid",
+    ),
+]
+
+
+def _valor(valor):
+    """Valor de propriedade como texto, número, booleano ou None."""
+    if valor is None or isinstance(valor, (str, bool, int)):
+        return valor
+    if isinstance(valor, float):
+        return None if math.isnan(valor) else valor
+    if isinstance(valor, np.generic):
+        return _valor(valor.item())
+    return json.dumps(valor, ensure_ascii=False, default=str)
+
+
+# Lotes: pares (propriedades, geometrias), uma lista de dicts e um array de
+# geometrias do shapely (None onde não há geometria)
+
+def lotes_produtores(df, colunas, poligono=None, tamanho=TAMANHO_LOTE):
+    """Lotes dos produtores do DataFrame, só com as colunas; com poligono, só os de dentro."""
+    for inicio in range(0, len(df), tamanho):
+        parte = df.iloc[inicio:inicio + tamanho]
+        lon = parte["LONGITUDE"].to_numpy(dtype=float)
+        lat = parte["LATITUDE"].to_numpy(dtype=float)
+        if poligono is not None:
+            dentro = shapely.contains_xy(poligono, lon, lat)
+            parte, lon, lat = parte[dentro], lon[dentro], lat[dentro]
+        geometrias = shapely.points(lon, lat).astype(object)
+        geometrias[np.isnan(lon) | np.isnan(lat)] = None
+        tabela = parte[colunas]
+        yield tabela.astype(object).where(tabela.notna(), None).to_dict("records"), geometrias
+
+
+def lotes_camada(geojson, posicoes=None, poligono=None, tamanho=TAMANHO_LOTE):
+    """Lotes das feições do GeoJSON nas posições (todas, sem elas).
+
+    Com poligono as feições são recortadas por ele, e as que ficam de fora
+    saem da exportação; o índice espacial da camada (espacial.py) descarta
+    antes as que nem chegam perto.
+    """
+    features = geojson["features"]
+    if posicoes is None:
+        posicoes = np.arange(len(features))
+    if poligono is not None:
+        perto = espacial.indice(geojson).consultar(*shapely.bounds(poligono))
+        posicoes = np.intersect1d(posicoes, perto, assume_unique=True)
+    for inicio in range(0, len(posicoes), tamanho):
+        parte = [features[p] for p in posicoes[inicio:inicio + tamanho]]
+        geometrias = np.array([
+            shapely.force_2d(shapely.geometry.shape(f["geometry"])) if f.get("geometry") else None
+            for f in parte
+        ], dtype=object)
+        propriedades = [f.get("properties") or {} for f in parte]
+        if poligono is not None:
+            geometrias = shapely.intersection(geometrias, poligono)
+            manter = ~shapely.is_missing(geometrias) & ~shapely.is_empty(geometrias)
+            geometrias = geometrias[manter]
+            propriedades = [p for p, m in zip(propriedades, manter) if m]
+        yield propriedades, geometrias
+
+
+def campos_camada(geojson, posicoes=None):
+    """Propriedades das feições, na ordem em que aparecem."""
+    features = geojson["features"]
+    selecionadas = features if posicoes is None else (features[p] for p in posicoes)
+    return list(dict.fromkeys(k for f in selecionadas for k in (f.get("properties") or {})))
+
+
+# Formatos
+
+def _gravar_csv(caminho, campos, lotes):
+    # Com BOM, para o Excel reconhecer o UTF-8
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(campos + [COLUNA_GEOMETRIA])
+        for propriedades, geometrias in lotes:
+            wkt = shapely.to_wkt(geometrias, rounding_precision=7, trim=True)
+            escritor.writerows([_valor(p.get(c)) for c in campos] + [w] for p, w in zip(propriedades, wkt))
+
+
+def _gravar_geojson(caminho, campos, lotes):
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write('{"type":"FeatureCollection","features":[\n')
+        separador = ""
+        for propriedades, geometrias in lotes:
+            for p, geometria in zip(propriedades, shapely.to_geojson(geometrias)):
+                props = json.dumps({c: _valor(p.get(c)) for c in campos}, ensure_ascii=False)
+                f.write(f'{separador}{{"type":"Feature","properties":{props},"geometry":{geometria or "null"}}}')
+                separador = ",\n"
+        f.write("\n]}\n")
+
+
+def _tipo_sql(valor):
+    if isinstance(valor, bool):
+        return "BOOLEAN"
+    if isinstance(valor, int):
+        return "INTEGER"
+    if isinstance(valor, float):
+        return "REAL"
+    return "TEXT"
+
+
+def _blob(wkb, limites):
+    """Geometria no formato do GeoPackage: cabeçalho GP, envelope e WKB little-endian."""
+    if wkb is None:
+        return None
+    if np.isnan(limites[0]):
+        # Bit de geometria vazia, sem envelope
+        return b"GP\x00\x11" + struct.pack("<i", SRS_WGS84) + wkb
+    oeste, sul, leste, norte = limites
+    return b"GP\x00\x03" + struct.pack("<i4d", SRS_WGS84, oeste, leste, sul, norte) + wkb
+
+
+def _gravar_geopackage(caminho, campos, lotes, tabela):
+    # Os tipos das colunas vêm do primeiro valor preenchido de cada uma no primeiro lote
+    primeiro = next(lotes, ([], np.empty(0, dtype=object)))
+    tipos = {}
+    for c in campos:
+        valores = (_valor(p.get(c)) for p in primeiro[0])
+        tipos[c] = _tipo_sql(next((v for v in valores if v is not None), None))
+    colunas = {c: f"c{i}" if c.lower() in ("fid", "geom") else c for i, c in enumerate(campos)}
+    conexao = sqlite3.connect(caminho)
+    try:
+        conexao.execute("PRAGMA application_id = 1196444487")  # "GPKG"
+        conexao.execute("PRAGMA user_version = 10300")
+        conexao.executescript("""
+            CREATE TABLE gpkg_spatial_ref_sys (
+                srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+                organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT);
+            CREATE TABLE gpkg_contents (
+                table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+                description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+                min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER,
+                CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id));
+            CREATE TABLE gpkg_geometry_columns (
+                table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+                srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL,
+                CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+                CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+                CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id));
+        """)
+        conexao.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", _SRS)
+        definicoes = "".join(f', "{colunas[c]}" {tipos[c]}' for c in campos)
+        conexao.execute(f'CREATE TABLE "{tabela}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom GEOMETRY{definicoes})')
+        conexao.execute(
+            "INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) VALUES (?, 'features', ?, ?)",
+            (tabela, tabela, SRS_WGS84),
+        )
+        conexao.execute(
+            "INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'GEOMETRY', ?, 0, 0)", (tabela, SRS_WGS84)
+        )
+        nomes = "".join(f', "{colunas[c]}"' for c in campos)
+        insercao = f'INSERT INTO "{tabela}" (geom{nomes}) VALUES (?{", ?" * len(campos)})'
+        extensao = [math.inf, math.inf, -math.inf, -math.inf]
+        for propriedades, geometrias in itertools.chain([primeiro], lotes):
+            limites = shapely.bounds(geometrias)
+            wkbs = shapely.to_wkb(geometrias, byte_order=1, output_dimension=2)
+            conexao.executemany(insercao, (
+                [_blob(wkb, lim)] + [_valor(p.get(c)) for c in campos]
+                for p, wkb, lim in zip(propriedades, wkbs, limites)
+            ))
+            if len(limites) and not np.isnan(limites[:, 0]).all():
+                extensao = [
+                    min(extensao[0], np.nanmin(limites[:, 0])), min(extensao[1], np.nanmin(limites[:, 1])),
+                    max(extensao[2], np.nanmax(limites[:, 2])), max(extensao[3], np.nanmax(limites[:, 3])),
+                ]
+            conexao.commit()
+        if math.isfinite(extensao[0]):
+            conexao.execute(
+                "UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? WHERE table_name = ?",
+                (*map(float, extensao), tabela),
+            )
+        conexao.commit()
+    finally:
+        conexao.close()
+
+
+def _descartar_vencidas():
+    try:
+        arquivos = os.listdir(DIR_EXPORTACOES)
+    except OSError:
+        return
+    limite = time.time() - VALIDADE_MINUTOS * 60
+    for arquivo in arquivos:
+        caminho = os.path.join(DIR_EXPORTACOES, arquivo)
+        try:
+            if os.stat(caminho).st_mtime < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def nome_arquivo(nome, formato):
+    """Nome para salvar, só com letras e números ASCII: "Açudes" vira "Acudes.gpkg"."""
+    ascii_ = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    return (re.sub(r"[^A-Za-z0-9]+", "_", ascii_).strip("_") or "dados") + FORMATOS[formato]
+
+
+def _gravar(caminho, formato, campos, lotes, tabela):
+    if formato == "CSV":
+        _gravar_csv(caminho, campos, lotes)
+    elif formato == "GeoJSON":
+        _gravar_geojson(caminho, campos, lotes)
+    else:
+        _gravar_geopackage(caminho, campos, iter(lotes), tabela)
+
+
+def exportar(nome, formato, campos, lotes):
+    """Grava os lotes num arquivo público do formato e retorna (URL, nome para salvar, bytes).
+
+    Só para dados públicos, como as camadas. Levanta ValueError se o arquivo
+    passa de LIMITE_BYTES, que o Streamlit não serviria.
+    """
+    _descartar_vencidas()
+    salvar = nome_arquivo(nome, formato)
+    base, extensao = os.path.splitext(salvar)
+    arquivo = f"{base}-{secrets.token_urlsafe(12)}{extensao}"
+    os.makedirs(DIR_EXPORTACOES, exist_ok=True)
+    caminho = os.path.join(DIR_EXPORTACOES, arquivo)
+    temporario = f"{caminho}.tmp"
+    try:
+        _gravar(temporario, formato, campos, lotes, base)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    tamanho = os.path.getsize(caminho)
+    if tamanho > LIMITE_BYTES:
+        os.remove(caminho)
+        raise ValueError(
+            f"{salvar} teria {tamanho / 1024 / 1024:.0f} MB, acima do limite de "
+            f"{LIMITE_BYTES / 1024 / 1024:.0f} MB; restrinja os filtros ou desenhe uma área menor"
+        )
+    return f"{URL_EXPORTACOES}/{arquivo}", salvar, tamanho
+
+
+def conteudo(nome, formato, campos, lotes):
+    """Bytes do arquivo do formato, gravado numa pasta temporária, fora de static/."""
+    salvar = nome_arquivo(nome, formato)
+    with tempfile.TemporaryDirectory(prefix="atlas-") as pasta:
+        caminho = os.path.join(pasta, salvar)
+        _gravar(caminho, formato, campos, lotes, os.path.splitext(salvar)[0])
+        with open(caminho, "rb") as f:
+            return f.read()
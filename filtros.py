@@ -0,0 +1,64 @@
+"""Filtros de Técnico, Distrito e Comprador sobre os produtores.
+
+O índice guarda, para cada valor das colunas de filtro, as posições das
+linhas que o contêm. Filtrar vira união das posições dentro de cada coluna e
+interseção entre colunas, sem copiar o DataFrame inteiro, e as opções dos
+multiselects saem prontas do índice.
+"""
+import numpy as np
+
+import dados
+
+COLUNAS_FILTRO = ["TECNICO", "DISTRITO", "COMPRADOR"]
+
+
+class IndiceFiltros:
+    def __init__(self, df, colunas=COLUNAS_FILTRO):
+        self.df = df
+        self._posicoes = {}
+        for coluna in colunas:
+            valores = df[coluna]
+            posicoes = {}
+            for valor, linhas in valores.groupby(valores, observed=True, sort=False).indices.items():
+                posicoes[valor] = np.sort(linhas)
+            self._posicoes[coluna] = posicoes
+
+    def opcoes(self, coluna):
+        """Valores da coluna, ordenados, para as opções do multiselect."""
+        return sorted(self._posicoes[coluna])
+
+    def posicoes(self, selecoes):
+        """Posições das linhas que atendem às seleções {coluna: [valores]}.
+
+        Colunas sem valores selecionados não restringem o resultado;
+        retorna None quando nenhuma coluna restringe.
+        """
+        resultado = None
+        for coluna, valores in selecoes.items():
+            if not valores:
+                continue
+            posicoes = self._posicoes[coluna]
+            linhas = np.sort(np.concatenate(
+                [posicoes[v] for v in valores if v in posicoes] or [np.empty(0, dtype=np.intp)]
+            ))
+            if resultado is None:
+                resultado = linhas
+            else:
+                resultado = np.intersect1d(resultado, linhas, assume_unique=True)
+        return resultado
+
+    def filtrar(self, selecoes):
+        """Linhas do DataFrame que atendem às seleções.
+
+        Sem seleção retorna o próprio DataFrame compartilhado, que não deve ser
+        alterado.
+        """
+        posicoes = self.posicoes(selecoes)
+        if posicoes is None:
+            return self.df
+        return self.df.iloc[posicoes]
+
+
+def indice(df):
+    """Índice de filtros do DataFrame, construído uma vez por versão dos dados."""
+    return dados.derivado(df, IndiceFiltros)
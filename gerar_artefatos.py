@@ -0,0 +1,119 @@
+"""Gera os artefatos compactos das camadas do atlas.
+
+Para cada camada é gravado artefatos/<nome>.json com a geometria
+simplificada para o zoom usado pelo mapa, as coordenadas arredondadas e só
+as propriedades que os popups e tooltips declarados em camadas.py leem. O app
+usa o artefato automaticamente enquanto ele corresponder à versão atual do
+GeoJSON. Em seguida a junção espacial de cada camada e dos produtores com
+os distritos é gravada em artefatos/juncoes (ver juncao.py).
+
+Uso:
+    python gerar_artefatos.py            # todas as camadas
+    python gerar_artefatos.py acudes estradas
+"""
+import argparse
+import json
+import os
+
+import shapely
+
+import camadas
+import dados
+import juncao
+import medidas
+
+# A simplificação é feita para um único zoom, dados.ZOOM_ARTEFATO: a
+# tolerância é o tamanho de um pixel nele, e 5 casas decimais (~1 m) bastam.
+# O st_folium não informa o zoom sem um rerun a cada mudança, e de perto as
+# linhas e os polígonos grandes já vão em vector tiles (gerar_tiles.py).
+CASAS_DECIMAIS = 5
+
+
+def tolerancia(zoom):
+    """Tamanho aproximado de um pixel, em graus, no zoom informado."""
+    return 360 / (256 * 2 ** zoom)
+
+
+def _simplificar(geometrias, zoom):
+    tol = tolerancia(zoom)
+    poligonais = all(g is None or g.geom_type in ("Polygon", "MultiPolygon") for g in geometrias)
+    if poligonais and shapely.coverage_is_valid(geometrias):
+        # Cobertura (ex.: distritos vizinhos): simplifica as bordas
+        # compartilhadas uma única vez, sem abrir frestas entre os polígonos.
+        return list(shapely.coverage_simplify(geometrias, tol))
+    return list(shapely.simplify(geometrias, tol, preserve_topology=True))
+
+
+def _propriedades(feature, campos):
+    props = feature.get("properties") or {}
+    return {campo: props[campo] for campo in campos if campo in props}
+
+
+def _colecao(features, geometrias, campos, casas):
+    saida = []
+    for feature, geometria in zip(features, geometrias):
+        if geometria is None or geometria.is_empty:
+            continue
+        geometria = shapely.set_precision(geometria, 10 ** -casas)
+        saida.append({
+            "type": "Feature",
+            "properties": _propriedades(feature, campos),
+            "geometry": json.loads(shapely.to_geojson(geometria)),
+        })
+    return {"type": "FeatureCollection", "features": saida}
+
+
+def gerar(nome):
+    """Gera o artefato de uma camada e retorna (tamanho original, tamanho do artefato)."""
+    arquivo = dados.ARQUIVOS_CAMADAS[nome]
+    versao = dados.fonte_camada(nome)
+    features = dados.carregar_geojson(arquivo)["features"]
+    geometrias = [
+        shapely.force_2d(shapely.geometry.shape(f["geometry"])) if f.get("geometry") else None
+        for f in features
+    ]
+    campos = camadas.propriedades(nome)
+    if camadas.CAMADAS[nome].get("medidas"):
+        # Medidas tiradas da geometria original, antes da simplificação
+        features = medidas.com_medidas(dados.carregar_geojson(arquivo))["features"]
+        campos = campos + medidas.CAMPOS
+
+    if not all(g is None or g.geom_type in ("Point", "MultiPoint") for g in geometrias):
+        # Pontos não têm o que simplificar, só são arredondados
+        geometrias = _simplificar(geometrias, dados.ZOOM_ARTEFATO)
+    colecao = _colecao(features, geometrias, campos, CASAS_DECIMAIS)
+
+    artefato = {"fonte": versao, "zoom": dados.ZOOM_ARTEFATO, "geojson": colecao}
+    os.makedirs(dados.DIR_ARTEFATOS, exist_ok=True)
+    caminho = dados.caminho_artefato(nome)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(artefato, f, ensure_ascii=False, separators=(",", ":"))
+    return versao["tamanho"], len(json.dumps(colecao, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("camadas", nargs="*", help="camadas a gerar (padrão: todas)")
+    args = parser.parse_args()
+
+    for nome in args.camadas or dados.ARQUIVOS_CAMADAS:
+        try:
+            original, tamanho = gerar(nome)
+        except (OSError, ValueError) as erro:
+            print(f"{nome}: ignorada ({erro})")
+            continue
+        print(f"{nome}: {original / 1024:.0f} KB -> {tamanho / 1024:.0f} KB")
+
+    # Junção com distritos e áreas urbanas, sobre as camadas como o app as lê
+    for nome in args.camadas or dados.ARQUIVOS_CAMADAS:
+        try:
+            feicoes = juncao.da_camada(nome, dados.carregar_camada(nome))["distrito"]
+        except (OSError, ValueError) as erro:
+            print(f"{nome}: junção ignorada ({erro})")
+            continue
+        print(f"{nome}: {(feicoes != juncao.FORA).sum()} de {len(feicoes)} feições dentro de algum distrito")
+    juncao.dos_produtores(dados.carregar_produtores())
+
+
+if __name__ == "__main__":
+    main()
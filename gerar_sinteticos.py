@@ -0,0 +1,227 @@
+"""Gera dados sintéticos do atlas na escala do estado, para testes de carga.
+
+Produz, numa pasta própria, uma tabela de produtores no formato da
+Produtores_SDA e camadas GeoJSON de pontos, linhas e polígonos com as
+mesmas propriedades das camadas reais (por padrão cisternas, pocos,
+estradas e acudes). Os valores de cada coluna são sorteados entre os
+valores reais dela; as feições se concentram em torno de sedes de
+municípios e distritos espalhadas pela extensão do Ceará, e técnicos e
+distritos crescem com o número de municípios, como cresceriam os filtros
+do app.
+
+Os produtores vão em Parquet (lido pelo app sem a planilha); com --planilha
+vai também a planilha .xlsx, para medir a leitura pelo openpyxl. Os
+arquivos têm os nomes esperados por dados.py, e a pasta pode ser medida com
+python benchmark.py --dados <pasta>.
+
+Uso:
+    python gerar_sinteticos.py                           # 100 mil produtores e feições por camada
+    python gerar_sinteticos.py --produtores 500000 --feicoes 200000 acudes
+    python gerar_sinteticos.py --destino /tmp/ceara --planilha
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import dados
+
+DESTINO = "sinteticos"
+CAMADAS_PADRAO = ("cisternas", "pocos", "estradas", "acudes")
+PRODUTORES = 100_000
+FEICOES = 100_000
+MUNICIPIOS = 184
+DISTRITOS_POR_MUNICIPIO = 8
+TECNICOS_POR_MUNICIPIO = 6
+SEMENTE = 42
+
+# Extensão aproximada do Ceará (oeste, sul, leste, norte)
+EXTENSAO = (-41.4, -7.85, -37.25, -2.8)
+# Desvio, em graus, das sedes de distrito em torno da sede do município e
+# das feições em torno da sede do distrito
+DISPERSAO_DISTRITOS = 0.08
+DISPERSAO_FEICOES = 0.04
+# Passo médio, em graus, entre os vértices das estradas
+PASSO_ESTRADA = 0.004
+
+
+def _sortear(valores, quantidade, rng):
+    """Valores sorteados com a frequência com que aparecem na coluna real."""
+    valores = list(valores)
+    if not valores:
+        return [None] * quantidade
+    escolhidos = rng.integers(0, len(valores), quantidade)
+    return [valores[i] for i in escolhidos]
+
+
+def _limpar(valor):
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class Territorio:
+    """Sedes de municípios e de distritos sorteadas na extensão do estado."""
+
+    def __init__(self, municipios, rng):
+        oeste, sul, leste, norte = EXTENSAO
+        self.municipios = municipios
+        self.sedes = np.column_stack([rng.uniform(oeste, leste, municipios), rng.uniform(sul, norte, municipios)])
+        deslocamentos = rng.normal(0, DISPERSAO_DISTRITOS, (municipios, DISTRITOS_POR_MUNICIPIO, 2))
+        self.distritos = self.sedes[:, None, :] + deslocamentos
+        self.rng = rng
+
+    def sortear(self, quantidade):
+        """(município, distrito, lon, lat) de quantidade feições."""
+        municipio = self.rng.integers(0, self.municipios, quantidade)
+        distrito = self.rng.integers(0, DISTRITOS_POR_MUNICIPIO, quantidade)
+        centro = self.distritos[municipio, distrito]
+        lon_lat = centro + self.rng.normal(0, DISPERSAO_FEICOES, (quantidade, 2))
+        return municipio, distrito, lon_lat[:, 0], lon_lat[:, 1]
+
+
+def _nomes(reais, quantidade, rng):
+    """Nomes completos combinando prenomes e sobrenomes dos nomes reais."""
+    partes = [str(nome).split() for nome in reais if isinstance(nome, str) and nome.strip()]
+    prenomes = [p[0] for p in partes]
+    sobrenomes = [s for p in partes for s in p[1:]] or prenomes
+    primeiros = _sortear(prenomes, quantidade, rng)
+    meios = _sortear(sobrenomes, quantidade, rng)
+    ultimos = _sortear(sobrenomes, quantidade, rng)
+    return [f"{a} {b} {c}" for a, b, c in zip(primeiros, meios, ultimos)]
+
+
+def gerar_produtores(quantidade, territorio, rng, planilha=dados.ARQUIVO_PRODUTORES):
+    """Tabela com as colunas da planilha real e produtores espalhados pelo estado."""
+    real = pd.read_excel(planilha)
+    municipio, distrito, lon, lat = territorio.sortear(quantidade)
+    distritos_reais = sorted({str(d).strip() for d in real["DISTRITO"].dropna()})
+    tabela = {}
+    for coluna in real.columns:
+        tabela[coluna] = _sortear(real[coluna].map(_limpar), quantidade, rng)
+    tabela["PRODUTOR"] = _nomes(real["PRODUTOR"], quantidade, rng)
+    tabela["TECNICO"] = [
+        f"Técnico {m + 1:03d}-{t + 1}"
+        for m, t in zip(municipio, rng.integers(0, TECNICOS_POR_MUNICIPIO, quantidade))
+    ]
+    tabela["DISTRITO"] = [
+        f"{distritos_reais[d % len(distritos_reais)]} ({m + 1:03d})" for m, d in zip(municipio, distrito)
+    ]
+    tabela["COORDENADAS"] = [f"{y:.14f},{x:.14f}" for x, y in zip(lon, lat)]
+    # As colunas em UTM da planilha não são usadas: o app lê COORDENADAS
+    tabela["LONGITUDE"] = [None] * quantidade
+    tabela["LATITUDE"] = [None] * quantidade
+    return pd.DataFrame(tabela, columns=real.columns)
+
+
+def _linha(lon, lat, vertices, rng):
+    """Caminho aleatório com a direção variando pouco de um vértice ao outro."""
+    direcao = rng.uniform(0, 2 * math.pi) + np.cumsum(rng.normal(0, 0.4, vertices))
+    passos = rng.exponential(PASSO_ESTRADA, vertices)
+    xs = lon + np.cumsum(passos * np.cos(direcao))
+    ys = lat + np.cumsum(passos * np.sin(direcao))
+    return [[round(x, 8), round(y, 8), 0.0] for x, y in zip(xs, ys)]
+
+
+def _poligono(lon, lat, vertices, raio, rng):
+    """Anel fechado irregular em torno do ponto, com raio médio em graus."""
+    angulos = np.sort(rng.uniform(0, 2 * math.pi, vertices))
+    raios = raio * rng.uniform(0.6, 1.4, vertices)
+    anel = [[round(lon + r * math.cos(a), 8), round(lat + r * math.sin(a), 8)] for a, r in zip(angulos, raios)]
+    return anel + [anel[0]]
+
+
+def _vertices_reais(feature):
+    def contar(c):
+        return 1 if isinstance(c[0], (int, float)) else sum(contar(x) for x in c)
+    return contar(feature["geometry"]["coordinates"])
+
+
+def gerar_camada(chave, quantidade, territorio, rng):
+    """FeatureCollection com o esquema da camada real e quantidade feições sintéticas."""
+    with open(dados.ARQUIVOS_CAMADAS[chave], encoding="utf-8") as f:
+        real = json.load(f)
+    features_reais = [f for f in real["features"] if f.get("geometry")]
+    nomes = list(dict.fromkeys(k for f in features_reais for k in (f.get("properties") or {})))
+    colunas = {
+        nome: _sortear([_limpar((f.get("properties") or {}).get(nome)) for f in features_reais], quantidade, rng)
+        for nome in nomes
+    }
+    # O número de vértices de cada feição segue o das feições reais
+    vertices = _sortear([_vertices_reais(f) for f in features_reais], quantidade, rng)
+    tipo = features_reais[0]["geometry"]["type"]
+    _, _, lon, lat = territorio.sortear(quantidade)
+
+    features = []
+    for i in range(quantidade):
+        x, y = float(lon[i]), float(lat[i])
+        if tipo == "Point":
+            coordenadas = [round(x, 8), round(y, 8)]
+        elif tipo in ("LineString", "MultiLineString"):
+            coordenadas = _linha(x, y, max(2, vertices[i]), rng)
+            if tipo == "MultiLineString":
+                coordenadas = [coordenadas]
+        else:
+            # Raio médio de uns 190 m, perto da área dos açudes reais (~0,1 km²)
+            raio = float(rng.lognormal(math.log(0.0017), 0.8))
+            coordenadas = [_poligono(x, y, max(3, vertices[i] - 1), raio, rng)]
+            if tipo == "MultiPolygon":
+                coordenadas = [coordenadas]
+        geometria = {"type": tipo, "coordinates": coordenadas}
+        features.append({
+            "type": "Feature",
+            "properties": {nome: valores[i] for nome, valores in colunas.items()},
+            "geometry": geometria,
+        })
+    return dict({k: v for k, v in real.items() if k != "features"}, features=features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("camadas", nargs="*", help=f"camadas a gerar (padrão: {', '.join(CAMADAS_PADRAO)})")
+    parser.add_argument("--destino", default=DESTINO)
+    parser.add_argument("--produtores", type=int, default=PRODUTORES)
+    parser.add_argument("--feicoes", type=int, default=FEICOES, help="feições por camada")
+    parser.add_argument("--municipios", type=int, default=MUNICIPIOS)
+    parser.add_argument("--planilha", action="store_true", help="grava também a planilha .xlsx")
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.semente)
+    territorio = Territorio(args.municipios, rng)
+    os.makedirs(args.destino, exist_ok=True)
+
+    inicio = time.perf_counter()
+    bruto = gerar_produtores(args.produtores, territorio, rng)
+    planilha = os.path.join(args.destino, dados.ARQUIVO_PRODUTORES)
+    versao = None
+    if args.planilha:
+        bruto.to_excel(planilha, index=False)
+        versao = dados.fonte(planilha)
+    elif os.path.exists(planilha):
+        # Uma planilha antiga teria precedência sobre o Parquet novo
+        os.remove(planilha)
+    colunar = dados.caminho_colunar(planilha)
+    dados.gravar_colunar(dados.preparar_produtores(bruto), versao, colunar)
+    print(f"produtores: {args.produtores} em {colunar} ({time.perf_counter() - inicio:.1f} s)")
+
+    for chave in args.camadas or CAMADAS_PADRAO:
+        inicio = time.perf_counter()
+        caminho = os.path.join(args.destino, dados.ARQUIVOS_CAMADAS[chave])
+        geojson = gerar_camada(chave, args.feicoes, territorio, rng)
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(geojson, f, ensure_ascii=False, separators=(",", ":"))
+        print(
+            f"{chave}: {args.feicoes} feições, {os.path.getsize(caminho) / 1024 / 1024:.1f} MB "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Recorta camadas pesadas do atlas em vector tiles (MVT) locais.
+
+As tiles são gravadas em static/tiles/<camada>/<z>/<x>/<y>.pbf e servidas
+pelo próprio Streamlit (ver .streamlit/config.toml). O app passa a usar as
+tiles da camada enquanto elas corresponderem à versão atual do GeoJSON.
+
+Uso:
+    python gerar_tiles.py                       # camadas padrão
+    python gerar_tiles.py acudes --zoom-max 15
+"""
+import argparse
+import json
+import os
+import shutil
+
+import shapely
+
+import camadas
+import dados
+import mvt
+
+# Camadas de linhas e polígonos sem estratégia de desenho fixada no registro
+CAMADAS_PADRAO = tuple(
+    chave for chave, camada in camadas.CAMADAS.items()
+    if camada["geometria"] != camadas.PONTO and not camada.get("estrategia")
+)
+ZOOM_MIN = 8
+ZOOM_MAX = 14
+
+
+def gerar(nome, zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX):
+    """Recorta a camada em todos os zooms e retorna (quantidade de tiles, bytes)."""
+    versao = dados.fonte_camada(nome)
+    features = [
+        f for f in dados.carregar_geojson(dados.ARQUIVOS_CAMADAS[nome])["features"]
+        if f.get("geometry")
+    ]
+    geometrias = [shapely.force_2d(shapely.geometry.shape(f["geometry"])) for f in features]
+    campos = camadas.propriedades(nome)
+    propriedades = [
+        {c: (f.get("properties") or {}).get(c) for c in campos}
+        for f in features
+    ]
+
+    destino = os.path.join(mvt.DIR_TILES, nome)
+    shutil.rmtree(destino, ignore_errors=True)
+    quantidade = total = 0
+    for zoom in range(zoom_min, zoom_max + 1):
+        for x, y, conteudo in mvt.cortar(nome, geometrias, propriedades, zoom):
+            pasta = os.path.join(destino, str(zoom), str(x))
+            os.makedirs(pasta, exist_ok=True)
+            with open(os.path.join(pasta, f"{y}.pbf"), "wb") as f:
+                f.write(conteudo)
+            quantidade += 1
+            total += len(conteudo)
+
+    meta = {
+        "fonte": versao,
+        "zoom_min": zoom_min,
+        "zoom_max": zoom_max,
+        "bounds": list(shapely.total_bounds(geometrias)),
+    }
+    with open(mvt.caminho_meta(nome), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return quantidade, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("camadas", nargs="*", help=f"camadas a recortar (padrão: {', '.join(CAMADAS_PADRAO)})")
+    parser.add_argument("--zoom-min", type=int, default=ZOOM_MIN)
+    parser.add_argument("--zoom-max", type=int, default=ZOOM_MAX)
+    args = parser.parse_args()
+
+    for nome in args.camadas or CAMADAS_PADRAO:
+        try:
+            quantidade, total = gerar(nome, args.zoom_min, args.zoom_max)
+        except (OSError, ValueError) as erro:
+            print(f"{nome}: ignorada ({erro})")
+            continue
+        print(f"{nome}: {quantidade} tiles, {total / 1024:.0f} KB (z{args.zoom_min}-z{args.zoom_max})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Ícones dos marcadores do atlas, servidos junto com a página.
+
+Os ícones são os originais do atlas. Copiados para a pasta icones/ (python
+icones.py baixa os que faltam), viram uma folha de estilo com uma classe CSS
+por ícone, com a imagem embutida em data URI: a folha vai uma vez por
+página, no mapa base, cada marcador é um L.divIcon com a classe do ícone, e
+nenhum marcador busca imagem na rede. Ícone ainda não copiado aponta para o
+endereço original, baixado pelo navegador uma vez por página.
+
+Uso:
+    python icones.py
+"""
+import base64
+import os
+import sys
+import threading
+import urllib.request
+
+import dados
+
+DIR_ICONES = "icones"
+
+# nome -> (arquivo em icones/, endereço original, tamanho no mapa em pixels)
+ICONES = {
+    "sede": ("sede.png", "https://i.ibb.co/S4VmxQcB/circle.png", (23, 23)),
+    "fazenda": ("fazenda.png", "https://i.ibb.co/zVBVzh2t/fazenda.png", (20, 20)),
+    "apicultura": ("apicultura.png", "https://i.ibb.co/yny9Yvjb/apitherapy.png", (22, 22)),
+    "escola": ("escola.png", "https://i.ibb.co/pBsQcQws/education.png", (25, 25)),
+    "posto": ("posto.png", "https://i.ibb.co/rGdw6d71/hospital.png", (25, 25)),
+    "comunidade": ("comunidade.png", "https://i.ibb.co/kgbmmjWc/location-icon-242304.png", (18, 18)),
+    "chafariz": ("chafariz.png", "https://i.ibb.co/mk8HRKv/chafariz.png", (25, 15)),
+    "poco": ("poco.png", "https://i.ibb.co/6JrpxXMT/water.png", (23, 23)),
+    "cisterna": ("cisterna.png", "https://i.ibb.co/jvLz192m/water-tank.png", (18, 18)),
+    "sistema": ("sistema.png", "https://i.ibb.co/sd8DxJQ5/water-tower.png", (25, 25)),
+    "saae": ("saae.png", "https://i.ibb.co/m56JXGqy/73016potablewater-109514.png", (23, 23)),
+    "outorga": ("outorga.png", "https://i.ibb.co/kg8SpYRY/certificate.png", (23, 23)),
+}
+
+_TIPOS = {".svg": "image/svg+xml", ".png": "image/png"}
+
+_folha = (None, "")
+_trava = threading.Lock()
+
+
+def classe(nome):
+    """Classes CSS do L.divIcon do ícone."""
+    return f"atlas-icone atlas-icone-{nome}"
+
+
+def tamanho(nome):
+    return ICONES[nome][2]
+
+
+def arquivos():
+    """Arquivos dos ícones em icones/, embutidos na folha de estilo."""
+    return [os.path.join(DIR_ICONES, arquivo) for arquivo, _, _ in ICONES.values()]
+
+
+def _data_uri(caminho):
+    with open(caminho, "rb") as f:
+        conteudo = base64.b64encode(f.read()).decode("ascii")
+    return f"data:{_TIPOS[os.path.splitext(caminho)[1]]};base64,{conteudo}"
+
+
+def folha_estilo():
+    """CSS com uma classe por ícone, refeito só quando algum arquivo muda."""
+    global _folha
+    caminhos = arquivos()
+    versao = []
+    for caminho in caminhos:
+        try:
+            versao.append(dados.impressao_digital(caminho))
+        except FileNotFoundError:
+            versao.append(None)
+    with _trava:
+        if _folha[0] == versao:
+            return _folha[1]
+    regras = [".atlas-icone { background: transparent center / contain no-repeat; border: none; }"]
+    for (nome, (_, original, _)), caminho, existe in zip(ICONES.items(), caminhos, versao):
+        imagem = _data_uri(caminho) if existe else original
+        regras.append(f".atlas-icone-{nome} {{ background-image: url({imagem}); }}")
+    css = "\n".join(regras)
+    with _trava:
+        _folha = (versao, css)
+    return css
+
+
+def baixar():
+    """Copia para icones/ os ícones originais que ainda não estão lá."""
+    os.makedirs(DIR_ICONES, exist_ok=True)
+    for nome, (arquivo, original, _) in ICONES.items():
+        caminho = os.path.join(DIR_ICONES, arquivo)
+        if os.path.exists(caminho):
+            continue
+        try:
+            with urllib.request.urlopen(original, timeout=30) as resposta:
+                conteudo = resposta.read()
+        except OSError as erro:
+            print(f"{nome}: não baixado ({erro})", file=sys.stderr)
+            continue
+        with open(caminho, "wb") as f:
+            f.write(conteudo)
+        print(f"{nome}: {arquivo} ({len(conteudo) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    baixar()
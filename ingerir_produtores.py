@@ -0,0 +1,44 @@
+"""Converte a planilha de produtores para Parquet.
+
+O arquivo gerado (Produtores_SDA.parquet) já traz as coordenadas em colunas
+numéricas, ORDENHA?/INSEMINA? normalizados e TECNICO, DISTRITO e COMPRADOR
+como categorias. app.py, dashboard_produtores.py e fullscreen_mapa.py o
+leem no lugar da planilha enquanto ele corresponder à versão dela.
+
+Uso:
+    python ingerir_produtores.py [Produtores_SDA.xlsx]
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+import dados
+
+
+def ingerir(caminho=dados.ARQUIVO_PRODUTORES):
+    """Gera o Parquet da planilha e retorna o caminho gravado."""
+    versao = dados.fonte(caminho)
+    df = dados.preparar_produtores(pd.read_excel(caminho))
+    destino = dados.caminho_colunar(caminho)
+    dados.gravar_colunar(df, versao, destino)
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("planilha", nargs="?", default=dados.ARQUIVO_PRODUTORES)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    destino = ingerir(args.planilha)
+    print(f"{destino}: {os.path.getsize(destino) / 1024:.0f} KB em {time.perf_counter() - inicio:.2f} s")
+
+    inicio = time.perf_counter()
+    df = pd.read_parquet(destino)
+    print(f"{len(df)} produtores lidos do Parquet em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
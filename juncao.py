@@ -0,0 +1,219 @@
+"""Junção espacial das feições e dos produtores com os distritos e as áreas urbanas.
+
+Cada feição das camadas (os pontos pela coordenada, linhas e polígonos por
+um ponto interno) e cada produtor recebe o distrito de distrito.geojson que
+o contém e a indicação de cair ou não numa área de urbanas.geojson. A
+junção usa a R-tree do shapely com testes vetorizados, é feita uma vez por
+versão dos arquivos e gravada em DIR_JUNCOES, junto dos artefatos; nos
+reruns os filtros de Distrito e Zona viram comparações de arrays.
+
+Os distritos da planilha não seguem os nomes do distrito.geojson ("Sao
+Miguel ", "SEDE", "Berilandia"...). Cada valor é ligado ao distrito de
+mesmo nome, sem acento e sem caixa ("sede" é o distrito com o nome do
+município); não havendo, ao distrito onde cai a maior parte dos produtores
+com aquele valor.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import shapely
+
+import busca
+import dados
+
+CAMADA_DISTRITOS = "distrito"
+CAMPO_DISTRITO = "DESCRICA3"
+CAMPO_MUNICIPIO = "MUNICIPI4"
+CAMADA_URBANAS = "urbanas"
+DIR_JUNCOES = os.path.join(dados.DIR_ARTEFATOS, "juncoes")
+
+# Distrito das feições fora de todos os distritos
+FORA = -1
+URBANA, RURAL = "Urbana", "Rural"
+ZONAS = [URBANA, RURAL]
+
+_juncoes = {}
+_trava = threading.Lock()
+
+
+def _fonte(caminho):
+    try:
+        return dados.fonte(caminho)
+    except FileNotFoundError:
+        return None
+
+
+def _poligonos(chave):
+    geojson = dados.carregar_geojson(dados.ARQUIVOS_CAMADAS[chave])
+    return geojson["features"], [
+        shapely.geometry.shape(f["geometry"]) if f.get("geometry") else None
+        for f in geojson["features"]
+    ]
+
+
+def nomes_distritos():
+    """Nome de cada distrito, na ordem do distrito.geojson."""
+    features, _ = _poligonos(CAMADA_DISTRITOS)
+    return [(f.get("properties") or {}).get(CAMPO_DISTRITO) for f in features]
+
+
+def arquivos():
+    """Arquivos de que as junções dependem: distritos, áreas urbanas e junções gravadas."""
+    try:
+        gravadas = sorted(os.listdir(DIR_JUNCOES))
+    except OSError:
+        gravadas = []
+    return [
+        dados.ARQUIVOS_CAMADAS[CAMADA_DISTRITOS], dados.ARQUIVOS_CAMADAS[CAMADA_URBANAS],
+        *(os.path.join(DIR_JUNCOES, arquivo) for arquivo in gravadas),
+    ]
+
+
+def _localizar(pontos, poligonos):
+    """Posição do primeiro polígono que contém cada ponto, ou FORA."""
+    resultado = np.full(len(pontos), FORA, dtype=np.int32)
+    if not len(pontos) or not poligonos:
+        return resultado
+    entrada, achado = shapely.STRtree(poligonos).query(pontos, predicate="intersects")
+    # Pontos na divisa de dois polígonos ficam com o primeiro
+    entrada, primeiro = np.unique(entrada, return_index=True)
+    resultado[entrada] = achado[primeiro]
+    return resultado
+
+
+def _juntar(pontos):
+    _, distritos = _poligonos(CAMADA_DISTRITOS)
+    try:
+        _, urbanas = _poligonos(CAMADA_URBANAS)
+    except FileNotFoundError:
+        urbanas = []
+    return {
+        "distrito": _localizar(pontos, distritos),
+        "urbana": _localizar(pontos, urbanas) != FORA,
+    }
+
+
+def _pontos_das_feicoes(geojson):
+    geometrias = np.array([
+        shapely.geometry.shape(f["geometry"]) if f.get("geometry") else None
+        for f in geojson["features"]
+    ], dtype=object)
+    return shapely.point_on_surface(geometrias)
+
+
+def _obter(nome, origem, quantidade, calcular):
+    """Junção em memória, em disco ou calculada, conforme a versão dos arquivos."""
+    versao = {
+        "origem": origem,
+        "distrito": _fonte(dados.ARQUIVOS_CAMADAS[CAMADA_DISTRITOS]),
+        "urbanas": _fonte(dados.ARQUIVOS_CAMADAS[CAMADA_URBANAS]),
+        "quantidade": quantidade,
+    }
+    with _trava:
+        entrada = _juncoes.get(nome)
+        if entrada is not None and entrada[0] == versao:
+            return entrada[1]
+
+    caminho = os.path.join(DIR_JUNCOES, f"{nome}.json")
+    resultado = None
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            gravado = json.load(f)
+        if gravado["fonte"] == versao:
+            resultado = {
+                "distrito": np.array(gravado["distrito"], dtype=np.int32),
+                "urbana": np.array(gravado["urbana"], dtype=bool),
+            }
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if resultado is None:
+        resultado = calcular()
+        try:
+            os.makedirs(DIR_JUNCOES, exist_ok=True)
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump({
+                    "fonte": versao,
+                    "distrito": resultado["distrito"].tolist(),
+                    "urbana": resultado["urbana"].astype(int).tolist(),
+                }, f, separators=(",", ":"))
+        except OSError:
+            # Sem gravar, a junção vale só para este processo
+            pass
+
+    with _trava:
+        _juncoes[nome] = (versao, resultado)
+    return resultado
+
+
+def da_camada(chave, geojson):
+    """Junção das feições da camada, alinhada com geojson (de dados.carregar_camada)."""
+    artefato = dados.caminho_artefato(chave)
+    if dados.artefato_atual(chave) is not None:
+        origem = {"artefato": _fonte(artefato)}
+    else:
+        origem = {"arquivo": dados.fonte_camada(chave)}
+    return _obter(chave, origem, len(geojson["features"]), lambda: _juntar(_pontos_das_feicoes(geojson)))
+
+
+def do_arquivo(chave, geojson):
+    """Junção das feições do GeoJSON original da camada (o de dados.carregar_geojson).
+
+    O artefato compacto pode deixar feições de fora, e então as posições de
+    da_camada não valem para o arquivo original, usado nas exportações.
+    """
+    return _obter(
+        f"{chave}_original", {"arquivo": dados.fonte_camada(chave)}, len(geojson["features"]),
+        lambda: _juntar(_pontos_das_feicoes(geojson)),
+    )
+
+
+def dos_produtores(df):
+    """Junção dos produtores pelas coordenadas, alinhada com dados.carregar_produtores()."""
+    origem = {
+        "planilha": _fonte(dados.ARQUIVO_PRODUTORES),
+        "colunar": _fonte(dados.caminho_colunar()),
+    }
+    return _obter(
+        "produtores", origem, len(df),
+        lambda: _juntar(shapely.points(df["LONGITUDE"].to_numpy(), df["LATITUDE"].to_numpy())),
+    )
+
+
+def distritos_da_selecao(valores, df):
+    """Posições, no distrito.geojson, dos distritos correspondentes aos valores da planilha."""
+    features, _ = _poligonos(CAMADA_DISTRITOS)
+    por_nome = {}
+    for posicao, feature in enumerate(features):
+        props = feature.get("properties") or {}
+        por_nome[busca.normalizar(props.get(CAMPO_DISTRITO, "")).strip()] = posicao
+        if busca.normalizar(props.get(CAMPO_DISTRITO, "")) == busca.normalizar(props.get(CAMPO_MUNICIPIO, "")):
+            por_nome["sede"] = posicao
+
+    juncao = None
+    selecionados = set()
+    for valor in valores:
+        nome = busca.normalizar(valor).strip()
+        if nome in por_nome:
+            selecionados.add(por_nome[nome])
+            continue
+        if juncao is None:
+            juncao = dos_produtores(df)["distrito"]
+        dentro = juncao[(df["DISTRITO"] == valor).to_numpy() & (juncao != FORA)]
+        if len(dentro):
+            selecionados.add(int(np.bincount(dentro).argmax()))
+    return np.array(sorted(selecionados), dtype=np.int32)
+
+
+def posicoes(juncao, distritos=None, zonas=None):
+    """Posições que caem nos distritos e nas zonas informados; None se nada restringe."""
+    if distritos is None and not zonas:
+        return None
+    manter = np.ones(len(juncao["distrito"]), dtype=bool)
+    if distritos is not None:
+        manter &= np.isin(juncao["distrito"], distritos)
+    if zonas and set(zonas) != set(ZONAS):
+        manter &= juncao["urbana"] if URBANA in zonas else ~juncao["urbana"]
+    return np.flatnonzero(manter)
@@ -0,0 +1,650 @@
+"""Montagem das camadas do mapa do atlas."""
+import hashlib
+import json
+import os
+import re
+import time
+
+import folium
+from folium.elements import JSCSSMixin
+from folium.plugins import Draw, Fullscreen, MarkerCluster, MeasureControl, MousePosition, Search, VectorGridProtobuf
+from folium.template import Template
+from folium.utilities import camelize
+
+import agregacao
+import camadas
+import dados
+import icones
+import medidas
+import mvt
+import popups
+
+# Dados das camadas publicados como JSON estático (ver publicar)
+DIR_CAMADAS = "static/camadas"
+URL_CAMADAS = "/app/static/camadas"
+# Versões (ou recortes) publicadas ficam enquanto alguma página as usou nos
+# últimos RETENCAO_MINUTOS; a mais recente de cada camada fica sempre
+RETENCAO_MINUTOS = 60
+
+# A partir deste número de feições uma camada de pontos é agrupada
+# automaticamente, mesmo que o agrupamento não tenha sido pedido.
+LIMIAR_CLUSTER = 300
+
+# Monta os marcadores a partir das linhas [lat, lon, valores...] e o popup a
+# partir da descrição em popups.para_js, só quando ele é aberto
+_CALLBACK_PONTOS = """(function () {
+    var icone = %(icone)s;
+    var popup = %(popup)s;
+    function texto(valor, padrao) {
+        return valor === null || valor === undefined || valor === "" ? padrao : String(valor);
+    }
+    function escapar(valor) {
+        return valor.replace(/[&<>"']/g, function (c) { return "&#" + c.charCodeAt(0) + ";"; });
+    }
+    function conteudo(row) {
+        var html = popup.titulo ? "<h4>" + popup.titulo + "</h4>" : "";
+        for (var i = 0; i < popup.campos.length; i++) {
+            var campo = popup.campos[i];
+            html += "<p><strong>" + campo[1] + "</strong> " + escapar(texto(row[campo[0]], campo[2])) + "</p>";
+        }
+        return "<div class=\\"" + popup.classe + "\\">" + html + "</div>";
+    }
+    return function (row) {
+        var nome = popup.tooltip[0] === null ? popup.tooltip[1] : texto(row[popup.tooltip[0]], popup.tooltip[1]);
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icone, nome: nome});
+        if (nome) { marker.bindTooltip(escapar(nome)); }
+        if (popup.campos.length) {
+            marker.bindPopup(function () { return conteudo(row); }, {maxWidth: popup.largura});
+        }
+        return marker;
+    };
+})()"""
+
+# Popup padrão: só o tooltip, tirado do primeiro valor da linha
+_SEM_POPUP = {"titulo": None, "classe": "atlas-popup", "campos": [], "tooltip": [2, None], "largura": 300}
+
+
+# As camadas passadas ao st_folium mantêm o _name de folium.FeatureGroup: no
+# modo incremental ele chama map_div.addLayer(feature_group_feature_group_N)
+
+class CamadaPontos(JSCSSMixin, folium.FeatureGroup):
+    """Camada cujos marcadores são criados no navegador a partir de um array.
+
+    data é a lista de linhas ou a URL de um JSON com ela (ver publicar). Com
+    agrupar os marcadores vão para um L.markerClusterGroup. Com agregacao
+    (células de cada zoom, ou a URL delas, rótulos das somas e nome da
+    camada, ver agregacao.py) o mapa mostra as células abaixo de
+    agregacao.ZOOM_PONTOS e só a partir dele baixa os pontos de data.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            {%- set marcadores = "L.markerClusterGroup" if this.agrupar else "L.featureGroup" %}
+            var {{ this.get_name() }} = {{ "L.featureGroup" if this.agregacao else marcadores }}(
+                {{ this.options|tojavascript }}
+            );
+            (function () {
+                var callback = {{ this.callback }};
+                {%- if this.agregacao %}
+                var grupo = {{ this.get_name() }};
+                var agregacao = {{ this.agregacao|tojson }};
+                var marcadores = {{ marcadores }}();
+                var celulas = L.featureGroup();
+                var niveis = null, pontos = null, pedidos = {}, nivel = null;
+                function baixar(fonte, guardar) {
+                    if (typeof fonte !== "string") { guardar(fonte); mostrar(); return; }
+                    if (pedidos[fonte]) { return; }
+                    pedidos[fonte] = true;
+                    fetch(fonte)
+                        .then(function (resposta) { return resposta.json(); })
+                        .then(function (data) { guardar(data); mostrar(); });
+                }
+                function numero(valor) { return valor.toLocaleString("pt-BR"); }
+                function desenhar(z) {
+                    celulas.clearLayers();
+                    var linhas = niveis[z] || [];
+                    for (var i = 0; i < linhas.length; i++) {
+                        var linha = linhas[i];
+                        var lado = Math.round(22 + 8 * Math.log(linha[2]) / Math.LN10);
+                        var texto = "<strong>" + agregacao.nome + ":</strong> " + numero(linha[2]);
+                        for (var j = 0; j < agregacao.somas.length; j++) {
+                            texto += "<br>" + agregacao.somas[j] + ": " + numero(linha[3 + j]);
+                        }
+                        L.marker([linha[0], linha[1]], {
+                            icon: L.divIcon({className: "atlas-celula", html: numero(linha[2]), iconSize: [lado, lado]})
+                        }).bindTooltip(texto).addTo(celulas);
+                    }
+                    nivel = z;
+                }
+                function mostrar() {
+                    var mapa = grupo._map;
+                    if (!mapa) { return; }
+                    var zoom = mapa.getZoom();
+                    if (zoom >= agregacao.zoom_pontos) {
+                        grupo.removeLayer(celulas);
+                        if (pontos === null) {
+                            baixar({{ this.data|tojson }}, function (data) {
+                                pontos = data;
+                                for (var i = 0; i < data.length; i++) { callback(data[i]).addTo(marcadores); }
+                            });
+                            return;
+                        }
+                        grupo.addLayer(marcadores);
+                    } else {
+                        grupo.removeLayer(marcadores);
+                        if (niveis === null) {
+                            baixar(agregacao.niveis, function (data) { niveis = data; });
+                            return;
+                        }
+                        var z = String(Math.min(Math.max(zoom, agregacao.zoom_min), agregacao.zoom_pontos - 1));
+                        if (z !== nivel) { desenhar(z); }
+                        grupo.addLayer(celulas);
+                    }
+                }
+                grupo.on("add", function () { grupo._map.on("zoomend", mostrar); mostrar(); });
+                grupo.on("remove", function () { grupo._map.off("zoomend", mostrar); });
+                {%- else %}
+                function adicionar(data) {
+                    for (var i = 0; i < data.length; i++) {
+                        callback(data[i]).addTo({{ this.get_name() }});
+                    }
+                }
+                {%- if this.data is string %}
+                fetch({{ this.data|tojson }})
+                    .then(function (resposta) { return resposta.json(); })
+                    .then(adicionar);
+                {%- else %}
+                adicionar({{ this.data|tojson }});
+                {%- endif %}
+                {%- endif %}
+            })();
+        {% endmacro %}
+        """
+    )
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, data, callback, name=None, agrupar=False, agregacao=None, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.data = data
+        self.callback = callback
+        self.agrupar = agrupar
+        self.agregacao = agregacao
+
+
+class CamadaGeoJson(folium.FeatureGroup):
+    """Camada de linhas ou polígonos lida pelo navegador de um GeoJSON publicado.
+
+    estilo é o dict do style_function do folium.GeoJson; tooltip é o trio
+    (campo, rótulo, padrão) e popup o par (campo, padrão) do valor que abre
+    ao clicar; o padrão aparece quando o campo está vazio. Com
+    mostrar_medidas o popup mostra também a área e o perímetro calculados no
+    servidor (ver medidas.py).
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup(
+                {{ this.options|tojavascript }}
+            );
+            fetch({{ this.url|tojson }})
+                .then(function (resposta) { return resposta.json(); })
+                .then(function (data) {
+                    L.geoJson(data, {
+                        style: function () { return {{ this.estilo|tojson }}; },
+                        onEachFeature: function (feature, layer) {
+                            var props = feature.properties || {};
+                            function valor(campo, padrao) {
+                                var v = props[campo];
+                                return v === null || v === undefined || v === "" ? (padrao || "") : String(v);
+                            }
+                            {%- if this.tooltip %}
+                            layer.bindTooltip(
+                                "<strong>" + {{ this.tooltip[1]|tojson }} + "</strong> "
+                                + valor({{ this.tooltip[0]|tojson }}, {{ this.tooltip[2]|tojson }})
+                            );
+                            {%- endif %}
+                            {%- if this.popup or this.mostrar_medidas %}
+                            var conteudo = [];
+                            {%- if this.popup %}
+                            conteudo.push(valor({{ this.popup[0]|tojson }}, {{ this.popup[1]|tojson }}));
+                            {%- endif %}
+                            {%- if this.mostrar_medidas %}
+                            conteudo.push("<strong>📏 Área:</strong> " + valor({{ this.campos_medidas[0]|tojson }}) + " ha");
+                            conteudo.push("<strong>Perímetro:</strong> " + valor({{ this.campos_medidas[1]|tojson }}) + " km");
+                            {%- endif %}
+                            layer.bindPopup(conteudo.join("<br>"), {maxWidth: 300});
+                            {%- endif %}
+                        }
+                    }).addTo({{ this.get_name() }});
+                });
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, url, name=None, estilo=None, tooltip=None, popup=None, mostrar_medidas=False, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.url = url
+        self.estilo = estilo or {}
+        self.tooltip = tooltip
+        self.popup = popup
+        self.mostrar_medidas = mostrar_medidas
+        self.campos_medidas = medidas.CAMPOS
+
+
+class BuscaCamada(JSCSSMixin, folium.MacroElement):
+    """Caixa de busca pelo nome dos marcadores de uma camada.
+
+    Deve ser filha da própria camada: a caixa entra e sai do mapa junto com
+    ela, inclusive quando o st_folium troca as camadas sem recriar o mapa.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = new L.Control.Search({
+                layer: {{ this._parent.get_name() }},
+                propertyName: "nome",
+                initial: false,
+                hideMarkerOnCollapse: true,
+                textPlaceholder: {{ this.placeholder|tojson }},
+                position: "topleft"
+            });
+            {{ this._parent.get_name() }}.on("add", function (e) {
+                e.target._map.addControl({{ this.get_name() }});
+            });
+            {{ this._parent.get_name() }}.on("remove", function () {
+                {{ this.get_name() }}.remove();
+            });
+        {% endmacro %}
+        """
+    )
+
+    default_js = Search.default_js
+    default_css = Search.default_css
+
+    def __init__(self, placeholder):
+        super().__init__()
+        self._name = "BuscaCamada"
+        self.placeholder = placeholder
+
+
+class EstiloPagina(folium.MacroElement):
+    """Folha de estilo dos ícones locais, dos popups e das células, uma vez por página."""
+
+    def __init__(self):
+        super().__init__()
+        self._name = "EstiloPagina"
+
+    def render(self, **kwargs):
+        estilo = folium.Element(
+            f"<style>{icones.folha_estilo()}\n{popups.folha_estilo(camadas.popups_declarados())}\n"
+            f"{agregacao.folha_estilo()}</style>"
+        )
+        self.get_root().header.add_child(estilo, name="atlas_estilo")
+        super().render(**kwargs)
+
+
+class Dependencias(JSCSSMixin, folium.MacroElement):
+    """Carrega no mapa base as bibliotecas usadas pelas camadas.
+
+    O st_folium só carrega scripts ao criar o mapa; camadas adicionadas
+    depois dependem do que o mapa base já trouxe.
+    """
+
+    default_js = MarkerCluster.default_js + VectorGridProtobuf.default_js + Search.default_js
+    default_css = MarkerCluster.default_css + Search.default_css
+
+    def __init__(self):
+        super().__init__()
+        self._name = "Dependencias"
+
+
+def _icone_js(icone, tamanho_icone):
+    if isinstance(icone, folium.Icon):
+        opcoes = {camelize(chave): valor for chave, valor in icone.options.items()}
+        return f"L.AwesomeMarkers.icon({json.dumps(opcoes)})"
+    if icone in icones.ICONES:
+        tamanho = list(tamanho_icone or icones.tamanho(icone))
+        return f"L.divIcon({{className: {json.dumps(icones.classe(icone))}, iconSize: {json.dumps(tamanho)}}})"
+    return f"L.icon({{iconUrl: {json.dumps(icone)}, iconSize: {json.dumps(list(tamanho_icone))}}})"
+
+
+def deve_agrupar(pontos, agrupar=None):
+    """Decide se a camada será agrupada: pedido explícito ou tamanho acima do limiar."""
+    return bool(agrupar) or len(pontos) >= LIMIAR_CLUSTER
+
+
+def camada_pontos(nome, pontos, icone, popup=None, tamanho_icone=None, agrupar=None, chave=None, celulas=None):
+    """Cria a camada de uma lista de pontos [lat, lon, valores...].
+
+    Os pontos vão para o navegador como um único array e os marcadores são
+    criados no cliente, agrupados pelo Leaflet.markercluster ou não; popup é
+    a descrição gerada por popups.para_js (sem ela o primeiro valor vira o
+    tooltip). Com chave o array é publicado como JSON estático com esse nome
+    (ver publicar) e baixado pelo navegador. icone é o nome de um ícone local
+    (ver icones.py), a URL de uma imagem (com tamanho_icone) ou um
+    folium.Icon. celulas são os níveis de agregacao.Grade.niveis, com os
+    rótulos das somas, publicados junto com os pontos ou, sem chave,
+    embutidos como eles.
+    """
+    callback = _CALLBACK_PONTOS % {
+        "icone": _icone_js(icone, tamanho_icone),
+        "popup": json.dumps(popup or _SEM_POPUP, ensure_ascii=False),
+    }
+    data = publicar(chave, pontos) if chave else pontos
+    opcoes_agregacao = None
+    if celulas is not None:
+        niveis, rotulos = celulas
+        opcoes_agregacao = {
+            "niveis": publicar(f"{chave}_celulas", niveis) if chave else niveis, "somas": rotulos, "nome": nome,
+            "zoom_min": agregacao.ZOOM_MIN, "zoom_pontos": agregacao.ZOOM_PONTOS,
+        }
+    return CamadaPontos(
+        data, callback, name=nome, agrupar=deve_agrupar(pontos, agrupar), agregacao=opcoes_agregacao
+    )
+
+
+def camada_pontos_geojson(chave, geojson, agrupar=None, completo=None, posicoes=None):
+    """Camada de pontos de um GeoJSON, com o ícone e o popup do registro.
+
+    completo é o GeoJSON carregado de que geojson foi recortado e posicoes
+    as posições das feições de geojson nele: as células saem da grade do
+    carregado (agregacao.grade_camada), montada uma vez por versão.
+    """
+    camada = camadas.CAMADAS[chave]
+    spec = camada["popup"]
+    linhas = popups.linhas(geojson, spec)
+    celulas = None
+    if agregacao.deve_agregar(len(linhas)):
+        somas = camada.get("somas", [])
+        grade = agregacao.grade_camada(geojson if completo is None else completo)
+        niveis = grade.niveis(somas, None if completo is None else posicoes)
+        celulas = (niveis, [rotulo for _, rotulo in somas])
+    grupo = camada_pontos(
+        camada["nome"], linhas, camada["icone"], popups.para_js(chave, spec),
+        agrupar=agrupar, chave=chave, celulas=celulas
+    )
+    if camada.get("busca"):
+        BuscaCamada(camada["busca"]).add_to(grupo)
+    return grupo
+
+
+def publicar(nome, conteudo):
+    """Grava o conteúdo como JSON estático e retorna a URL servida pelo Streamlit.
+
+    O nome do arquivo leva o hash do conteúdo: enquanto a camada (ou o recorte
+    dela) não muda a URL é a mesma e o navegador reaproveita o que já baixou.
+    Cada uso renova o arquivo, e os que nenhuma página usa há RETENCAO_MINUTOS
+    são descartados: a retenção é por idade, não por quantidade, para que os
+    recortes de uma sessão não apaguem os que outra sessão ainda baixa.
+    """
+    texto = json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    arquivo = f"{nome}-{hashlib.sha1(texto).hexdigest()[:16]}.json"
+    caminho = os.path.join(DIR_CAMADAS, arquivo)
+    if os.path.exists(caminho):
+        os.utime(caminho)
+    else:
+        os.makedirs(DIR_CAMADAS, exist_ok=True)
+        temporario = caminho + ".tmp"
+        with open(temporario, "wb") as f:
+            f.write(texto)
+        os.replace(temporario, caminho)
+        _descartar_antigos(nome)
+    return f"{URL_CAMADAS}/{arquivo}"
+
+
+def renovar_publicados(html):
+    """Confirma que os JSON publicados citados no HTML ainda existem e os marca como usados.
+
+    O HTML do cache (cache_mapa.py) pode sobreviver às versões que ele cita,
+    descartadas por _descartar_antigos; nesse caso retorna False e o mapa
+    deve ser montado de novo, o que as publica outra vez.
+    """
+    for arquivo in set(re.findall(re.escape(URL_CAMADAS) + r"/([\w.-]+\.json)", html)):
+        try:
+            os.utime(os.path.join(DIR_CAMADAS, arquivo))
+        except OSError:
+            return False
+    return True
+
+
+def bytes_enviados(grupo):
+    """Bytes dos dados da camada recebidos pelo navegador, embutidos ou publicados.
+
+    None para as vector tiles, baixadas sob demanda conforme a área visível.
+    Das camadas agregadas contam as células, o que vai no zoom inicial, e
+    os pontos só se forem embutidos.
+    """
+    conteudo = getattr(grupo, "url", None) or getattr(grupo, "data", None)
+    if getattr(grupo, "agregacao", None):
+        conteudo = grupo.agregacao["niveis"]
+        if not isinstance(grupo.data, str):
+            conteudo = [conteudo, grupo.data]
+    if conteudo is None:
+        return None
+    if isinstance(conteudo, str):
+        try:
+            return os.path.getsize(os.path.join(DIR_CAMADAS, conteudo.rsplit("/", 1)[-1]))
+        except OSError:
+            return None
+    return len(json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _descartar_antigos(nome):
+    versoes = []
+    for arquivo in os.listdir(DIR_CAMADAS):
+        if arquivo.startswith(nome + "-") and arquivo.endswith(".json"):
+            caminho = os.path.join(DIR_CAMADAS, arquivo)
+            try:
+                versoes.append((os.stat(caminho).st_mtime_ns, caminho))
+            except OSError:
+                pass
+    limite = time.time_ns() - RETENCAO_MINUTOS * 60 * 10 ** 9
+    for mtime, caminho in sorted(versoes, reverse=True)[1:]:
+        if mtime >= limite:
+            continue
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def camada_produtores(df, agrupar=None, completo=None):
+    """Camada dos produtores; depende dos filtros, então vai embutida, sem publicar.
+
+    Os nomes dos produtores não vão para static/, que qualquer um baixa. Com
+    muitos produtores as células (agregacao.py) vão embutidas junto com os
+    pontos, que só viram marcadores de perto. completo é a planilha
+    carregada de que df foi filtrado, cuja grade é reaproveitada.
+    """
+    camada = camadas.CAMADAS["produtores"]
+    spec = camada["popup"]
+    celulas = None
+    if agregacao.deve_agregar(len(df)):
+        somas = camada.get("somas", [])
+        if completo is None or df is completo:
+            niveis = agregacao.grade_produtores(df).niveis(somas)
+        else:
+            niveis = agregacao.grade_produtores(completo).niveis(somas, completo.index.get_indexer(df.index))
+        celulas = (niveis, [rotulo for _, rotulo in somas])
+    return camada_pontos(
+        camada["nome"], popups.linhas_df(df, spec), camada["icone"], popups.para_js("produtores", spec),
+        agrupar=agrupar, celulas=celulas
+    )
+
+
+def tiles_da_camada(chave):
+    """Metadados das vector tiles da camada, se existirem e estiverem atualizadas."""
+    try:
+        return mvt.metadados(chave, dados.fonte_camada(chave))
+    except OSError:
+        return None
+
+
+def estrategia(chave):
+    """Caminho mais leve disponível para desenhar a camada (ver camadas.py).
+
+    Linhas e polígonos usam as vector tiles, se geradas para a versão atual
+    do arquivo; senão o GeoJSON simplificado, se houver artefato atual; senão
+    o GeoJSON original. A estratégia declarada no registro tem precedência.
+    """
+    camada = camadas.CAMADAS[chave]
+    if camada["geometria"] == camadas.PONTO:
+        return camadas.PONTOS
+    if camada.get("estrategia"):
+        return camada["estrategia"]
+    if tiles_da_camada(chave):
+        return camadas.TILES
+    try:
+        if dados.artefato_atual(chave) is not None:
+            return camadas.SIMPLIFICADA
+    except OSError:
+        pass
+    return camadas.GEOJSON
+
+
+def montar_camada(chave, estrategia, conteudo, agrupar=None, completo=None, posicoes=None):
+    """Cria a camada do registro pela estratégia escolhida.
+
+    conteudo são os metadados das tiles (estratégia TILES) ou o GeoJSON
+    carregado, talvez recortado (demais estratégias); completo e posicoes
+    vão para camada_pontos_geojson.
+    """
+    camada = camadas.CAMADAS[chave]
+    if estrategia == camadas.TILES:
+        return camada_vetorial(camada["nome"], chave, conteudo, camada["estilo"])
+    if estrategia == camadas.PONTOS:
+        return camada_pontos_geojson(chave, conteudo, agrupar=agrupar, completo=completo, posicoes=posicoes)
+    return CamadaGeoJson(
+        publicar(chave, conteudo), name=camada["nome"], estilo=camada["estilo"],
+        tooltip=camada.get("tooltip"), popup=camada.get("campo_popup"),
+        mostrar_medidas=camada.get("medidas", False)
+    )
+
+
+def camada_vetorial(nome, camada, meta, estilo):
+    """Cria a camada servida em vector tiles locais (ver gerar_tiles.py).
+
+    meta são os metadados das tiles (mvt.metadados) e estilo o mesmo dict
+    usado no style_function do folium.GeoJson.
+    """
+    options = {
+        "vectorTileLayerStyles": {camada: dict(estilo, fill="fillColor" in estilo)},
+        "minNativeZoom": meta["zoom_min"],
+        "maxNativeZoom": meta["zoom_max"],
+    }
+    # Dentro de um FeatureGroup, como as demais camadas, para o st_folium
+    grupo = folium.FeatureGroup(name=nome)
+    VectorGridProtobuf(mvt.url_camada(camada), options=options).add_to(grupo)
+    return grupo
+
+
+# Proxy local das camadas de fundo (proxy_tiles.py), como http://servidor:8600;
+# vazio, o navegador busca as tiles direto nos provedores
+URL_PROXY_TILES = os.environ.get("ATLAS_PROXY_TILES", "").rstrip("/")
+
+CAMADAS_FUNDO = [
+    {
+        "chave": "topo",
+        "name": "Top Map",
+        "url": "https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
+        "attr": "Map tiles by Stamen Design, under CC BY 3.0. Data by OpenStreetMap, under ODbL."
+    },
+    {
+        "chave": "sentinel2",
+        "name": "Sentinel-2 (sem nuvem)",
+        "url": "https://tiles.maps.eox.at/wmts/1.0.0/s2cloudless-2021_3857/default/g/{z}/{y}/{x}.jpg",
+        "attr": "Sentinel-2 cloudless by EOX"
+    },
+    {
+        "chave": "google_satelite",
+        "name": "Google Satellite",
+        "url": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
+        "attr": "Google Satellite imagery"
+    },
+    {
+        "chave": "google_ruas",
+        "name": "Google Streets",
+        "url": "https://mt1.google.com/vt/lyrs=r&x={x}&y={y}&z={z}",
+        "attr": "Google Streets imagery"
+    },
+    {
+        "chave": "carto_claro",
+        "name": "CartoDB Positron",
+        "url": "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
+        "attr": "© OpenStreetMap contributors, © CARTO"
+    },
+    {
+        "chave": "carto_escuro",
+        "name": "CartoDB Dark Matter",
+        "url": "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png",
+        "attr": "© OpenStreetMap contributors, © CARTO"
+    },
+    {
+        "chave": "esri_satelite",
+        "name": "Esri Satellite",
+        "url": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+        "attr": "Tiles © Esri — Source: Esri, i-cubed, USDA, USGS, AEX, GeoEye, Getmapping, etc."
+    },
+    {
+        "chave": "google_relevo",
+        "name": "Google Terrain",
+        "url": "https://mt1.google.com/vt/lyrs=p&x={x}&y={y}&z={z}",
+        "attr": "Google Terrain imagery"
+    },
+    {
+        "chave": "osm",
+        "name": "Open Street Map",
+        "url": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+        "attr": "© OpenStreetMap contributors"
+    },
+]
+
+
+def url_fundo(layer):
+    """URL das tiles da camada de fundo, pelo proxy local quando configurado."""
+    if URL_PROXY_TILES:
+        return f"{URL_PROXY_TILES}/{layer['chave']}/{{z}}/{{x}}/{{y}}"
+    return layer["url"]
+
+
+def mapa_base():
+    """Mapa com as camadas de fundo e os controles, sem as camadas de dados.
+
+    É sempre igual: no modo incremental o st_folium cria o mapa uma vez no
+    navegador e depois só troca as camadas passadas em feature_group_to_add.
+    """
+    m = folium.Map(location=[-5.1971, -39.2886], zoom_start=10, tiles=None)
+    Dependencias().add_to(m)
+    EstiloPagina().add_to(m)
+    Fullscreen(position='topright', title='Tela Cheia', title_cancel='Sair da Tela Cheia', force_separate_button=True).add_to(m)
+    m.add_child(MeasureControl(
+        primary_length_unit="meters",
+        secondary_length_unit="kilometers",
+        primary_area_unit="hectares",
+        secondary_area_unit="sqmeters",
+        position="topleft"
+    ))
+    for layer in CAMADAS_FUNDO:
+        folium.TileLayer(
+            tiles=url_fundo(layer),
+            attr=layer["attr"],
+            name=layer["name"]
+        ).add_to(m)
+    MousePosition().add_to(m)
+    Draw(
+        export=True,
+        draw_options={
+            "polyline": True,
+            "polygon": {"allowIntersection": False, "showArea": True},
+            "rectangle": {"showArea": True},
+            "circle": {"showArea": True},
+            "circlemarker": False
+        },
+        edit_options={"edit": True, "remove": True}
+    ).add_to(m)
+    return m
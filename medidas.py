@@ -0,0 +1,124 @@
+"""Área e comprimento geodésicos de geometrias GeoJSON, calculados no servidor.
+
+As medidas são feitas sobre a esfera de raio médio da Terra: a área pela
+soma dos trapézios esféricos de cada aresta (a mesma fórmula do
+L.GeometryUtil.geodesicArea) e o comprimento pela fórmula de haversine.
+Para áreas do tamanho de um município o erro em relação ao elipsoide fica
+abaixo de 0,5%.
+"""
+import math
+
+import numpy as np
+
+import dados
+
+RAIO_TERRA = 6371008.8
+
+# Propriedades acrescentadas às feições das camadas com medidas
+CAMPO_AREA = "area_ha"
+CAMPO_PERIMETRO = "perimetro_km"
+CAMPOS = [CAMPO_AREA, CAMPO_PERIMETRO]
+
+# Vértices do polígono usado no lugar de um círculo desenhado
+VERTICES_CIRCULO = 64
+
+
+def _anel(coordenadas):
+    anel = np.asarray(coordenadas, dtype=float)[:, :2]
+    if len(anel) and not np.array_equal(anel[0], anel[-1]):
+        anel = np.vstack([anel, anel[:1]])
+    return np.radians(anel)
+
+
+def area_anel(coordenadas):
+    """Área, em m², do anel [[lon, lat], ...], fechado ou não."""
+    anel = _anel(coordenadas)
+    if len(anel) < 4:
+        return 0.0
+    lon, lat = anel[:, 0], anel[:, 1]
+    soma = np.sum((lon[1:] - lon[:-1]) * (2 + np.sin(lat[:-1]) + np.sin(lat[1:])))
+    return float(abs(soma) * RAIO_TERRA ** 2 / 2)
+
+
+def comprimento_linha(coordenadas):
+    """Comprimento, em metros, da linha [[lon, lat], ...]."""
+    linha = np.radians(np.asarray(coordenadas, dtype=float)[:, :2])
+    if len(linha) < 2:
+        return 0.0
+    lon, lat = linha[:, 0], linha[:, 1]
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return float(np.sum(2 * RAIO_TERRA * np.arcsin(np.sqrt(a))))
+
+
+def _poligonos(geometria):
+    if geometria["type"] == "Polygon":
+        return [geometria["coordinates"]]
+    if geometria["type"] == "MultiPolygon":
+        return geometria["coordinates"]
+    return []
+
+
+def _linhas(geometria):
+    if geometria["type"] == "LineString":
+        return [geometria["coordinates"]]
+    if geometria["type"] == "MultiLineString":
+        return geometria["coordinates"]
+    return []
+
+
+def circulo(lon, lat, raio, vertices=VERTICES_CIRCULO):
+    """Polígono GeoJSON que aproxima o círculo de raio em metros."""
+    angulos = np.linspace(0, 2 * math.pi, vertices, endpoint=False)
+    dlat = math.degrees(raio / RAIO_TERRA)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-12)
+    anel = [[lon + dlon * math.cos(a), lat + dlat * math.sin(a)] for a in angulos]
+    return {"type": "Polygon", "coordinates": [anel + [anel[0]]]}
+
+
+def _fechada(linha):
+    return len(linha) >= 4 and linha[0][:2] == linha[-1][:2]
+
+
+def area(geometria):
+    """Área, em m², de um Polygon ou MultiPolygon (anéis internos descontados).
+
+    Linhas fechadas, como os contornos importados de KML das áreas de
+    reforma, contam como polígonos.
+    """
+    poligonos = sum(
+        max(area_anel(aneis[0]) - sum(area_anel(buraco) for buraco in aneis[1:]), 0.0)
+        for aneis in _poligonos(geometria)
+        if aneis
+    )
+    return poligonos + sum(area_anel(linha) for linha in _linhas(geometria) if _fechada(linha))
+
+
+def comprimento(geometria):
+    """Comprimento das linhas, ou perímetro dos polígonos, em metros."""
+    linhas = _linhas(geometria) or [aneis[0] for aneis in _poligonos(geometria) if aneis]
+    return sum(comprimento_linha(linha) for linha in linhas)
+
+
+def medir(geometria):
+    """(área em ha, comprimento ou perímetro em km) da geometria."""
+    return round(float(area(geometria)) / 10_000, 2), round(float(comprimento(geometria)) / 1000, 3)
+
+
+def _com_medidas(geojson):
+    features = []
+    for feature in geojson["features"]:
+        props = feature.get("properties") or {}
+        if feature.get("geometry") and not all(campo in props for campo in CAMPOS):
+            area_ha, perimetro_km = medir(feature["geometry"])
+            props = dict(props, **{CAMPO_AREA: area_ha, CAMPO_PERIMETRO: perimetro_km})
+        features.append(dict(feature, properties=props))
+    return dict(geojson, features=features)
+
+
+def com_medidas(geojson):
+    """Cópia rasa do GeoJSON com a área e o perímetro nas propriedades de cada feição.
+
+    Calculada uma vez por versão dos dados; feições que já trazem as medidas
+    (como as dos artefatos, medidas na geometria original) são mantidas.
+    """
+    return dados.derivado(geojson, _com_medidas)
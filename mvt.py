@@ -0,0 +1,247 @@
+"""Recorte de camadas em Mapbox Vector Tiles (MVT) servidos localmente.
+
+As tiles ficam em static/tiles/<camada>/<z>/<x>/<y>.pbf e são servidas pelo
+próprio Streamlit (server.enableStaticServing), de modo que o navegador busca
+só as tiles da área e do zoom visíveis, sem depender de serviço externo.
+
+O codificador abaixo implementa o subconjunto da especificação MVT 2.1 usado
+pelo atlas (pontos, linhas e polígonos com propriedades simples), sem
+dependências além do shapely.
+"""
+import json
+import math
+import os
+import struct
+
+import numpy as np
+import shapely
+
+DIR_TILES = os.path.join("static", "tiles")
+URL_TILES = "/app/static/tiles"
+
+EXTENT = 4096
+# Margem em volta de cada tile, para que traços nas bordas não fiquem cortados
+BUFFER = 64
+
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+_PONTO, _LINHA, _POLIGONO = 1, 2, 3
+
+
+# Protobuf
+
+def _varint(n):
+    saida = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return bytes(saida)
+
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def _campo_varint(numero, valor):
+    return _varint(numero << 3) + _varint(valor)
+
+
+def _campo_bytes(numero, conteudo):
+    return _varint((numero << 3) | 2) + _varint(len(conteudo)) + conteudo
+
+
+def _valor(v):
+    if isinstance(v, bool):
+        return _campo_varint(7, int(v))
+    if isinstance(v, int):
+        return _campo_varint(5, v) if v >= 0 else _campo_varint(6, _zigzag(v))
+    if isinstance(v, float):
+        return _varint((3 << 3) | 1) + struct.pack("<d", v)
+    return _campo_bytes(1, str(v).encode("utf-8"))
+
+
+# Geometria
+
+def _comando(cmd, quantidade):
+    return (cmd & 0x7) | (quantidade << 3)
+
+
+def _sem_repetidos(coords):
+    saida = [coords[0]]
+    for ponto in coords[1:]:
+        if ponto != saida[-1]:
+            saida.append(ponto)
+    return saida
+
+
+def _area(anel):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(anel, anel[1:] + anel[:1]))
+
+
+class _Cursor:
+    def __init__(self):
+        self.x = self.y = 0
+
+    def deltas(self, pontos):
+        saida = []
+        for x, y in pontos:
+            saida += [_zigzag(x - self.x), _zigzag(y - self.y)]
+            self.x, self.y = x, y
+        return saida
+
+
+def _inteiros(geometria):
+    return [tuple(p) for p in np.rint(shapely.get_coordinates(geometria)).astype(int).tolist()]
+
+
+def _partes(geometria):
+    if hasattr(geometria, "geoms"):
+        return list(geometria.geoms)
+    return [geometria]
+
+
+def _codificar_geometria(geometria):
+    """Retorna (tipo MVT, comandos) ou None se nada sobrar após a quantização."""
+    cursor = _Cursor()
+    comandos = []
+    tipo = geometria.geom_type
+    if tipo == "GeometryCollection":
+        # O recorte pode devolver sobras de outras dimensões (um vértice
+        # tocando a borda, por exemplo); fica só a parte de maior dimensão.
+        maior = max(shapely.get_dimensions(geometria.geoms))
+        partes = [g for g in geometria.geoms if shapely.get_dimensions(g) == maior]
+        geometria = shapely.union_all(partes) if len(partes) > 1 else partes[0]
+        tipo = geometria.geom_type
+
+    if tipo in ("Point", "MultiPoint"):
+        pontos = [p for parte in _partes(geometria) for p in _inteiros(parte)]
+        if not pontos:
+            return None
+        return _PONTO, [_comando(_MOVE_TO, len(pontos))] + cursor.deltas(pontos)
+
+    if tipo in ("LineString", "MultiLineString"):
+        for linha in _partes(geometria):
+            coords = _sem_repetidos(_inteiros(linha)) if not linha.is_empty else []
+            if len(coords) < 2:
+                continue
+            comandos += [_comando(_MOVE_TO, 1)] + cursor.deltas(coords[:1])
+            comandos += [_comando(_LINE_TO, len(coords) - 1)] + cursor.deltas(coords[1:])
+        return (_LINHA, comandos) if comandos else None
+
+    if tipo in ("Polygon", "MultiPolygon"):
+        for poligono in _partes(geometria):
+            if poligono.is_empty:
+                continue
+            aneis = [poligono.exterior] + list(poligono.interiors)
+            for i, anel in enumerate(aneis):
+                coords = _sem_repetidos(_inteiros(anel)[:-1])
+                area = _area(coords) if len(coords) >= 3 else 0
+                if area == 0:
+                    if i == 0:
+                        break  # sem anel externo os buracos não fazem sentido
+                    continue
+                # Com o eixo y para baixo, o anel externo tem área positiva
+                # e os buracos, negativa.
+                if (i == 0) != (area > 0):
+                    coords.reverse()
+                comandos += [_comando(_MOVE_TO, 1)] + cursor.deltas(coords[:1])
+                comandos += [_comando(_LINE_TO, len(coords) - 1)] + cursor.deltas(coords[1:])
+                comandos.append(_comando(_CLOSE_PATH, 1))
+        return (_POLIGONO, comandos) if comandos else None
+
+    return None
+
+
+def codificar_tile(nome_camada, feicoes):
+    """Codifica uma camada MVT a partir de [(geometria em coordenadas da tile, propriedades)]."""
+    chaves, valores = {}, {}
+    corpo = b""
+    for geometria, props in feicoes:
+        codificada = _codificar_geometria(geometria)
+        if codificada is None:
+            continue
+        tipo, comandos = codificada
+        tags = []
+        for chave, valor in props.items():
+            if valor is None or valor != valor:
+                continue
+            if not isinstance(valor, (str, int, float, bool)):
+                valor = json.dumps(valor, ensure_ascii=False)
+            tags.append(chaves.setdefault(chave, len(chaves)))
+            tags.append(valores.setdefault((type(valor).__name__, valor), len(valores)))
+        feicao = b""
+        if tags:
+            feicao += _campo_bytes(2, b"".join(_varint(t) for t in tags))
+        feicao += _campo_varint(3, tipo)
+        feicao += _campo_bytes(4, b"".join(_varint(c) for c in comandos))
+        corpo += _campo_bytes(2, feicao)
+    if not corpo:
+        return None
+
+    camada = _campo_varint(15, 2) + _campo_bytes(1, nome_camada.encode("utf-8")) + corpo
+    for chave in chaves:
+        camada += _campo_bytes(3, chave.encode("utf-8"))
+    for _, valor in valores:
+        camada += _campo_bytes(4, _valor(valor))
+    camada += _campo_varint(5, EXTENT)
+    return _campo_bytes(3, camada)
+
+
+# Recorte
+
+def _projetar(coords, zoom):
+    """Converte lon/lat para coordenadas globais em unidades de tile no zoom."""
+    escala = EXTENT * 2 ** zoom
+    lon, lat = coords[:, 0], np.clip(coords[:, 1], -85.0511, 85.0511)
+    x = (lon + 180) / 360 * escala
+    y = (1 - np.arcsinh(np.tan(np.radians(lat))) / math.pi) / 2 * escala
+    return np.column_stack([x, y])
+
+
+def cortar(nome_camada, geometrias, propriedades, zoom):
+    """Gera (x, y, bytes) de cada tile não vazia da camada no zoom."""
+    projetadas = shapely.transform(np.asarray(geometrias, dtype=object), lambda c: _projetar(c, zoom))
+    # Um pixel de uma tile de 256 px
+    projetadas = shapely.simplify(projetadas, EXTENT / 256, preserve_topology=True)
+    arvore = shapely.STRtree(projetadas)
+    xmin, ymin, xmax, ymax = shapely.total_bounds(projetadas)
+    for tx in range(int(xmin // EXTENT), int(xmax // EXTENT) + 1):
+        for ty in range(int(ymin // EXTENT), int(ymax // EXTENT) + 1):
+            x0, y0 = tx * EXTENT, ty * EXTENT
+            caixa = (x0 - BUFFER, y0 - BUFFER, x0 + EXTENT + BUFFER, y0 + EXTENT + BUFFER)
+            feicoes = []
+            for i in arvore.query(shapely.box(*caixa)):
+                recorte = shapely.clip_by_rect(projetadas[i], *caixa)
+                if recorte.is_empty:
+                    continue
+                local = shapely.transform(recorte, lambda c: c - (x0, y0))
+                feicoes.append((local, propriedades[i]))
+            conteudo = codificar_tile(nome_camada, feicoes)
+            if conteudo:
+                yield tx, ty, conteudo
+
+
+# Uso pelo app
+
+def caminho_meta(nome):
+    return os.path.join(DIR_TILES, nome, "meta.json")
+
+
+def metadados(nome, fonte):
+    """Metadados das tiles da camada, ou None se não existem ou estão desatualizadas.
+
+    fonte é o dict {"mtime_ns", "tamanho"} do GeoJSON de origem.
+    """
+    try:
+        with open(caminho_meta(nome), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("fonte") == fonte else None
+
+
+def url_camada(nome):
+    return f"{URL_TILES}/{nome}/{{z}}/{{x}}/{{y}}.pbf"
@@ -0,0 +1,97 @@
+"""Modo de perfil do app: quanto tempo leva cada etapa do rerun.
+
+Ligado com ?perfil=1 na URL ou com a variável de ambiente ATLAS_PERFIL=1.
+Cada etapa do app.py (leitura da planilha e das camadas, filtros, recorte,
+montagem das camadas, serialização do mapa) é cronometrada, e cada camada
+registra quantas feições e quantos bytes manda ao navegador. O resultado
+aparece num painel da barra lateral e é acrescentado, uma linha JSON por
+rerun, a ARQUIVO_LOG, para acompanhar a evolução ao longo do tempo.
+"""
+import contextlib
+import json
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+
+ARQUIVO_LOG = os.environ.get("ATLAS_PERFIL_LOG", "perfil.jsonl")
+
+
+def ligado():
+    """Se o perfil foi pedido pela URL ou pelo ambiente."""
+    if os.environ.get("ATLAS_PERFIL", "0") not in ("", "0"):
+        return True
+    return st.query_params.get("perfil", "0") not in ("", "0")
+
+
+class Perfil:
+    """Tempos e medidas de um rerun; desligado, não mede nada."""
+
+    def __init__(self, ativo):
+        self.ativo = ativo
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.camadas = {}
+        self.medidas = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nome, camada=None):
+        """Cronometra o bloco; com camada o tempo fica nas medidas dela."""
+        if not self.ativo:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            if camada is None:
+                self.etapas.append((nome, segundos))
+            else:
+                self.camada(camada, **{f"{nome}_s": segundos})
+
+    def camada(self, chave, **medidas):
+        if self.ativo:
+            self.camadas.setdefault(chave, {}).update(medidas)
+
+    def medir(self, **medidas):
+        if self.ativo:
+            self.medidas.update(medidas)
+
+    def registro(self):
+        return {
+            "quando": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_s": round(time.perf_counter() - self.inicio, 6),
+            "etapas": {nome: round(segundos, 6) for nome, segundos in self.etapas},
+            "camadas": {
+                chave: {k: round(v, 6) if isinstance(v, float) else v for k, v in medidas.items()}
+                for chave, medidas in self.camadas.items()
+            },
+            **self.medidas,
+        }
+
+    def gravar(self, registro):
+        try:
+            with open(ARQUIVO_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as erro:
+            st.sidebar.warning(f"Não foi possível gravar o perfil em {ARQUIVO_LOG}: {erro}")
+
+    def finalizar(self):
+        """Grava o registro do rerun e mostra o painel na barra lateral."""
+        if not self.ativo:
+            return
+        registro = self.registro()
+        self.gravar(registro)
+        with st.sidebar.expander("⏱️ Perfil do rerun", expanded=True):
+            st.metric("Total", f"{registro['total_s'] * 1000:.0f} ms")
+            etapas = pd.DataFrame(
+                [(nome, segundos * 1000) for nome, segundos in self.etapas], columns=["Etapa", "ms"]
+            )
+            st.dataframe(etapas.round(1), hide_index=True)
+            if self.camadas:
+                st.dataframe(pd.DataFrame.from_dict(self.camadas, orient="index").round(4))
+            for nome, valor in self.medidas.items():
+                st.caption(f"{nome}: {valor}")
+            st.caption(f"Registrado em {ARQUIVO_LOG}")
@@ -0,0 +1,87 @@
+"""Popups das camadas de pontos, descritos por camada e montados no navegador.
+
+Cada camada declara no registro (camadas.py) o título, as cores e os campos
+(propriedade, rótulo e valor padrão) do seu popup. Para o navegador vão só
+os valores desses campos, um array por ponto; o HTML é montado por um único
+template no cliente, quando o popup é aberto, e o estilo vai uma vez por
+página como classes CSS.
+"""
+import html
+
+# Spec de um popup (declarada em camadas.CAMADAS):
+#   campos: [(propriedade, rótulo, valor padrão)]
+#   tooltip: (propriedade, valor padrão), ou (None, texto fixo)
+#   titulo, cor, cor_titulo, fundo: opcionais; sem título o popup é uma lista
+#   largura: largura máxima em pixels
+LARGURA_PADRAO = 300
+
+_ESTILO_BASE = """
+.atlas-popup { font-family: Arial, sans-serif; }
+.atlas-popup p { margin: 0; }
+.atlas-popup-cartao { border: 2px solid; border-radius: 8px; padding: 8px; }
+.atlas-popup-cartao h4 { margin: 0 0 8px 0; border-bottom: 1px solid #ccc; }
+.atlas-popup-cartao p { margin: 4px 0; }
+"""
+
+
+def colunas(spec):
+    """Propriedades enviadas ao navegador para cada ponto, na ordem do array."""
+    nomes = [campo for campo, _, _ in spec["campos"]]
+    tooltip = spec.get("tooltip", (None, None))[0]
+    if tooltip is not None and tooltip not in nomes:
+        nomes.append(tooltip)
+    return nomes
+
+
+def linhas(geojson, spec):
+    """Linhas [lat, lon, valores...] dos pontos do GeoJSON, só com os campos da spec."""
+    nomes = colunas(spec)
+    resultado = []
+    for feature in geojson["features"]:
+        geometria = feature.get("geometry")
+        if not geometria or geometria.get("type") != "Point":
+            continue
+        lon, lat = geometria["coordinates"][:2]
+        props = feature.get("properties") or {}
+        resultado.append([lat, lon, *(props.get(nome) for nome in nomes)])
+    return resultado
+
+
+def linhas_df(df, spec):
+    """Linhas [lat, lon, valores...] de um DataFrame, montadas coluna a coluna."""
+    tabela = df[["LATITUDE", "LONGITUDE", *colunas(spec)]]
+    return tabela.astype(object).where(tabela.notna(), None).values.tolist()
+
+
+def classe(chave, spec):
+    if spec.get("titulo"):
+        return f"atlas-popup atlas-popup-cartao atlas-popup-{chave}"
+    return "atlas-popup"
+
+
+def para_js(chave, spec):
+    """Descrição do popup usada pelo template do cliente (ver mapa.py)."""
+    nomes = colunas(spec)
+    campo_tooltip, padrao_tooltip = spec.get("tooltip", (None, None))
+    return {
+        "titulo": html.escape(spec["titulo"]) if spec.get("titulo") else None,
+        "classe": classe(chave, spec),
+        "campos": [
+            [2 + nomes.index(campo), html.escape(rotulo), padrao]
+            for campo, rotulo, padrao in spec["campos"]
+        ],
+        "tooltip": [None if campo_tooltip is None else 2 + nomes.index(campo_tooltip), padrao_tooltip],
+        "largura": spec.get("largura", LARGURA_PADRAO),
+    }
+
+
+def folha_estilo(specs):
+    """CSS dos popups {chave: spec}: a base comum e as cores de cada camada com cartão."""
+    regras = [_ESTILO_BASE.strip()]
+    for chave, spec in specs.items():
+        if spec.get("titulo"):
+            regras.append(
+                f".atlas-popup-{chave} {{ border-color: {spec['cor']}; background-color: {spec['fundo']}; }}\n"
+                f".atlas-popup-{chave} h4 {{ color: {spec.get('cor_titulo', spec['cor'])}; }}"
+            )
+    return "\n".join(regras)
@@ -0,0 +1,299 @@
+"""Proxy local, com cache em disco, das camadas de fundo do mapa.
+
+Cada tile pedida em /<fundo>/<z>/<x>/<y> (fundo é a chave da camada em
+mapa.CAMADAS_FUNDO) é buscada no provedor uma vez e gravada em
+DIR_CACHE/<fundo>/<z>/<x>/<y>; as próximas vêm do disco, na velocidade da
+rede local. Tiles com mais de VALIDADE_DIAS são buscadas de novo, mas se o
+provedor não responder (sem internet, por exemplo) a cópia antiga é servida.
+Quando o cache passa do limite de tamanho, saem primeiro as tiles usadas há
+mais tempo.
+
+O app usa o proxy quando a variável ATLAS_PROXY_TILES tem o endereço dele.
+A área do município (a extensão de distrito.geojson) pode ser semeada antes,
+nos zooms escolhidos, para funcionar offline. Semeie só o necessário: os
+provedores, como o OpenStreetMap, limitam downloads em massa.
+
+Uso:
+    python proxy_tiles.py servir --porta 8600
+    python proxy_tiles.py semear --zoom 8 14
+    python proxy_tiles.py semear --zoom 15 16 --fundos osm esri_satelite --extensao -39.4 -5.3 -39.1 -5.0
+    ATLAS_PROXY_TILES=http://servidor:8600 streamlit run app.py
+"""
+import argparse
+import math
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import shapely
+
+import dados
+import mapa
+
+DIR_CACHE = os.environ.get("ATLAS_CACHE_TILES", "cache_tiles")
+LIMITE_MB = 2048
+VALIDADE_DIAS = 30
+PORTA = 8600
+# Segundos de espera pelo provedor
+TEMPO_LIMITE = 10
+AGENTE = "atlas-sda-proxy-tiles/1.0"
+SUBDOMINIOS = "abc"
+# Downloads simultâneos ao semear, e o máximo de tiles por semeadura
+LEITORES_SEMEADURA = 4
+MAX_TILES_SEMEADURA = 20_000
+
+_ROTA = re.compile(r"^/(\w+)/(\d+)/(\d+)/(\d+)(?:\.\w+)?$")
+_TIPOS = [(b"\x89PNG", "image/png"), (b"\xff\xd8", "image/jpeg"), (b"RIFF", "image/webp"), (b"GIF8", "image/gif")]
+
+
+def fundos():
+    return {layer["chave"]: layer for layer in mapa.CAMADAS_FUNDO}
+
+
+def tipo(conteudo):
+    """Content-Type da tile, pelos primeiros bytes."""
+    return next((t for inicio, t in _TIPOS if conteudo.startswith(inicio)), "application/octet-stream")
+
+
+class CacheTiles:
+    """Tiles gravadas em disco, com o tamanho total limitado.
+
+    A ordem de uso fica em memória; ao iniciar, as tiles já gravadas entram
+    na ordem em que foram baixadas.
+    """
+
+    def __init__(self, pasta=DIR_CACHE, max_bytes=LIMITE_MB * 1024 * 1024):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        gravadas = []
+        for raiz, _, arquivos in os.walk(pasta):
+            for nome in arquivos:
+                if nome.endswith(".tmp"):
+                    continue
+                info = os.stat(os.path.join(raiz, nome))
+                gravadas.append((info.st_mtime, os.path.join(raiz, nome), info.st_size))
+        for _, caminho, tamanho in sorted(gravadas):
+            self._itens[caminho] = tamanho
+            self.bytes += tamanho
+
+    def caminho(self, fundo, z, x, y):
+        return os.path.join(self.pasta, fundo, str(z), str(x), str(y))
+
+    def ler(self, fundo, z, x, y):
+        """(conteúdo, idade em segundos) da tile, ou None se não estiver no cache."""
+        caminho = self.caminho(fundo, z, x, y)
+        try:
+            with open(caminho, "rb") as f:
+                conteudo = f.read()
+            idade = time.time() - os.stat(caminho).st_mtime
+        except OSError:
+            return None
+        with self._trava:
+            if caminho in self._itens:
+                self._itens.move_to_end(caminho)
+        return conteudo, idade
+
+    def gravar(self, fundo, z, x, y, conteudo):
+        caminho = self.caminho(fundo, z, x, y)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        removidos = []
+        with self._trava:
+            self.bytes -= self._itens.pop(caminho, 0)
+            self._itens[caminho] = len(conteudo)
+            self.bytes += len(conteudo)
+            while self.bytes > self.max_bytes and len(self._itens) > 1:
+                removido, tamanho = self._itens.popitem(last=False)
+                self.bytes -= tamanho
+                removidos.append(removido)
+        for removido in removidos:
+            try:
+                os.remove(removido)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class Proxy:
+    """Busca as tiles no cache ou no provedor.
+
+    Com origem, todas as camadas são buscadas em <origem>/<fundo>/<z>/<x>/<y>
+    em vez dos provedores, como num servidor local que faça as vezes deles.
+    """
+
+    def __init__(self, cache, origem=None, validade_dias=VALIDADE_DIAS):
+        self.cache = cache
+        self.origem = origem.rstrip("/") if origem else None
+        self.validade = validade_dias * 86400
+        self.fundos = fundos()
+
+    def url(self, fundo, z, x, y):
+        if self.origem:
+            return f"{self.origem}/{fundo}/{z}/{x}/{y}"
+        return self.fundos[fundo]["url"].format(s=SUBDOMINIOS[(x + y) % len(SUBDOMINIOS)], z=z, x=x, y=y, r="")
+
+    def baixar(self, fundo, z, x, y):
+        pedido = urllib.request.Request(self.url(fundo, z, x, y), headers={"User-Agent": AGENTE})
+        with urllib.request.urlopen(pedido, timeout=TEMPO_LIMITE) as resposta:
+            return resposta.read()
+
+    def obter(self, fundo, z, x, y):
+        """(conteúdo, situação), com situação HIT, MISS ou STALE (cópia vencida, provedor fora).
+
+        Levanta KeyError para um fundo desconhecido e urllib.error.URLError
+        (ou OSError) se a tile não está no cache e o provedor não a entrega.
+        """
+        if fundo not in self.fundos:
+            raise KeyError(fundo)
+        guardada = self.cache.ler(fundo, z, x, y)
+        if guardada is not None and guardada[1] < self.validade:
+            return guardada[0], "HIT"
+        try:
+            conteudo = self.baixar(fundo, z, x, y)
+        except OSError:
+            if guardada is not None:
+                return guardada[0], "STALE"
+            raise
+        self.cache.gravar(fundo, z, x, y, conteudo)
+        return conteudo, "MISS"
+
+
+def _tratador(proxy):
+    class Tratador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            rota = _ROTA.match(self.path.split("?")[0])
+            if not rota:
+                self.send_error(404)
+                return
+            fundo, z, x, y = rota.group(1), *map(int, rota.groups()[1:4])
+            try:
+                conteudo, situacao = proxy.obter(fundo, z, x, y)
+            except KeyError:
+                self.send_error(404, f"camada de fundo desconhecida: {fundo}")
+                return
+            except urllib.error.HTTPError as erro:
+                self.send_error(erro.code)
+                return
+            except OSError as erro:
+                self.send_error(502, f"provedor indisponível: {erro}")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", tipo(conteudo))
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.send_header("Cache-Control", "public, max-age=86400")
+            self.send_header("X-Cache", situacao)
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Tratador
+
+
+def servidor(proxy, porta=PORTA, endereco=""):
+    """Servidor HTTP do proxy, ainda parado (serve_forever para atender)."""
+    return ThreadingHTTPServer((endereco, porta), _tratador(proxy))
+
+
+def tile(lon, lat, z):
+    """(x, y) da tile do ponto no zoom z."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_da_extensao(extensao, zooms):
+    """(z, x, y) das tiles que cobrem a extensão (oeste, sul, leste, norte) nos zooms."""
+    oeste, sul, leste, norte = extensao
+    for z in zooms:
+        x0, y0 = tile(oeste, norte, z)
+        x1, y1 = tile(leste, sul, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def extensao_municipio():
+    """Extensão (oeste, sul, leste, norte) dos distritos do município."""
+    geojson = dados.carregar_geojson(dados.ARQUIVOS_CAMADAS["distrito"])
+    geometrias = [shapely.geometry.shape(f["geometry"]) for f in geojson["features"] if f.get("geometry")]
+    return tuple(float(v) for v in shapely.total_bounds(geometrias))
+
+
+def semear(proxy, chaves, extensao, zooms, leitores=LEITORES_SEMEADURA):
+    """Baixa para o cache as tiles da extensão; retorna quantas vieram de cada situação."""
+    pedidos = [(fundo, z, x, y) for fundo in chaves for z, x, y in tiles_da_extensao(extensao, zooms)]
+    contagem = {"HIT": 0, "MISS": 0, "STALE": 0, "falha": 0}
+
+    def baixar(pedido):
+        try:
+            return proxy.obter(*pedido)[1]
+        except OSError:
+            return "falha"
+
+    with ThreadPoolExecutor(max_workers=leitores) as pool:
+        for situacao in pool.map(baixar, pedidos):
+            contagem[situacao] += 1
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache", default=DIR_CACHE)
+    parser.add_argument("--limite-mb", type=int, default=LIMITE_MB, help="tamanho máximo do cache")
+    parser.add_argument("--validade-dias", type=int, default=VALIDADE_DIAS)
+    parser.add_argument("--origem", help="servidor que substitui os provedores, em <origem>/<fundo>/<z>/<x>/<y>")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    servir = comandos.add_parser("servir", help="atende as tiles em /<fundo>/<z>/<x>/<y>")
+    servir.add_argument("--porta", type=int, default=PORTA)
+    servir.add_argument("--endereco", default="")
+    semeadura = comandos.add_parser("semear", help="baixa antes as tiles de uma área")
+    semeadura.add_argument("--zoom", type=int, nargs=2, required=True, metavar=("MIN", "MAX"))
+    semeadura.add_argument("--fundos", nargs="+", choices=list(fundos()), help="padrão: todas as camadas de fundo")
+    semeadura.add_argument(
+        "--extensao", type=float, nargs=4, metavar=("OESTE", "SUL", "LESTE", "NORTE"),
+        help="padrão: a extensão de distrito.geojson"
+    )
+    semeadura.add_argument("--max-tiles", type=int, default=MAX_TILES_SEMEADURA)
+    args = parser.parse_args()
+
+    proxy = Proxy(CacheTiles(args.cache, args.limite_mb * 1024 * 1024), args.origem, args.validade_dias)
+    if args.comando == "servir":
+        print(f"proxy de tiles em http://{args.endereco or 'localhost'}:{args.porta}, "
+              f"{len(proxy.cache)} tiles em {args.cache} ({proxy.cache.bytes / 1024 / 1024:.0f} MB)")
+        servidor(proxy, args.porta, args.endereco).serve_forever()
+        return
+
+    extensao = args.extensao or extensao_municipio()
+    chaves = args.fundos or list(proxy.fundos)
+    zooms = range(args.zoom[0], args.zoom[1] + 1)
+    quantidade = len(chaves) * sum(1 for _ in tiles_da_extensao(extensao, zooms))
+    if quantidade > args.max_tiles:
+        parser.error(f"{quantidade} tiles passam de --max-tiles {args.max_tiles}; reduza os zooms ou as camadas")
+    inicio = time.perf_counter()
+    contagem = semear(proxy, chaves, extensao, zooms)
+    print(
+        f"{quantidade} tiles: {contagem['MISS']} baixadas, {contagem['HIT']} já em cache, "
+        f"{contagem['STALE'] + contagem['falha']} sem resposta do provedor ({time.perf_counter() - inicio:.0f} s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import pandas as pd
+
+import busca
+
+
+def _produtores():
+    return pd.DataFrame({
+        "PRODUTOR": ["JOÃO DA SILVA", "Maria Vasconcelos", "José Joaquim", None, "Antônio Souza"],
+        "APELIDO": ["Joãozinho", None, "Zé", "Joao", "Toinho"],
+        "FAZENDA": ["Sítio Açude", "Fazenda Boa Vista", "Sítio São João", "Sítio Novo", float("nan")],
+    })
+
+
+def test_normalizar_tira_acentos_e_caixa():
+    assert busca.normalizar("JOÃO Açude Ñ") == "joao acude n"
+    assert busca.termos("São-João, nº 12") == ["sao", "joao", "no", "12"]
+
+
+def test_busca_ignora_acentos_dos_dois_lados():
+    indice = busca.IndiceBusca(_produtores())
+    assert set(indice.buscar("acude").tolist()) == {0}
+    assert set(indice.buscar("ANTÔNIO").tolist()) == {4}
+    assert set(indice.buscar("antonio").tolist()) == {4}
+
+
+def test_prefixo_e_trecho_no_meio_da_palavra():
+    indice = busca.IndiceBusca(_produtores())
+    assert indice.buscar("vasc").tolist() == [1]
+    assert indice.buscar("concelos").tolist() == [1]
+    # Trechos curtos demais para os trigramas só casam como prefixo
+    assert indice.buscar("ce").size == 0
+
+
+def test_ranking_pelo_tipo_de_casamento_e_pela_coluna():
+    indice = busca.IndiceBusca(_produtores())
+    # Exato em PRODUTOR (0), depois em APELIDO (3), depois em FAZENDA (2)
+    assert indice.buscar("joao").tolist() == [0, 3, 2]
+    # Empate de pontuação fica na ordem das linhas
+    assert indice.buscar("sitio").tolist() == [0, 2, 3]
+
+
+def test_todos_os_termos_precisam_casar():
+    indice = busca.IndiceBusca(_produtores())
+    assert indice.buscar("joao silva").tolist() == [0]
+    assert indice.buscar("joao vasconcelos").size == 0
+    assert indice.buscar("").size == 0
+    assert indice.buscar("!!!").size == 0
+
+
+def test_indice_e_reaproveitado_enquanto_o_dataframe_e_o_mesmo():
+    df = _produtores()
+    assert busca.indice(df) is busca.indice(df)
+    assert busca.indice(df.copy()) is not busca.indice(df)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import shapely
+
+import espacial
+
+
+def _pontos(n=2000, semente=1):
+    rng = np.random.default_rng(semente)
+    coords = np.column_stack([-40 + rng.random(n) * 2, -6 + rng.random(n) * 2])
+    coords[::97] = np.nan
+    return coords
+
+
+def _na_forca(coords, oeste, sul, leste, norte):
+    x, y = coords[:, 0], coords[:, 1]
+    return np.flatnonzero((x >= oeste) & (x <= leste) & (y >= sul) & (y <= norte))
+
+
+@pytest.mark.parametrize("limites", [
+    (-39.5, -5.5, -39.0, -5.0),
+    (-41.0, -7.0, -37.0, -3.0),
+    (-39.2, -5.3, -39.2, -5.3),
+    (-50.0, -50.0, -45.0, -45.0),
+])
+def test_grade_encontra_os_mesmos_pontos_que_a_forca_bruta(limites):
+    coords = _pontos()
+    np.testing.assert_array_equal(espacial.GradePontos(coords).consultar(*limites), _na_forca(coords, *limites))
+
+
+def test_grade_inclui_os_pontos_na_borda_e_ignora_os_sem_coordenada():
+    coords = np.array([[0.0, 0.0], [1.0, 1.0], [np.nan, 0.5], [2.0, 2.0]])
+    grade = espacial.GradePontos(coords)
+    assert grade.consultar(0.0, 0.0, 1.0, 1.0).tolist() == [0, 1]
+    assert grade.consultar(-10, -10, 10, 10).tolist() == [0, 1, 3]
+    assert espacial.GradePontos(np.full((3, 2), np.nan)).consultar(-10, -10, 10, 10).size == 0
+
+
+def test_grade_de_pontos_no_mesmo_lugar():
+    grade = espacial.GradePontos(np.array([[-39.0, -5.0]] * 5))
+    assert grade.consultar(-39.1, -5.1, -38.9, -4.9).tolist() == [0, 1, 2, 3, 4]
+    assert grade.consultar(-38.9, -5.1, -38.8, -4.9).size == 0
+
+
+def test_pontos_dentro_do_poligono():
+    coords = _pontos()
+    poligono = shapely.Polygon([(-39.5, -5.5), (-39.0, -5.5), (-39.25, -5.0)])
+    esperado = np.flatnonzero(shapely.contains_xy(poligono, coords[:, 0], coords[:, 1]))
+    np.testing.assert_array_equal(espacial.GradePontos(coords).dentro(poligono), esperado)
+
+
+def test_limites_consulta_acrescenta_margem_e_arredonda_para_fora():
+    sw, ne = [-5.32, -39.42], [-5.12, -39.22]
+    oeste, sul, leste, norte = espacial.limites_consulta(sw, ne)
+    assert (oeste, sul, leste, norte) == (-39.5, -5.4, -39.15, -5.05)
+    # A margem (um quarto da largura e da altura) fica dentro dos limites
+    assert oeste <= -39.47 and sul <= -5.37 and leste >= -39.17 and norte >= -5.07
+    for valor in (oeste, sul, leste, norte):
+        assert round(valor / espacial.PASSO, 6) == round(valor / espacial.PASSO)
+
+
+def test_limites_consulta_iguais_para_pequenos_deslocamentos():
+    base = espacial.limites_consulta([-5.32, -39.42], [-5.12, -39.22])
+    assert espacial.limites_consulta([-5.31, -39.41], [-5.11, -39.21]) == base
+    assert espacial.limites_consulta([-5.36, -39.46], [-5.16, -39.26]) != base
+
+
+def test_limites_do_mapa():
+    bounds = {"_southWest": {"lat": -5.3, "lng": -39.4}, "_northEast": {"lat": -5.1, "lng": -39.2}}
+    assert espacial.limites_do_mapa(bounds) == ([-5.3, -39.4], [-5.1, -39.2])
+    assert espacial.limites_do_mapa(None) is None
+    assert espacial.limites_do_mapa({"_southWest": {"lat": None, "lng": None}, "_northEast": {"lat": 1, "lng": 1}}) is None
+
+
+def test_recorte_de_linhas_e_poligonos_respeita_a_selecao():
+    features = [
+        {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}},
+        {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": [[5, 5], [6, 6]]}},
+        {"type": "Feature", "properties": {}, "geometry": None},
+        {"type": "Feature", "properties": {},
+         "geometry": {"type": "Polygon", "coordinates": [[[0.5, 0], [2, 0], [2, 2], [0.5, 0]]]}},
+    ]
+    geojson = {"type": "FeatureCollection", "features": features}
+    assert espacial.posicoes_recorte(geojson, (0.4, 0.0, 0.6, 0.6)).tolist() == [0, 3]
+    assert espacial.posicoes_recorte(geojson, (0.4, 0.0, 0.6, 0.6), np.array([1, 3])).tolist() == [3]
+    recortado = espacial.selecionar(geojson, [0, 3])
+    assert recortado["features"][0] is features[0]
+    assert espacial.selecionar(geojson, [0, 1, 2, 3]) is geojson
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import sqlite3
+import struct
+
+import pandas as pd
+import pytest
+import shapely
+
+import exportacao
+
+
+def _camada():
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "properties": {"nome": "Açude A", "volume": 1.5, "ativo": True, "fid": 10},
+             "geometry": {"type": "Polygon", "coordinates": [[[-39.3, -5.2], [-39.2, -5.2], [-39.2, -5.1], [-39.3, -5.2]]]}},
+            {"type": "Feature", "properties": {"nome": "Poço B", "volume": None, "ativo": False, "fid": 11},
+             "geometry": {"type": "Point", "coordinates": [-39.5, -5.4]}},
+            {"type": "Feature", "properties": {"nome": "Sem geometria", "volume": 2.0, "ativo": True, "fid": 12},
+             "geometry": None},
+        ],
+    }
+
+
+def _ler_geopackage(conteudo, tmp_path):
+    caminho = tmp_path / "lido.gpkg"
+    caminho.write_bytes(conteudo)
+    conexao = sqlite3.connect(caminho)
+    conexao.row_factory = sqlite3.Row
+    return conexao
+
+
+def _geometria(blob):
+    """Geometria do blob do GeoPackage: cabeçalho GP de 8 bytes, envelope conforme as flags e WKB."""
+    assert blob[:2] == b"GP"
+    flags = blob[3]
+    envelope = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[(flags >> 1) & 0x7]
+    (srs,) = struct.unpack("<i", blob[4:8])
+    return srs, shapely.from_wkb(blob[8 + envelope:])
+
+
+def test_geopackage_volta_com_geometrias_propriedades_e_metadados(tmp_path):
+    geojson = _camada()
+    campos = exportacao.campos_camada(geojson)
+    lotes = exportacao.lotes_camada(geojson, tamanho=2)
+    conexao = _ler_geopackage(exportacao.conteudo("Açudes", "GeoPackage", campos, lotes), tmp_path)
+    try:
+        assert conexao.execute("PRAGMA application_id").fetchone()[0] == 0x47504B47
+        (contents,) = conexao.execute("SELECT * FROM gpkg_contents").fetchall()
+        assert contents["table_name"] == "Acudes"
+        assert contents["data_type"] == "features"
+        assert contents["srs_id"] == exportacao.SRS_WGS84
+        assert (contents["min_x"], contents["min_y"], contents["max_x"], contents["max_y"]) == (-39.5, -5.4, -39.2, -5.1)
+        (coluna,) = conexao.execute("SELECT * FROM gpkg_geometry_columns").fetchall()
+        assert (coluna["table_name"], coluna["column_name"], coluna["srs_id"]) == ("Acudes", "geom", exportacao.SRS_WGS84)
+        assert conexao.execute(
+            "SELECT COUNT(*) FROM gpkg_spatial_ref_sys WHERE srs_id = ?", (exportacao.SRS_WGS84,)
+        ).fetchone()[0] == 1
+
+        linhas = conexao.execute('SELECT * FROM "Acudes" ORDER BY fid').fetchall()
+        assert len(linhas) == 3
+        # "fid" das propriedades não colide com a chave primária do GeoPackage
+        assert [(l["nome"], l["volume"], l["ativo"], l["c3"]) for l in linhas] == [
+            ("Açude A", 1.5, 1, 10), ("Poço B", None, 0, 11), ("Sem geometria", 2.0, 1, 12),
+        ]
+        for linha, feature in zip(linhas[:2], geojson["features"]):
+            srs, geometria = _geometria(linha["geom"])
+            assert srs == exportacao.SRS_WGS84
+            assert geometria.equals(shapely.geometry.shape(feature["geometry"]))
+        assert linhas[2]["geom"] is None
+    finally:
+        conexao.close()
+
+
+def test_geopackage_grava_o_envelope_de_cada_geometria(tmp_path):
+    lotes = exportacao.lotes_camada(_camada(), posicoes=[0])
+    conexao = _ler_geopackage(exportacao.conteudo("a", "GeoPackage", [], lotes), tmp_path)
+    try:
+        (blob,) = conexao.execute('SELECT geom FROM "a"').fetchone()
+    finally:
+        conexao.close()
+    assert struct.unpack("<4d", blob[8:40]) == (-39.3, -39.2, -5.2, -5.1)
+
+
+def test_csv_e_geojson_voltam_com_os_mesmos_dados():
+    geojson = _camada()
+    campos = exportacao.campos_camada(geojson)
+    texto = exportacao.conteudo("a", "CSV", campos, exportacao.lotes_camada(geojson)).decode("utf-8-sig")
+    linhas = list(csv.DictReader(io.StringIO(texto)))
+    assert [l["nome"] for l in linhas] == ["Açude A", "Poço B", "Sem geometria"]
+    assert shapely.from_wkt(linhas[1][exportacao.COLUNA_GEOMETRIA]).equals(shapely.Point(-39.5, -5.4))
+
+    lido = json.loads(exportacao.conteudo("a", "GeoJSON", campos, exportacao.lotes_camada(geojson)))
+    assert [f["properties"] for f in lido["features"]] == [f["properties"] for f in geojson["features"]]
+    assert lido["features"][2]["geometry"] is None
+
+
+def test_produtores_dentro_do_poligono():
+    df = pd.DataFrame({
+        "PRODUTOR": ["Dentro", "Fora", "Sem coordenada"],
+        "LATITUDE": [-5.15, -6.0, None], "LONGITUDE": [-39.25, -39.25, None],
+    })
+    poligono = shapely.box(-39.3, -5.2, -39.2, -5.1)
+    lotes = list(exportacao.lotes_produtores(df, ["PRODUTOR"], poligono))
+    assert [p for propriedades, _ in lotes for p in propriedades] == [{"PRODUTOR": "Dentro"}]
+
+    (propriedades, geometrias), = exportacao.lotes_produtores(df, ["PRODUTOR"])
+    assert len(propriedades) == 3
+    assert geometrias[2] is None
+
+
+def test_nome_para_salvar_fica_em_ascii():
+    assert exportacao.nome_arquivo("Açudes", "GeoPackage") == "Acudes.gpkg"
+    assert exportacao.nome_arquivo('Poços <"x">', "CSV") == "Pocos_x.csv"
+    assert exportacao.nome_arquivo("ção", "GeoJSON") == "cao.geojson"
+    assert exportacao.nome_arquivo("<>", "CSV") == "dados.csv"
+
+
+def test_exportacao_publica_respeita_o_limite(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao, "DIR_EXPORTACOES", str(tmp_path))
+    url, salvar, tamanho = exportacao.exportar("Açudes", "GeoJSON", ["nome"], exportacao.lotes_camada(_camada()))
+    assert salvar == "Acudes.geojson"
+    assert url.startswith(f"{exportacao.URL_EXPORTACOES}/Acudes-")
+    assert (tmp_path / url.rsplit("/", 1)[-1]).stat().st_size == tamanho
+
+    monkeypatch.setattr(exportacao, "LIMITE_BYTES", 10)
+    with pytest.raises(ValueError):
+        exportacao.exportar("Açudes", "GeoJSON", ["nome"], exportacao.lotes_camada(_camada()))
+    assert len(list(tmp_path.iterdir())) == 1
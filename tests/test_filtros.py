@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+import filtros
+
+
+def _produtores():
+    return pd.DataFrame({
+        "TECNICO": ["Ana", "Bruno", "Ana", "Carla", "Bruno", None],
+        "DISTRITO": ["Sede", "Sede", "Berilandia", "Sede", "Berilandia", "Sede"],
+        "COMPRADOR": ["Laticínio X", "Laticínio Y", "Laticínio X", "Laticínio X", "Laticínio Y", "Laticínio X"],
+    })
+
+
+def test_opcoes_ordenadas_sem_vazios():
+    indice = filtros.IndiceFiltros(_produtores())
+    assert indice.opcoes("TECNICO") == ["Ana", "Bruno", "Carla"]
+    assert indice.opcoes("DISTRITO") == ["Berilandia", "Sede"]
+
+
+def test_uniao_dentro_da_coluna_e_intersecao_entre_colunas():
+    indice = filtros.IndiceFiltros(_produtores())
+    assert indice.posicoes({"TECNICO": ["Ana", "Carla"]}).tolist() == [0, 2, 3]
+    assert indice.posicoes({"TECNICO": ["Ana", "Bruno"], "DISTRITO": ["Sede"]}).tolist() == [0, 1]
+    assert indice.posicoes({
+        "TECNICO": ["Ana", "Bruno"], "DISTRITO": ["Sede", "Berilandia"], "COMPRADOR": ["Laticínio Y"],
+    }).tolist() == [1, 4]
+
+
+def test_sem_selecao_nao_restringe():
+    df = _produtores()
+    indice = filtros.IndiceFiltros(df)
+    assert indice.posicoes({}) is None
+    assert indice.posicoes({"TECNICO": [], "DISTRITO": []}) is None
+    assert indice.filtrar({"TECNICO": []}) is df
+
+
+def test_valor_ausente_nao_encontra_nada():
+    indice = filtros.IndiceFiltros(_produtores())
+    assert indice.posicoes({"TECNICO": ["Zeca"]}).size == 0
+    assert indice.posicoes({"TECNICO": ["Ana"], "DISTRITO": ["Sede"], "COMPRADOR": ["Outro"]}).size == 0
+
+
+def test_filtrar_igual_a_mascara_do_pandas():
+    df = _produtores()
+    selecoes = {"TECNICO": ["Ana", "Bruno"], "COMPRADOR": ["Laticínio X"]}
+    esperado = df[df["TECNICO"].isin(selecoes["TECNICO"]) & df["COMPRADOR"].isin(selecoes["COMPRADOR"])]
+    pd.testing.assert_frame_equal(filtros.IndiceFiltros(df).filtrar(selecoes), esperado)
+
+
+def test_colunas_categoricas():
+    df = _produtores().astype("category")
+    indice = filtros.IndiceFiltros(df)
+    assert indice.opcoes("DISTRITO") == ["Berilandia", "Sede"]
+    np.testing.assert_array_equal(indice.posicoes({"DISTRITO": ["Berilandia"]}), [2, 4])
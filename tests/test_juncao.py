@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dados
+import juncao
+
+
+def _quadrado(oeste, sul, lado=1.0):
+    return [[[oeste, sul], [oeste + lado, sul], [oeste + lado, sul + lado], [oeste, sul + lado], [oeste, sul]]]
+
+
+def _colecao(features):
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _distrito(nome, oeste):
+    return {
+        "type": "Feature", "properties": {juncao.CAMPO_DISTRITO: nome, juncao.CAMPO_MUNICIPIO: "QUIXERAMOBIM"},
+        "geometry": {"type": "Polygon", "coordinates": _quadrado(oeste, 0)},
+    }
+
+
+@pytest.fixture(autouse=True)
+def arquivos(tmp_path, monkeypatch):
+    distritos = tmp_path / "distrito.geojson"
+    distritos.write_text(json.dumps(_colecao([
+        _distrito("Quixeramobim", 0), _distrito("São Miguel", 1), _distrito("Berilândia", 2),
+    ])), encoding="utf-8")
+    urbanas = tmp_path / "urbanas.geojson"
+    urbanas.write_text(json.dumps(_colecao([
+        {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": _quadrado(0, 0, 0.5)}},
+    ])), encoding="utf-8")
+    monkeypatch.setitem(dados.ARQUIVOS_CAMADAS, juncao.CAMADA_DISTRITOS, str(distritos))
+    monkeypatch.setitem(dados.ARQUIVOS_CAMADAS, juncao.CAMADA_URBANAS, str(urbanas))
+    monkeypatch.setattr(juncao, "DIR_JUNCOES", str(tmp_path / "juncoes"))
+    monkeypatch.setattr(juncao, "_juncoes", {})
+
+
+def _produtores():
+    return pd.DataFrame({
+        "DISTRITO": ["SEDE", "Sao Miguel ", "Nova Fazenda", "Nova Fazenda", "Nova Fazenda", "Longe"],
+        "LONGITUDE": [0.2, 1.5, 2.5, 2.6, 1.5, 10.0],
+        "LATITUDE": [0.2, 0.5, 0.5, 0.5, 0.5, 10.0],
+    })
+
+
+def test_valores_da_planilha_ligados_pelo_nome_sem_acento_nem_caixa():
+    df = _produtores()
+    assert juncao.distritos_da_selecao(["Sao Miguel "], df).tolist() == [1]
+    # "sede" é o distrito com o nome do município
+    assert juncao.distritos_da_selecao(["SEDE"], df).tolist() == [0]
+    assert juncao.distritos_da_selecao(["berilandia", "SEDE"], df).tolist() == [0, 2]
+
+
+def test_valor_sem_nome_correspondente_vai_para_onde_cai_a_maioria():
+    df = _produtores()
+    # Dois dos três produtores de "Nova Fazenda" caem em Berilândia
+    assert juncao.distritos_da_selecao(["Nova Fazenda"], df).tolist() == [2]
+    # Todos fora dos distritos: nenhum
+    assert juncao.distritos_da_selecao(["Longe"], df).size == 0
+
+
+def test_juncao_dos_produtores_com_distritos_e_zonas():
+    df = _produtores()
+    resultado = juncao.dos_produtores(df)
+    assert resultado["distrito"].tolist() == [0, 1, 2, 2, 1, juncao.FORA]
+    assert resultado["urbana"].tolist() == [True, False, False, False, False, False]
+    np.testing.assert_array_equal(juncao.posicoes(resultado, np.array([1, 2])), [1, 2, 3, 4])
+    np.testing.assert_array_equal(juncao.posicoes(resultado, zonas=[juncao.URBANA]), [0])
+    np.testing.assert_array_equal(juncao.posicoes(resultado, np.array([0, 1]), [juncao.RURAL]), [1, 4])
+    assert juncao.posicoes(resultado) is None
+    assert juncao.posicoes(resultado, zonas=juncao.ZONAS).tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_juncao_gravada_e_reaproveitada_enquanto_os_arquivos_nao_mudam(monkeypatch):
+    df = _produtores()
+    primeira = juncao.dos_produtores(df)
+    assert any(arquivo.endswith("produtores.json") for arquivo in juncao.arquivos())
+
+    # Sem o cache em memória, a junção vem do disco, sem recalcular
+    monkeypatch.setattr(juncao, "_juncoes", {})
+    monkeypatch.setattr(juncao, "_juntar", lambda pontos: pytest.fail("junção recalculada"))
+    segunda = juncao.dos_produtores(df)
+    np.testing.assert_array_equal(segunda["distrito"], primeira["distrito"])
+    np.testing.assert_array_equal(segunda["urbana"], primeira["urbana"])
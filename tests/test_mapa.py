@@ -0,0 +1,87 @@
+import os
+import re
+import time
+
+import pandas as pd
+import pytest
+from streamlit_folium import _get_feature_group_string
+
+import camadas
+import mapa
+
+
+@pytest.fixture(autouse=True)
+def dir_camadas(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapa, "DIR_CAMADAS", str(tmp_path))
+
+
+def _grupos():
+    poligono = {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature", "properties": {"Name": "A", "area_ha": 1.0, "perimetro_km": 0.4},
+            "geometry": {"type": "Polygon", "coordinates": [[[-39.3, -5.2], [-39.2, -5.2], [-39.2, -5.1], [-39.3, -5.2]]]},
+        }],
+    }
+    pontos = {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature", "properties": {"Nome": "Escola"},
+            "geometry": {"type": "Point", "coordinates": [-39.3, -5.2]},
+        }],
+    }
+    produtores = pd.DataFrame({
+        "LATITUDE": [-5.2], "LONGITUDE": [-39.3], "PRODUCAO": [10.0],
+        **{coluna: ["x"] for coluna in ("TECNICO", "PRODUTOR", "APELIDO", "FAZENDA", "DISTRITO", "ORDENHA?",
+                                        "INSEMINA?", "LATICINIO", "COMPRADOR", "ESCOLARIDADE")},
+    })
+    return [
+        mapa.camada_produtores(produtores),
+        mapa.camada_pontos_geojson("escolas", pontos),
+        mapa.montar_camada("areas_reforma", camadas.GEOJSON, poligono),
+        mapa.camada_vetorial("Distritos", "distrito", {"zoom_min": 8, "zoom_max": 14}, {"color": "#000"}),
+    ]
+
+
+def test_camadas_declaram_a_variavel_do_st_folium():
+    m = mapa.mapa_base()
+    for idx, grupo in enumerate(_grupos()):
+        js = _get_feature_group_string(grupo, m, idx)
+        declaradas = set(re.findall(r"var (\w+) =", js))
+        alvos = re.findall(r"addLayer\((\w+)\)", js)
+        assert alvos
+        assert set(alvos) <= declaradas, (type(grupo).__name__, set(alvos) - declaradas)
+
+
+def _envelhecer(url, minutos):
+    caminho = os.path.join(mapa.DIR_CAMADAS, url.rsplit("/", 1)[-1])
+    antes = time.time() - minutos * 60
+    os.utime(caminho, (antes, antes))
+
+
+def test_publicados_ficam_pela_idade_e_nao_pela_quantidade():
+    # Muitos recortes recentes, como os de várias sessões movendo o mapa, ficam todos
+    urls = [mapa.publicar("pocos", [[-5.2, -39.3, i]]) for i in range(20)]
+    assert mapa.renovar_publicados(" ".join(urls))
+    _envelhecer(urls[0], mapa.RETENCAO_MINUTOS + 1)
+    mapa.publicar("pocos", [[-5.2, -39.3, 20]])
+    assert not mapa.renovar_publicados(f'fetch("{urls[0]}")')
+    assert mapa.renovar_publicados(" ".join(urls[1:]))
+
+
+def test_html_do_cache_renova_os_publicados():
+    antiga, recente = mapa.publicar("pocos", [[1]]), mapa.publicar("pocos", [[2]])
+    _envelhecer(antiga, mapa.RETENCAO_MINUTOS - 1)
+    # A página em cache usou a antiga agora há pouco: ela não sai no próximo descarte
+    assert mapa.renovar_publicados(f'fetch("{antiga}")')
+    _envelhecer(recente, mapa.RETENCAO_MINUTOS + 1)
+    mapa.publicar("pocos", [[3]])
+    assert mapa.renovar_publicados(f'fetch("{antiga}")')
+    assert not mapa.renovar_publicados(f'fetch("{recente}")')
+
+
+def test_tooltip_dos_poligonos_escapa_o_rotulo_e_usa_o_padrao():
+    grupo = mapa.CamadaGeoJson("/x.json", tooltip=("Name", 'Nome "A":', "Sem Nome"), popup=("Name", "Sem Nome"))
+    js = grupo._template.module.script(grupo)
+    assert '"<strong>" + "Nome \\"A\\":" + "</strong> "' in js
+    assert 'valor("Name", "Sem Nome")' in js
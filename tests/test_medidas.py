@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+import medidas
+
+R = medidas.RAIO_TERRA
+
+
+def _quadrado(oeste, sul, lado):
+    return [[oeste, sul], [oeste + lado, sul], [oeste + lado, sul + lado], [oeste, sul + lado], [oeste, sul]]
+
+
+def test_area_de_um_grau_quadrado_igual_a_da_esfera():
+    # Faixa entre as latitudes 0 e 1, com 1 grau de longitude: R² Δλ (sen φ2 - sen φ1)
+    esperado = R ** 2 * math.radians(1) * math.sin(math.radians(1))
+    area_ha, perimetro_km = medidas.medir({"type": "Polygon", "coordinates": [_quadrado(0, 0, 1)]})
+    assert area_ha == pytest.approx(esperado / 10_000, abs=0.01)
+    # Dois meridianos e o equador: 3 arcos de 1 grau; o paralelo de 1 grau pela corda
+    assert perimetro_km == pytest.approx(4 * R * math.radians(1) / 1000, rel=1e-3)
+
+
+def test_area_nao_depende_do_sentido_do_anel():
+    anel = _quadrado(-39.3, -5.2, 0.1)
+    assert medidas.area_anel(anel) == pytest.approx(medidas.area_anel(anel[::-1]))
+    assert medidas.area_anel(anel[:-1]) == pytest.approx(medidas.area_anel(anel))
+
+
+def test_area_de_um_hectare_no_municipio():
+    # 100 m de lado perto de Quixeramobim
+    lado_lat = math.degrees(100 / R)
+    lado_lon = lado_lat / math.cos(math.radians(-5.2))
+    anel = [[-39.3, -5.2], [-39.3 + lado_lon, -5.2], [-39.3 + lado_lon, -5.2 + lado_lat], [-39.3, -5.2 + lado_lat]]
+    assert medidas.area({"type": "Polygon", "coordinates": [anel]}) == pytest.approx(10_000, rel=1e-3)
+
+
+def test_buracos_e_multipoligonos():
+    externo, buraco = _quadrado(-39.3, -5.2, 0.1), _quadrado(-39.28, -5.18, 0.05)
+    cheio = medidas.area({"type": "Polygon", "coordinates": [externo]})
+    vazado = medidas.area({"type": "Polygon", "coordinates": [externo, buraco]})
+    assert vazado == pytest.approx(cheio - medidas.area_anel(buraco))
+    dois = medidas.area({"type": "MultiPolygon", "coordinates": [[externo], [_quadrado(-39.0, -5.2, 0.1)]]})
+    assert dois == pytest.approx(2 * cheio, rel=1e-4)
+
+
+def test_linhas_fechadas_contam_como_poligonos():
+    anel = _quadrado(-39.3, -5.2, 0.1)
+    assert medidas.area({"type": "LineString", "coordinates": anel}) == pytest.approx(medidas.area_anel(anel))
+    assert medidas.area({"type": "LineString", "coordinates": anel[:-1]}) == 0
+
+
+def test_comprimento_pela_haversine():
+    assert medidas.comprimento_linha([[0, 0], [0, 1]]) == pytest.approx(R * math.radians(1))
+    linha = {"type": "MultiLineString", "coordinates": [[[0, 0], [1, 0]], [[0, 1], [0, 2]]]}
+    assert medidas.comprimento(linha) == pytest.approx(2 * R * math.radians(1))
+    assert medidas.medir({"type": "Point", "coordinates": [0, 0]}) == (0.0, 0.0)
+
+
+def test_circulo_tem_a_area_do_raio():
+    raio = 5000
+    area = medidas.area(medidas.circulo(-39.29, -5.2, raio))
+    # O polígono de 64 vértices fica um pouco dentro do círculo
+    poligono_inscrito = medidas.VERTICES_CIRCULO / 2 * raio ** 2 * math.sin(2 * math.pi / medidas.VERTICES_CIRCULO)
+    assert area == pytest.approx(poligono_inscrito, rel=2e-3)
+    assert area < math.pi * raio ** 2
+
+
+def test_com_medidas_preenche_so_o_que_falta():
+    geojson = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"Name": "A"}, "geometry": {"type": "Polygon", "coordinates": [_quadrado(0, 0, 1)]}},
+        {"type": "Feature", "properties": {"area_ha": 1.0, "perimetro_km": 2.0},
+         "geometry": {"type": "Polygon", "coordinates": [_quadrado(0, 0, 1)]}},
+    ]}
+    medido = medidas.com_medidas(geojson)
+    assert medido["features"][0]["properties"]["area_ha"] == medidas.medir(geojson["features"][0]["geometry"])[0]
+    assert medido["features"][1]["properties"] == {"area_ha": 1.0, "perimetro_km": 2.0}
+    assert "area_ha" not in geojson["features"][0]["properties"]
+    assert medidas.com_medidas(geojson) is medido
@@ -0,0 +1,187 @@
+import struct
+
+import shapely
+
+import mvt
+
+
+# Decodificador mínimo, só para conferir o que mvt.codificar_tile grava
+
+def _varint(dados, i):
+    n = deslocamento = 0
+    while True:
+        byte = dados[i]
+        i += 1
+        n |= (byte & 0x7F) << deslocamento
+        deslocamento += 7
+        if byte < 0x80:
+            return n, i
+
+
+def _campos(dados):
+    i = 0
+    while i < len(dados):
+        chave, i = _varint(dados, i)
+        numero, tipo = chave >> 3, chave & 0x7
+        if tipo == 0:
+            valor, i = _varint(dados, i)
+        elif tipo == 1:
+            valor, i = dados[i:i + 8], i + 8
+        else:
+            tamanho, i = _varint(dados, i)
+            valor, i = dados[i:i + tamanho], i + tamanho
+        yield numero, valor
+
+
+def _varints(dados):
+    saida, i = [], 0
+    while i < len(dados):
+        n, i = _varint(dados, i)
+        saida.append(n)
+    return saida
+
+
+def _dezigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def _valor(dados):
+    for numero, valor in _campos(dados):
+        if numero == 1:
+            return valor.decode("utf-8")
+        if numero == 3:
+            return struct.unpack("<d", valor)[0]
+        if numero == 5:
+            return valor
+        if numero == 6:
+            return _dezigzag(valor)
+        if numero == 7:
+            return bool(valor)
+
+
+def _comandos(numeros):
+    """[(comando, [(x, y) absolutos])] da geometria."""
+    saida, i, x, y = [], 0, 0, 0
+    while i < len(numeros):
+        comando, quantidade = numeros[i] & 0x7, numeros[i] >> 3
+        i += 1
+        pontos = []
+        if comando != mvt._CLOSE_PATH:
+            for _ in range(quantidade):
+                x += _dezigzag(numeros[i])
+                y += _dezigzag(numeros[i + 1])
+                pontos.append((x, y))
+                i += 2
+        saida.append((comando, pontos))
+    return saida
+
+
+def _decodificar(tile):
+    (numero, camada), = list(_campos(tile))
+    assert numero == 3
+    resultado = {"feicoes": [], "chaves": [], "valores": []}
+    for numero, valor in _campos(camada):
+        if numero == 1:
+            resultado["nome"] = valor.decode("utf-8")
+        elif numero == 2:
+            feicao = {"tags": []}
+            for campo, conteudo in _campos(valor):
+                if campo == 2:
+                    feicao["tags"] = _varints(conteudo)
+                elif campo == 3:
+                    feicao["tipo"] = conteudo
+                elif campo == 4:
+                    feicao["geometria"] = _comandos(_varints(conteudo))
+            resultado["feicoes"].append(feicao)
+        elif numero == 3:
+            resultado["chaves"].append(valor.decode("utf-8"))
+        elif numero == 4:
+            resultado["valores"].append(_valor(valor))
+        elif numero == 5:
+            resultado["extent"] = valor
+        elif numero == 15:
+            resultado["versao"] = valor
+    return resultado
+
+
+def _propriedades(camada, feicao):
+    tags = feicao["tags"]
+    return {camada["chaves"][k]: camada["valores"][v] for k, v in zip(tags[::2], tags[1::2])}
+
+
+def _area(anel):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(anel, anel[1:] + anel[:1]))
+
+
+def test_geometrias_voltam_com_os_comandos_da_especificacao():
+    tile = mvt.codificar_tile("camada", [
+        (shapely.Point(10, 20), {}),
+        (shapely.LineString([(0, 0), (100, 0), (100, 0), (100, 50)]), {}),
+        (shapely.Polygon([(0, 0), (10, 0), (10, 10), (0, 10)]), {}),
+    ])
+    camada = _decodificar(tile)
+    assert camada["nome"] == "camada"
+    assert camada["versao"] == 2
+    assert camada["extent"] == mvt.EXTENT
+    ponto, linha, poligono = camada["feicoes"]
+
+    assert ponto["tipo"] == mvt._PONTO
+    assert ponto["geometria"] == [(mvt._MOVE_TO, [(10, 20)])]
+
+    assert linha["tipo"] == mvt._LINHA
+    # O vértice repetido some
+    assert linha["geometria"] == [(mvt._MOVE_TO, [(0, 0)]), (mvt._LINE_TO, [(100, 0), (100, 50)])]
+
+    assert poligono["tipo"] == mvt._POLIGONO
+    (mover, inicio), (ligar, resto), (fechar, _) = poligono["geometria"]
+    assert (mover, ligar, fechar) == (mvt._MOVE_TO, mvt._LINE_TO, mvt._CLOSE_PATH)
+    # O anel vai sem repetir o primeiro ponto no fim
+    assert sorted(inicio + resto) == [(0, 0), (0, 10), (10, 0), (10, 10)]
+
+
+def test_anel_externo_e_buracos_tem_o_sentido_da_especificacao():
+    externo = [(0, 0), (0, 100), (100, 100), (100, 0)]
+    buraco = [(20, 20), (80, 20), (80, 80), (20, 80)]
+    for casca, furo in ((externo, buraco), (externo[::-1], buraco[::-1])):
+        tile = mvt.codificar_tile("camada", [(shapely.Polygon(casca, [furo]), {})])
+        (feicao,) = _decodificar(tile)["feicoes"]
+        aneis = [inicio + resto for (_, inicio), (_, resto), _ in zip(*[iter(feicao["geometria"])] * 3)]
+        assert len(aneis) == 2
+        # Com o eixo y para baixo: externo com área positiva, buraco negativa
+        assert _area(aneis[0]) > 0
+        assert _area(aneis[1]) < 0
+
+
+def test_propriedades_voltam_pelas_chaves_e_valores_compartilhados():
+    props = [
+        {"nome": "Açude", "volume": 1.5, "ativo": True, "numero": 7, "cota": -3, "vazio": None},
+        {"nome": "Açude", "extra": {"a": 1}},
+    ]
+    tile = mvt.codificar_tile("camada", [(shapely.Point(1, 1), p) for p in props])
+    camada = _decodificar(tile)
+    primeira, segunda = camada["feicoes"]
+    assert _propriedades(camada, primeira) == {"nome": "Açude", "volume": 1.5, "ativo": True, "numero": 7, "cota": -3}
+    # Valores que não são simples vão como JSON
+    assert _propriedades(camada, segunda) == {"nome": "Açude", "extra": '{"a": 1}'}
+    assert camada["chaves"].count("nome") == 1
+    assert camada["valores"].count("Açude") == 1
+
+
+def test_tile_sem_geometria_aproveitavel_nao_e_gravada():
+    assert mvt.codificar_tile("camada", []) is None
+    assert mvt.codificar_tile("camada", [(shapely.Polygon([(0, 0), (0.2, 0), (0.2, 0.2)]), {"a": 1})]) is None
+
+
+def test_cortar_gera_as_tiles_que_a_camada_cruza():
+    linha = shapely.LineString([(-39.5, -5.2), (-39.1, -5.2)])
+    tiles = list(mvt.cortar("estradas", [linha], [{"nome": "CE-060"}], 8))
+    assert tiles
+    for _, _, conteudo in tiles:
+        camada = _decodificar(conteudo)
+        assert camada["nome"] == "estradas"
+        (feicao,) = camada["feicoes"]
+        assert _propriedades(camada, feicao) == {"nome": "CE-060"}
+        for _, pontos in feicao["geometria"]:
+            for x, y in pontos:
+                assert -mvt.BUFFER <= x <= mvt.EXTENT + mvt.BUFFER
+                assert -mvt.BUFFER <= y <= mvt.EXTENT + mvt.BUFFER